@@ -0,0 +1,90 @@
+"""
+Synthetic pact generators used by the benchmarks.
+
+Each generator returns a pact document (as produced by ``json.load``) whose
+interactions carry an extra ``actual`` key: the response the provider is
+expected to return. The benchmarks pop it before writing the pact.
+"""
+import json
+
+
+def _interaction(i, body, matching_rules=None, actual_body=None):
+    response = {
+        'status': 200,
+        'headers': {'Content-Type': 'application/json', 'X-Request-Id': 'request-%d' % i},
+        'body': body,
+    }
+    if matching_rules:
+        response['matchingRules'] = matching_rules
+    return {
+        'description': 'interaction %d' % i,
+        'request': {
+            'method': 'GET',
+            'path': '/items/%d' % i,
+            'query': 'page=1&size=20',
+            'headers': {'Accept': 'application/json'},
+        },
+        'response': response,
+        'actual': {
+            'status': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'X-Request-Id': 'request-%d' % i,
+                'X-Trace-Id': 'trace-%d' % i,
+            },
+            'body': body if actual_body is None else actual_body,
+        },
+    }
+
+
+def _pact(interactions):
+    # round-trip through json so that the documents look like loaded pacts
+    return json.loads(json.dumps({
+        'provider': {'name': 'benchmarkProvider'},
+        'consumer': {'name': 'benchmarkConsumer'},
+        'interactions': interactions,
+        'metadata': {'pact-specification': {'version': '2.0.0'}},
+    }))
+
+
+def wide_body(width=1000, interactions=1):
+    """A flat body with ``width`` keys and a list of ``width`` elements."""
+    body = dict(('key%d' % i, 'value %d' % i) for i in range(width))
+    body['items'] = [{'id': i, 'name': 'item %d' % i} for i in range(width)]
+    return _pact([_interaction(i, body) for i in range(interactions)])
+
+
+def deep_body(depth=100, interactions=1):
+    """A body made of ``depth`` nested dicts and lists."""
+    body = {'leaf': 'value'}
+    for i in range(depth):
+        body = {'level%d' % i: [body, i]} if i % 2 else {'level%d' % i: body, 'id': i}
+    return _pact([_interaction(i, body) for i in range(interactions)])
+
+
+def many_rules(rules=200, interactions=1):
+    """A body whose keys are each constrained by a regex or type matching rule."""
+    body = dict(('key%d' % i, 'value-%d' % i) for i in range(rules))
+    actual_body = dict(('key%d' % i, 'other-%d' % i) for i in range(rules))
+    matching_rules = {}
+    for i in range(rules):
+        if i % 2:
+            matching_rules['$.body.key%d' % i] = {'match': 'regex', 'regex': '^[a-z]+-[0-9]+$'}
+        else:
+            matching_rules['$.body.key%d' % i] = {'match': 'type'}
+    return _pact([_interaction(i, body, matching_rules, actual_body) for i in range(interactions)])
+
+
+def many_interactions(interactions=1000):
+    """Many small interactions, with a few matching rules each."""
+    body = {'id': 1, 'name': 'Mary', 'tags': ['cow', 'farm']}
+    matching_rules = {'$.body.id': {'match': 'type'}, '$.body.tags': {'min': 1}}
+    return _pact([_interaction(i, body, matching_rules) for i in range(interactions)])
+
+
+GENERATORS = {
+    'wide_body': wide_body,
+    'deep_body': deep_body,
+    'many_rules': many_rules,
+    'many_interactions': many_interactions,
+}
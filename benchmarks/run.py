@@ -0,0 +1,325 @@
+"""
+Throughput benchmarks for the validator, the matchers and the verifier.
+
+Usage:
+    python -m benchmarks.run                         # run and print the results
+    python -m benchmarks.run --save baseline.json    # store the results as a baseline
+    python -m benchmarks.run --compare baseline.json # compare the results with a baseline
+    python -m benchmarks.run --against python2.7     # compare the results with another interpreter
+
+Each benchmark reports interactions/second and nodes/second (number of nodes
+visited by ``validator.compare``) of its fastest run, and the peak memory
+allocated when ``tracemalloc`` is available. The import benchmarks report
+the number of imports/second of the package in a fresh interpreter.
+"""
+from __future__ import print_function
+
+import argparse
+from contextlib import contextmanager
+import copy
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from timeit import default_timer
+
+from pypact import binary
+from pypact import matchers
+from pypact import validator
+from pypact.verifiers import base
+
+from . import generators
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+SIZES = {
+    'full': {'wide_body': 2000, 'deep_body': 300, 'many_rules': 300, 'many_interactions': 2000},
+    'quick': {'wide_body': 200, 'deep_body': 50, 'many_rules': 50, 'many_interactions': 200},
+}
+
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+
+@contextmanager
+def _peak_memory(result):
+    if tracemalloc is None:
+        result['peak_memory_kb'] = None
+        yield
+        return
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        result['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+
+
+def _actual_request(request):
+    actual = copy.deepcopy(request)
+    actual['headers'] = dict(actual.get('headers', {}), **{'User-Agent': 'benchmark', 'X-Trace-Id': 'trace'})
+    return actual
+
+
+def _pairs(pact, side):
+    for interaction in pact['interactions']:
+        if side == 'request':
+            yield _actual_request(interaction['request']), copy.deepcopy(interaction['request'])
+        else:
+            yield copy.deepcopy(interaction['actual']), copy.deepcopy(interaction['response'])
+
+
+def _count_nodes(pact, side):
+    compare = validator.compare_requests if side == 'request' else validator.compare_responses
+    with validator.profile() as profile:
+        for actual, expected in _pairs(pact, side):
+            list(compare(actual, expected))
+    return profile.nodes
+
+
+def _measure(function, runs, interactions, nodes):
+    """
+        Call ``function`` on each of ``runs`` and compute the throughputs from the fastest call.
+
+        The first run only measures the peak memory: tracing the allocations
+        slows the calls down too much to time them.
+    """
+    result = {}
+    timings = []
+    with _peak_memory(result):
+        function(runs[0])
+    for run in runs[1:]:
+        gc.collect()
+        gc.disable()  # like timeit, so that collections do not add noise
+        try:
+            start = default_timer()
+            function(run)
+            timings.append(default_timer() - start)
+        finally:
+            gc.enable()
+    best = min(timings)
+    result['interactions_per_second'] = interactions / best
+    result['nodes_per_second'] = nodes / best
+    return result
+
+
+def bench_compare(pact, side, repeat):
+    """Benchmark ``compare_requests`` or ``compare_responses`` over all the interactions of ``pact``."""
+    compare = validator.compare_requests if side == 'request' else validator.compare_responses
+    runs = [list(_pairs(pact, side)) for _ in range(repeat + 1)]
+
+    def run(pairs):
+        for actual, expected in pairs:
+            list(compare(actual, expected))
+
+    return _measure(run, runs, len(pact['interactions']), _count_nodes(pact, side))
+
+
+class InMemoryClient(base.PactClientMock):
+    """Client returning the ``actual`` responses stored in the generated pact."""
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get(self, client, path, data, headers, query):
+        return copy.deepcopy(self.responses[path])
+
+    @contextmanager
+    def set_up(self, init_states):
+        yield
+
+
+def bench_verifier(pact, repeat):
+    """Benchmark ``Provider.honours_pact_with`` with an in-memory client."""
+    responses = dict((x['request']['path'], x.pop('actual')) for x in copy.deepcopy(pact['interactions']))
+    document = copy.deepcopy(pact)
+    for interaction in document['interactions']:
+        interaction.pop('actual')
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
+        json.dump(document, f)
+    try:
+        provider = base.Provider(f.name, InMemoryClient(responses))
+    finally:
+        os.remove(f.name)
+
+    def run(provider):
+        provider.honours_pact_with(pact['consumer']['name'])
+
+    return _measure(run, [provider] * (repeat + 1), len(pact['interactions']), _count_nodes(pact, 'response'))
+
+
+def bench_get_best_matcher(pact, repeat):
+    """Benchmark ``matchers.get_best_matcher`` on every rule path of ``pact``."""
+    rules = {}
+    for interaction in pact['interactions']:
+        rules.update(interaction['response'].get('matchingRules', {}))
+    compiled = matchers.compile_matchers(rules)
+    paths = ["['$']" + ''.join("['%s']" % key for key in path[2:].split('.')) for path in rules]
+    timings = []
+    for _ in range(repeat):
+        start = default_timer()
+        for path in paths:
+            matchers.get_best_matcher(compiled, path)
+        timings.append(default_timer() - start)
+    return {'lookups_per_second': len(paths) / min(timings)}
+
+
+def bench_render(pact, repeat):
+    """Benchmark the rendering of a single mismatch in each interaction body with ``format_diff`` and ``format_errors``."""
+    diffs = []
+    for actual, expected in _pairs(pact, 'response'):
+        actual['body'] = dict(actual['body'], mismatch='actual')
+        expected['body'] = dict(expected['body'], mismatch='expected')
+        diffs.append(validator.diff_responses(actual, expected))
+    results = {}
+    for name, render in (
+        ('format_diff', lambda errors, actual, expected: validator.format_diff(actual, expected)),
+        ('format_errors', lambda errors, actual, expected: validator.format_errors(errors)),
+    ):
+        timings = []
+        for _ in range(repeat):
+            start = default_timer()
+            for diff in diffs:
+                list(render(*diff))
+            timings.append(default_timer() - start)
+        results[name] = {'renders_per_second': len(diffs) / min(timings)}
+    return results
+
+
+def bench_load(pact, repeat):
+    """
+        Benchmark the loading of ``pact`` from JSON and from the binary encoding.
+
+        ``open`` only decodes the document of the binary pact, the
+        interactions being decoded on access.
+    """
+    pact = copy.deepcopy(pact)
+    for interaction in pact['interactions']:
+        interaction.pop('actual', None)
+    text = json.dumps(pact)
+    data = binary.dumps(pact)
+    results = {}
+    for name, load in (
+        ('json', lambda: json.loads(text)),
+        ('binary', lambda: binary.loads(data)),
+        ('binary_open', lambda: binary.BinaryPact(data).document),
+    ):
+        timings = []
+        for _ in range(repeat):
+            start = default_timer()
+            load()
+            timings.append(default_timer() - start)
+        results[name] = {'loads_per_second': 1 / min(timings), 'bytes': len(data if name != 'json' else text)}
+    return results
+
+
+IMPORTS = ('pypact', 'pypact.verifiers.base')
+
+
+def bench_import(module, repeat):
+    """Benchmark the import of ``module`` in a fresh interpreter, excluding the interpreter start up."""
+    statement = (
+        'from timeit import default_timer; start = default_timer(); import %s; '
+        'print(default_timer() - start)' % module
+    )
+    timings = [
+        float(subprocess.check_output([sys.executable, '-c', statement]))
+        for _ in range(repeat)
+    ]
+    return {'imports_per_second': 1 / min(timings)}
+
+
+def run(size='full', repeat=5):
+    sizes = SIZES[size]
+    results = {}
+    for name, generator in sorted(generators.GENERATORS.items()):
+        pact = generator(sizes[name])
+        results['compare_responses.%s' % name] = bench_compare(pact, 'response', repeat)
+        results['compare_requests.%s' % name] = bench_compare(pact, 'request', repeat)
+        results['honours_pact_with.%s' % name] = bench_verifier(pact, repeat)
+    results['get_best_matcher.many_rules'] = bench_get_best_matcher(
+        generators.many_rules(sizes['many_rules']), repeat)
+    for name, result in bench_render(generators.wide_body(sizes['wide_body']), repeat).items():
+        results['%s.wide_body' % name] = result
+    for name, result in bench_load(generators.many_interactions(sizes['many_interactions']), repeat).items():
+        results['load_%s.many_interactions' % name] = result
+    for module in IMPORTS:
+        results['import.%s' % module] = bench_import(module, repeat)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+        Print the relative change of every throughput metric against ``baseline``.
+
+        Return: the list of the metrics that regressed by more than ``tolerance`` (a ratio).
+    """
+    regressions = []
+    for name in sorted(results):
+        for metric, value in sorted(results[name].items()):
+            reference = baseline.get(name, {}).get(metric)
+            if not metric.endswith('_per_second') or not reference:
+                continue
+            change = value / reference - 1
+            print('%-45s %-25s %12.1f %+7.1f%%' % (name, metric, value, change * 100))
+            if change < -tolerance:
+                regressions.append('%s.%s' % (name, metric))
+    return regressions
+
+
+def run_with(interpreter, size, repeat):
+    """Run the benchmarks with another Python ``interpreter`` and return its results."""
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        subprocess.check_call(
+            [interpreter, '-m', 'benchmarks.run', '--size', size, '--repeat', str(repeat), '--save', path],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdout=open(os.devnull, 'w'),
+        )
+        with open(path) as f:
+            return json.load(f)
+    finally:
+        os.remove(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=sorted(SIZES), default='full')
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs, the fastest one is kept')
+    parser.add_argument('--save', metavar='FILE', help='store the results in FILE')
+    parser.add_argument('--compare', metavar='FILE', nargs='?', const=BASELINE,
+                        help='compare the results with FILE (default: %s)' % BASELINE)
+    parser.add_argument('--against', metavar='PYTHON',
+                        help='compare the results with the ones of the PYTHON interpreter on the same pacts')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative throughput loss above which --compare/--against fails (default: 0.2)')
+    args = parser.parse_args(argv)
+
+    results = run(args.size, args.repeat)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True, separators=(',', ': '))
+            f.write('\n')
+    if args.compare or args.against:
+        if args.against:
+            baseline = run_with(args.against, args.size, args.repeat)
+        else:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print('regressions: %s' % ', '.join(regressions))
+            return 1
+    else:
+        print(json.dumps(results, indent=4, sort_keys=True, separators=(',', ': ')))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
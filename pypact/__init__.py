@@ -2,7 +2,14 @@
 pypact
 
 A consumer driven contract testing library.
+
+Importing the package only loads the consumer API. The heavy dependencies
+(``requests``, ``difflib``, ``urlparse``, Django) and the optional
+submodules are imported inside the functions using them, when the
+corresponding feature is first used, and the submodules are loaded on
+first attribute access (Python 3.7+).
 """
+import importlib
 
 from .consumer import Consumer
 from .interaction import Interaction
@@ -10,3 +17,11 @@ from .provider import Provider
 
 
 __all__ = ['Consumer', 'Provider', 'Interaction']
+
+_SUBMODULES = ('binary', 'cli', 'client', 'linter', 'matchers', 'recorder', 'sharing', 'validator', 'verifiers')
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
@@ -0,0 +1,254 @@
+"""
+Compact binary encoding of pact documents.
+
+A binary pact holds each string once, in a string table, and each interaction
+in its own length-prefixed chunk, found through an offset table, so that a
+single interaction can be decoded without reading the others:
+
+    magic | string count | interaction count
+          | string offsets (string count + 1) | chunk offsets (interaction count + 2)
+          | strings | document | interaction 0 | ... | interaction count-1
+
+The offsets are absolute little-endian uint64. The document is the pact
+without its interactions. A chunk is a uint32 length followed by a value:
+
+    n, t, f                     null, true, false
+    i <int64>                   integer
+    I <string>                  integer out of the int64 range, in decimal
+    d <float64>                 number
+    s <string>                  string, a uint32 index in the string table
+    l <count> value*            array
+    o <count> (<string> value)* object
+
+The conversion to and from JSON is lossless: ``loads(dumps(pact)) == pact``
+for any pact made of JSON values.
+"""
+import json
+import struct
+
+try:
+    from collections.abc import Sequence
+except ImportError:  # Python 2
+    from collections import Sequence
+
+
+MAGIC = b'PYPACTB1'
+_HEADER = struct.Struct('<II')
+_OFFSET = struct.Struct('<Q')
+_INDEX = struct.Struct('<I')
+_INTEGER = struct.Struct('<q')
+_NUMBER = struct.Struct('<d')
+
+try:
+    STRING_TYPES = (str, unicode)
+    INTEGER_TYPES = (int, long)
+except NameError:  # Python 3
+    STRING_TYPES = (str,)
+    INTEGER_TYPES = (int,)
+
+
+class BadBinaryPact(ValueError):
+    pass
+
+
+def is_binary(data):
+    """Return whether ``data`` (bytes) starts like a binary pact."""
+    return data[:len(MAGIC)] == MAGIC
+
+
+class _Encoder(object):
+    def __init__(self):
+        self.strings = {}
+
+    def string(self, value):
+        """Return the packed index of ``value`` in the string table, adding it on first use."""
+        if value not in self.strings:
+            self.strings[value] = len(self.strings)
+        return _INDEX.pack(self.strings[value])
+
+    def encode(self, value, out):
+        """Append the encoding of ``value`` to the ``out`` list of bytes."""
+        if value is None:
+            out.append(b'n')
+        elif value is True:
+            out.append(b't')
+        elif value is False:
+            out.append(b'f')
+        elif isinstance(value, STRING_TYPES):
+            out.append(b's' + self.string(value))
+        elif isinstance(value, INTEGER_TYPES):
+            if -2 ** 63 <= value < 2 ** 63:
+                out.append(b'i' + _INTEGER.pack(value))
+            else:
+                out.append(b'I' + self.string(str(value)))
+        elif isinstance(value, float):
+            out.append(b'd' + _NUMBER.pack(value))
+        elif isinstance(value, dict):
+            out.append(b'o' + _INDEX.pack(len(value)))
+            for key, child in value.items():
+                if not isinstance(key, STRING_TYPES):
+                    raise TypeError('object keys must be strings, not %r' % (key,))
+                out.append(self.string(key))
+                self.encode(child, out)
+        elif isinstance(value, (list, tuple)):
+            out.append(b'l' + _INDEX.pack(len(value)))
+            for child in value:
+                self.encode(child, out)
+        else:
+            raise TypeError('%r is not JSON serializable' % (value,))
+
+    def chunk(self, value):
+        out = []
+        self.encode(value, out)
+        body = b''.join(out)
+        return _INDEX.pack(len(body)) + body
+
+
+def _utf8(value):
+    return value if isinstance(value, bytes) else value.encode('utf-8')
+
+
+def dumps(pact):
+    """Return the binary encoding (bytes) of ``pact``."""
+    encoder = _Encoder()
+    document = dict((key, value) for key, value in pact.items() if key != 'interactions')
+    chunks = [encoder.chunk(document)] + [encoder.chunk(x) for x in pact.get('interactions', [])]
+    strings = [None] * len(encoder.strings)
+    for value, index in encoder.strings.items():
+        strings[index] = _utf8(value)
+
+    position = len(MAGIC) + _HEADER.size + _OFFSET.size * (len(strings) + 1 + len(chunks) + 1)
+    offsets = []
+    for parts in (strings, chunks):
+        for part in parts:
+            offsets.append(position)
+            position += len(part)
+        offsets.append(position)
+    return b''.join(
+        [MAGIC, _HEADER.pack(len(strings), len(chunks) - 1)]
+        + [_OFFSET.pack(x) for x in offsets]
+        + strings + chunks
+    )
+
+
+class BinaryInteractions(Sequence):
+    """Interactions of a ``BinaryPact``, decoded on first access."""
+    def __init__(self, binary_pact):
+        self._binary_pact = binary_pact
+        self._decoded = {}
+
+    def __len__(self):
+        return self._binary_pact.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('interaction index out of range')
+        if i not in self._decoded:
+            self._decoded[i] = self._binary_pact.decode(i + 1)
+        return self._decoded[i]
+
+
+class BinaryPact(object):
+    """
+        Pact decoded from its binary encoding, ``data`` (bytes or an mmap).
+
+        ``document`` is the pact, whose ``interactions`` are a
+        ``BinaryInteractions``: only the interactions accessed are decoded. The
+        strings are decoded once, on first use, and shared by all the
+        interactions using them.
+    """
+    def __init__(self, data):
+        if not is_binary(data):
+            raise BadBinaryPact('not a binary pact')
+        self._data = data
+        self._strings_count, self.count = _HEADER.unpack_from(data, len(MAGIC))
+        self._strings = [None] * self._strings_count
+        self.document = self.decode(0)
+        self.document['interactions'] = BinaryInteractions(self)
+
+    def _offset(self, i):
+        return _OFFSET.unpack_from(self._data, len(MAGIC) + _HEADER.size + _OFFSET.size * i)[0]
+
+    def string(self, index):
+        """Return the ``index``-th string of the string table."""
+        value = self._strings[index]
+        if value is None:
+            value = self._strings[index] = self._data[self._offset(index):self._offset(index + 1)].decode('utf-8')
+        return value
+
+    def decode(self, chunk):
+        """Decode the ``chunk``-th chunk: 0 is the document, the next ones the interactions."""
+        if not 0 <= chunk <= self.count:
+            raise IndexError('chunk index out of range')
+        start = self._offset(self._strings_count + 1 + chunk)
+        length, = _INDEX.unpack_from(self._data, start)
+        value, end = self._decode(start + _INDEX.size)
+        if end != start + _INDEX.size + length:
+            raise BadBinaryPact('chunk %d is corrupted' % chunk)
+        return value
+
+    def _decode(self, pos, unpack_index=_INDEX.unpack_from):
+        """Return the value encoded at ``pos`` and the position following it (indices and counts take 4 bytes)."""
+        data = self._data
+        tag = data[pos:pos + 1]
+        pos += 1
+        if tag == b's':
+            index, = unpack_index(data, pos)
+            return self._strings[index] or self.string(index), pos + 4
+        if tag == b'o':
+            count, = unpack_index(data, pos)
+            pos += 4
+            value = {}
+            strings = self._strings
+            for _ in range(count):
+                index, = unpack_index(data, pos)
+                key = strings[index] or self.string(index)
+                if data[pos + 4:pos + 5] == b's':  # inlined, most values are strings
+                    index, = unpack_index(data, pos + 5)
+                    value[key] = strings[index] or self.string(index)
+                    pos += 9
+                else:
+                    value[key], pos = self._decode(pos + 4)
+            return value, pos
+        if tag == b'l':
+            count, = unpack_index(data, pos)
+            pos += 4
+            value = []
+            for _ in range(count):
+                child, pos = self._decode(pos)
+                value.append(child)
+            return value, pos
+        if tag == b'i':
+            return _INTEGER.unpack_from(data, pos)[0], pos + _INTEGER.size
+        if tag == b'd':
+            return _NUMBER.unpack_from(data, pos)[0], pos + _NUMBER.size
+        if tag == b'n':
+            return None, pos
+        if tag == b't':
+            return True, pos
+        if tag == b'f':
+            return False, pos
+        if tag == b'I':
+            return int(self.string(unpack_index(data, pos)[0])), pos + 4
+        raise BadBinaryPact('unknown tag %r at %d' % (tag, pos - 1))
+
+
+def loads(data):
+    """Decode a whole binary pact, return it as a plain pact."""
+    pact = BinaryPact(data).document
+    pact['interactions'] = list(pact['interactions'])
+    return pact
+
+
+def from_json(text):
+    """Convert a JSON pact to its binary encoding."""
+    return dumps(json.loads(text))
+
+
+def to_json(data, **kwargs):
+    """Convert a binary pact to JSON, ``kwargs`` are given to ``json.dumps``."""
+    return json.dumps(loads(data), **kwargs)
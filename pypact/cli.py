@@ -0,0 +1,233 @@
+"""
+Command line interface of pypact.
+
+Usage:
+    pypact generate [--workers N] [--pact-dir DIR] [--pytest-args ARGS] [--timeout T] PATH [PATH ...]
+    pypact lint PACT [PACT ...]
+    pypact convert SOURCE DESTINATION
+    pypact load [--requests N] [--rate R] [--workers N] [--seed S] [--json] PACT BASE_URI
+
+``generate`` runs the consumer test modules found in PATH (files, or
+directories searched for ``test_*.py``) with pytest, each in its own worker
+process, gathers the interactions registered with the ``MockService`` created
+by the tests, merges them and writes a pact per consumer and provider pair in
+DIR. The time spent in each module is printed as soon as it completes. With
+a timeout, the run is aborted when no module completes within T seconds.
+
+``lint`` checks pact files, see ``pypact.linter``.
+
+``convert`` converts a JSON pact to the binary encoding of ``pypact.binary``,
+or a binary pact to JSON.
+
+``load`` sends requests synthesized from the interactions of PACT to the
+provider at BASE_URI and prints the throughput and the latency histogram, see
+``pypact.verifiers.load``.
+"""
+from __future__ import print_function
+
+import argparse
+from collections import namedtuple, OrderedDict
+import json
+from multiprocessing import Pool, TimeoutError
+import os
+import re
+import shlex
+import sys
+from timeit import default_timer
+
+from . import service
+
+
+# pacts: the list of (consumer name, provider name, interactions) of the services created by the module
+ModuleResult = namedtuple('ModuleResult', ['path', 'exit_code', 'duration', 'pacts'])
+
+
+def discover(paths):
+    """Return the sorted test modules of ``paths``, directories being searched for ``test_*.py``."""
+    modules = set()
+    for path in paths:
+        if not os.path.isdir(path):
+            modules.add(path)
+            continue
+        for directory, _dirnames, filenames in os.walk(path):
+            modules.update(
+                os.path.join(directory, x) for x in filenames if x.startswith('test_') and x.endswith('.py'))
+    return sorted(modules)
+
+
+def _run_module(args):
+    path, pytest_args = args
+    import pytest
+    timer = default_timer()
+    with service.collect_services() as services:
+        exit_code = pytest.main([path, '-q', '-p', 'no:cacheprovider'] + pytest_args)
+    duration = default_timer() - timer
+    pacts = [
+        (service.party_name(x.consumer), service.party_name(x.provider), x.interactions)
+        for x in services if x.interactions
+    ]
+    return ModuleResult(path, int(exit_code), duration, pacts)
+
+
+def merge_pacts(results):
+    """
+        Merge the interactions of the ``ModuleResult`` of several modules by consumer and provider.
+
+        Identical interactions are only kept once. Different interactions with
+        the same provider state and description are conflicts: the first one
+        is kept.
+
+        Return: a tuple (pacts, conflicts) where pacts is an OrderedDict
+            {(consumer, provider): interactions} and conflicts the list of the
+            conflict messages.
+    """
+    pacts = OrderedDict()
+    seen = {}
+    conflicts = []
+    for result in results:
+        for consumer, provider, interactions in result.pacts:
+            merged = pacts.setdefault((consumer, provider), [])
+            for interaction in interactions:
+                # the state may be structured (a dict or a list): it is serialized to be hashable
+                state = json.dumps(interaction.get('provider_state'), sort_keys=True)
+                key = (consumer, provider, state, interaction.get('description'))
+                dump = json.dumps(interaction, sort_keys=True)
+                if key not in seen:
+                    seen[key] = (dump, result.path)
+                    merged.append(interaction)
+                elif seen[key][0] != dump:
+                    conflicts.append('%s: interaction %r of %s with %s conflicts with the one of %s' % (
+                        result.path, interaction.get('description'), consumer, provider, seen[key][1]))
+    return pacts, conflicts
+
+
+def pact_filename(consumer, provider):
+    """Return the file name of the pact between ``consumer`` and ``provider``, e.g. my_consumer-my_provider.json."""
+    return '%s-%s.json' % tuple(re.sub(r'\W+', '_', x.strip().lower()) for x in (consumer, provider))
+
+
+def generate(paths, pact_dir, workers=4, pytest_args=(), timeout=None, out=sys.stdout):
+    """
+        Run the consumer test modules of ``paths`` in ``workers`` processes and write their pacts in ``pact_dir``.
+
+        The run is aborted, without writing any pact, if no module completes
+        within ``timeout`` seconds.
+
+        Return: the exit code, 1 if a module failed, two modules registered
+            conflicting interactions or the run timed out.
+    """
+    modules = discover(paths)
+    results = []
+    timer = default_timer()
+    timed_out = False
+    # a process per module, so that the modules don't share their imports and MockService instances
+    pool = Pool(workers, maxtasksperchild=1)
+    try:
+        pending = pool.imap_unordered(_run_module, [(x, list(pytest_args)) for x in modules])
+        for _ in modules:
+            try:
+                result = pending.next(timeout)
+            except TimeoutError:
+                timed_out = True
+                print('no module completed in %ss, aborting' % timeout, file=out)
+                break
+            results.append(result)
+            print('%8.3fs %5d interactions  %s%s' % (
+                result.duration,
+                sum(len(x[2]) for x in result.pacts),
+                result.path,
+                '' if result.exit_code in (0, 5) else '  (failed)',  # 5: no tests collected
+            ), file=out)
+    finally:
+        if timed_out:
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
+    if timed_out:
+        return 1
+
+    results.sort(key=lambda x: x.path)
+    pacts, conflicts = merge_pacts(results)
+    for conflict in conflicts:
+        print(conflict, file=out)
+    if not os.path.isdir(pact_dir):
+        os.makedirs(pact_dir)
+    for (consumer, provider), interactions in pacts.items():
+        path = os.path.join(pact_dir, pact_filename(consumer, provider))
+        with open(path, 'w') as f:
+            json.dump(service.pact_document(consumer, provider, interactions), f, indent=2, sort_keys=True)
+        print('wrote %d interactions to %s' % (len(interactions), path), file=out)
+    print('%d modules in %.3fs' % (len(results), default_timer() - timer), file=out)
+    failed = [x for x in results if x.exit_code not in (0, 5)]
+    return 1 if failed or conflicts else 0
+
+
+def convert(source, destination):
+    """Convert the JSON pact ``source`` to the binary encoding in ``destination``, or the other way round."""
+    from . import binary
+    with open(source, 'rb') as f:
+        data = f.read()
+    if binary.is_binary(data):
+        with open(destination, 'w') as f:
+            f.write(binary.to_json(data, indent=2, sort_keys=True))
+    else:
+        with open(destination, 'wb') as f:
+            f.write(binary.from_json(data.decode('utf-8')))
+    return 0
+
+
+def load(pact, base_uri, requests=1000, rate=None, workers=4, seed=None, as_json=False, out=sys.stdout):
+    """Load test the provider at ``base_uri`` with ``pact``, return 1 if a request failed or got an unexpected status."""
+    from .verifiers import http
+    from .verifiers import load as load_module
+    client = http.HttpClient(base_uri, pool_size=workers)
+    report = load_module.run_load(pact, client, requests=requests, rate=rate, workers=workers, seed=seed)
+    if as_json:
+        print(json.dumps(report.to_dict(), indent=2, sort_keys=True), file=out)
+    else:
+        print(report.format(), file=out)
+    return 1 if report.errors or report.unexpected else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='pypact', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command')
+    generate_parser = subparsers.add_parser('generate', help='generate pacts from consumer tests')
+    generate_parser.add_argument('paths', metavar='PATH', nargs='+', help='test module or directory')
+    generate_parser.add_argument('--pact-dir', default='pacts', help='directory of the pacts (default: pacts)')
+    generate_parser.add_argument('--workers', type=int, default=4, help='number of worker processes (default: 4)')
+    generate_parser.add_argument('--pytest-args', default='', help='extra arguments given to pytest')
+    generate_parser.add_argument(
+        '--timeout', type=float, default=None, help='seconds to wait for a module to complete (default: no limit)')
+    lint_parser = subparsers.add_parser('lint', help='check pact files')
+    lint_parser.add_argument('pacts', metavar='PACT', nargs='+', help='pact file to check')
+    convert_parser = subparsers.add_parser('convert', help='convert a pact between JSON and the binary encoding')
+    convert_parser.add_argument('source', metavar='SOURCE', help='JSON or binary pact')
+    convert_parser.add_argument('destination', metavar='DESTINATION', help='converted pact')
+    load_parser = subparsers.add_parser('load', help='load test a provider with requests synthesized from a pact')
+    load_parser.add_argument('pact', metavar='PACT', help='pact file or URL')
+    load_parser.add_argument('base_uri', metavar='BASE_URI', help='base URI of the provider')
+    load_parser.add_argument('--requests', type=int, default=1000, help='number of requests (default: 1000)')
+    load_parser.add_argument('--rate', type=float, default=None, help='requests per second (default: unbounded)')
+    load_parser.add_argument('--workers', type=int, default=4, help='number of worker threads (default: 4)')
+    load_parser.add_argument('--seed', type=int, default=None, help='seed of the request generator')
+    load_parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        return generate(args.paths, args.pact_dir, args.workers, shlex.split(args.pytest_args), args.timeout)
+    if args.command == 'lint':
+        from . import linter
+        return linter.main(args.pacts)
+    if args.command == 'convert':
+        return convert(args.source, args.destination)
+    if args.command == 'load':
+        return load(args.pact, args.base_uri, args.requests, args.rate, args.workers, args.seed, args.json)
+    parser.print_usage()
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Static checks of pact files.
+
+Usage:
+    python -m pypact.linter PACT [PACT ...]
+
+Every interaction is checked once, in the order of the file: the structure of
+the pact, the jsonpaths and the rules of the matchingRules, the rules which
+never apply to the expected request or response (unreachable) or always lose
+against a better ranked rule (shadowed, see ``matchers.PathMatcher.rank``),
+and the interactions having the same provider states and request as a
+previous one (duplicates).
+"""
+from __future__ import print_function
+
+import argparse
+import bisect
+from collections import namedtuple
+import json
+import re
+import sys
+
+from . import matchers
+from . import validator
+
+
+Diagnostic = namedtuple('Diagnostic', ['location', 'code', 'message'])
+
+METHODS = ('get', 'post', 'put', 'patch', 'delete', 'head', 'options')
+
+try:
+    STRING_TYPES = (str, unicode)
+except NameError:  # Python 3
+    STRING_TYPES = (str,)
+
+
+def _location(parent, key):
+    if isinstance(key, int):
+        return '%s[%d]' % (parent, key)
+    return '%s.%s' % (parent, key) if parent else key
+
+
+def _check_key(tree, key, types, location, diagnostics, required=True):
+    """Check that ``tree[key]`` is one of ``types``, return it or None."""
+    if key not in tree:
+        if required:
+            diagnostics.append(Diagnostic(_location(location, key), 'missing-key', '%s is missing' % key))
+        return None
+    if not isinstance(tree[key], types):
+        diagnostics.append(Diagnostic(
+            _location(location, key), 'invalid-type',
+            '%s must be of type %s' % (key, ' or '.join(x.__name__ for x in types)),
+        ))
+        return None
+    return tree[key]
+
+
+def _node_paths(tree, keys):
+    """
+        Return the sorted paths, in the bracket notation of ``validator.compare``, of the nodes of ``tree``.
+
+        Actual lists may be longer than the expected ones, their extra elements
+        being compared with the first expected one: each list gets an extra
+        element, a copy of its first one (whose own lists don't get extra
+        elements, to keep the number of paths linear in the size of the tree).
+    """
+    paths = []
+    stack = [(tree[key], "['$']['%s']" % key, False) for key in keys if key in tree]
+    while stack:
+        value, path, extra = stack.pop()
+        paths.append(path)
+        if type(value) == dict:
+            stack.extend((child, "%s['%s']" % (path, key), extra) for key, child in value.items())
+        elif type(value) in (list, tuple):
+            stack.extend((child, '%s[%d]' % (path, i), extra) for i, child in enumerate(value))
+            if value and not extra:
+                stack.append((value[0], '%s[%d]' % (path, len(value)), True))
+    paths.sort()
+    return paths
+
+
+def _matched_paths(path_matcher, paths):
+    """Return the ``paths`` matched by ``path_matcher``, only testing the ones starting with its prefix."""
+    prefix = path_matcher.prefix
+    ret = []
+    for i in range(bisect.bisect_left(paths, prefix), len(paths)):
+        if not paths[i].startswith(prefix):
+            break
+        if path_matcher.match(paths[i]):
+            ret.append(paths[i])
+    return ret
+
+
+def _compile_rule(path, rule, location, diagnostics):
+    """Compile a matching rule, return (PathMatcher, ValueMatcher) or None."""
+    try:
+        path_matcher = matchers.PathMatcher.from_jsonpath(path)
+    except (ValueError, re.error) as e:
+        diagnostics.append(Diagnostic(location, 'invalid-jsonpath', '%s' % e))
+        return None
+    if not isinstance(rule, dict):
+        diagnostics.append(Diagnostic(location, 'invalid-rule', 'a rule must be an object'))
+        return None
+    try:
+        value_matcher = matchers.ValueMatcher.from_dict(rule)
+    except (AttributeError, KeyError, TypeError, ValueError, re.error) as e:
+        diagnostics.append(Diagnostic(location, 'invalid-rule', 'invalid rule %s: %s' % (json.dumps(rule), e)))
+        return None
+    if not _check_matcher(rule, value_matcher, location, diagnostics):
+        return None
+    return path_matcher, value_matcher
+
+
+def _check_matcher(rule, value_matcher, location, diagnostics):
+    """Report the unknown and invalid rules of ``rule``, combined ones included, return False if one is invalid."""
+    if isinstance(rule.get('matchers'), list):
+        combined = rule['matchers']
+        value_matchers = [value_matcher] if len(combined) == 1 else value_matcher.matchers
+        valid = True
+        for i, (child, child_matcher) in enumerate(zip(combined, value_matchers)):
+            child_location = _location(_location(location, 'matchers'), i)
+            valid = _check_matcher(child, child_matcher, child_location, diagnostics) and valid
+        return valid
+    if getattr(value_matcher, 'error', None):
+        diagnostics.append(Diagnostic(
+            location, 'invalid-rule', 'invalid rule %s: %s' % (json.dumps(rule), value_matcher.error)))
+        return False
+    if isinstance(value_matcher, matchers.EqualityMatcher) and rule.get('match') != 'equality':
+        diagnostics.append(Diagnostic(location, 'unknown-rule', 'unknown rule %s' % json.dumps(rule)))
+    return True
+
+
+def _check_rules(tree, keys, location, diagnostics):
+    """Check the matchingRules of a request or response."""
+    rules = _check_key(tree, 'matchingRules', (dict,), location, diagnostics, required=False)
+    if not rules:
+        return
+    location = _location(location, 'matchingRules')
+    try:
+        tree, flat = validator.normalize_expected(tree)
+    except AttributeError:
+        diagnostics.append(Diagnostic(location, 'invalid-rule', 'v3 rule categories must be objects'))
+        return
+    paths = _node_paths(tree, keys)
+    best = {}  # node path -> PathMatcher chosen by matchers.get_best_matcher
+    compiled = []
+    for jsonpath in sorted(flat):
+        rule_location = "%s['%s']" % (location, jsonpath)
+        ret = _compile_rule(jsonpath, flat[jsonpath], rule_location, diagnostics)
+        if ret is None:
+            continue
+        path_matcher = ret[0]
+        matched = _matched_paths(path_matcher, paths)
+        if not matched:
+            diagnostics.append(Diagnostic(
+                rule_location, 'unreachable-rule', '%s matches nothing in the expected tree' % jsonpath))
+            continue
+        compiled.append((jsonpath, rule_location, path_matcher, matched))
+        for path in matched:
+            if path not in best or path_matcher.rank < best[path].rank:
+                best[path] = path_matcher
+
+    for jsonpath, rule_location, path_matcher, matched in compiled:
+        if not any(best[path] is path_matcher for path in matched):
+            diagnostics.append(Diagnostic(
+                rule_location, 'shadowed-rule',
+                '%s never applies: a better ranked rule applies to each of its paths' % jsonpath,
+            ))
+
+
+def _check_interaction(i, interaction, seen, diagnostics):
+    location = _location('interactions', i)
+    if not isinstance(interaction, dict):
+        diagnostics.append(Diagnostic(location, 'invalid-type', 'an interaction must be an object'))
+        return
+    _check_key(interaction, 'description', STRING_TYPES, location, diagnostics)
+    states = _check_key(interaction, 'providerStates', (list,), location, diagnostics, required=False) or []
+    for j, state in enumerate(states):
+        state_location = _location(_location(location, 'providerStates'), j)
+        if not isinstance(state, dict):
+            diagnostics.append(Diagnostic(state_location, 'invalid-type', 'a provider state must be an object'))
+            continue
+        _check_key(state, 'name', STRING_TYPES, state_location, diagnostics)
+        _check_key(state, 'params', (dict,), state_location, diagnostics)
+
+    request = _check_key(interaction, 'request', (dict,), location, diagnostics)
+    if request is not None:
+        request_location = _location(location, 'request')
+        method = _check_key(request, 'method', STRING_TYPES, request_location, diagnostics)
+        if method is not None and method.lower() not in METHODS:
+            diagnostics.append(Diagnostic(
+                _location(request_location, 'method'), 'invalid-method', 'unknown method %s' % method))
+        _check_key(request, 'path', STRING_TYPES, request_location, diagnostics)
+        _check_key(request, 'headers', (dict,), request_location, diagnostics, required=False)
+        _check_key(request, 'query', STRING_TYPES + (dict,), request_location, diagnostics, required=False)
+        _check_rules(request, validator.REQUEST_KEYS, request_location, diagnostics)
+
+    response = _check_key(interaction, 'response', (dict,), location, diagnostics)
+    if response is not None:
+        response_location = _location(location, 'response')
+        _check_key(response, 'status', (int,), response_location, diagnostics, required=False)
+        _check_key(response, 'headers', (dict,), response_location, diagnostics, required=False)
+        _check_rules(response, validator.RESPONSE_KEYS, response_location, diagnostics)
+
+    if request is not None:
+        key = json.dumps({'request': request, 'providerStates': states}, sort_keys=True)
+        if key in seen:
+            diagnostics.append(Diagnostic(
+                location, 'duplicate-interaction',
+                'same provider states and request as interactions[%d]' % seen[key],
+            ))
+        else:
+            seen[key] = i
+
+
+def lint(pact):
+    """
+        Check a loaded pact.
+
+        Return: the list of the ``Diagnostic`` found, empty if the pact is valid.
+    """
+    diagnostics = []
+    if not isinstance(pact, dict):
+        return [Diagnostic('', 'invalid-type', 'a pact must be an object')]
+    for party in ('consumer', 'provider'):
+        if _check_key(pact, party, (dict,), '', diagnostics) is not None:
+            _check_key(pact[party], 'name', STRING_TYPES, party, diagnostics)
+    interactions = _check_key(pact, 'interactions', (list,), '', diagnostics) or []
+    seen = {}
+    for i, interaction in enumerate(interactions):
+        _check_interaction(i, interaction, seen, diagnostics)
+    return diagnostics
+
+
+def lint_file(path):
+    """Check the pact file at ``path``, see ``lint``."""
+    with open(path, 'r') as f:
+        try:
+            pact = json.load(f)
+        except ValueError as e:
+            return [Diagnostic('', 'invalid-json', '%s' % e)]
+    return lint(pact)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pacts', metavar='PACT', nargs='+', help='pact file to check')
+    args = parser.parse_args(argv)
+
+    found = False
+    for path in args.pacts:
+        for diagnostic in lint_file(path):
+            found = True
+            print('%s: %s: [%s] %s' % (path, diagnostic.location or '$', diagnostic.code, diagnostic.message))
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
 
+from collections import defaultdict
+from collections import deque
+from datetime import datetime
+import json
 import logging
 import re
 
 
 logger = logging.getLogger(__name__)
 
+try:
+    INTEGER_TYPES = (int, long)
+except NameError:  # Python 3
+    INTEGER_TYPES = (int,)
+
 
 class BaseError(object):
     """Base class for errors when comparing two trees."""
@@ -49,6 +58,13 @@ class TypeNotMatched(Difference):
         return actual, '%s(%s)' % (self.__class__.__name__, expected)
 
 
+class RuleNotMatched(Difference):
+    """Used to store an actual value that does not satisfy a rule (e.g. integer, date...)."""
+    def split(self):
+        actual, expected = super(RuleNotMatched, self).split()
+        return actual, '%s(%s)' % (self.__class__.__name__, expected)
+
+
 class NumberNotMatched(BaseError):
     """Used to store an actual value that does not match the expected number of elements."""
     def __init__(self, actual, expected, minimum=None, maximum=None):
@@ -62,6 +78,16 @@ class NumberNotMatched(BaseError):
         return actual, self.expected
 
 
+class ErrorBudgetExceeded(BaseError):
+    """Used to summarize the values that were not compared because too many errors were found."""
+    def __init__(self, errors, not_compared):
+        self.errors = errors
+        self.not_compared = not_compared
+
+    def split(self):
+        return '%s values not compared' % self.not_compared, 'stopped after %s errors' % self.errors
+
+
 class PathMatcher(object):
     """
         Stores a json_path as a regex with a weight.
@@ -69,13 +95,25 @@ class PathMatcher(object):
         It enables to quickly determine if a given path inside a tree structure
         matches the json_path. The weight is a mean to compare two PathMatcher
         both matched by the same path and choose the more precise one.
+
+        Between PathMatchers of the same weight, the one whose jsonpath comes
+        first in lexicographic order is chosen: ``rank`` orders PathMatchers
+        from the most to the least preferred.
     """
-    def __init__(self, regex, weight):
+    def __init__(self, regex, weight, prefix='', jsonpath=None, literal=False, signature=None):
         self._regex = re.compile(regex)
         self._weight = weight
+        # bracket notation of the path up to the first wildcard: all the matched paths start with it
+        self.prefix = prefix
+        self.jsonpath = jsonpath
+        # True when the jsonpath has no wildcard: it only matches ``prefix``
+        self.literal = literal
+        # canonical form of the jsonpath: equivalent jsonpaths have the same signature
+        self.signature = signature or regex
+        self.rank = (-weight, jsonpath or '')
 
     def match(self, path):
-        return bool(re.match(self._regex, path))
+        return self._regex.match(path) is not None
 
     def weight(self, path):
         return self._weight if self.match(path) else 0
@@ -91,14 +129,16 @@ class PathMatcher(object):
               [ and ] characters are not allowed in keys between dots
               [] and [*] match any list index
         """
-        assert jsonpath.startswith('$')
-        jsonpath = '.%s' % jsonpath  # pre-process so that the $ character can be handled like any other
+        if not jsonpath.startswith('$'):
+            raise ValueError("jsonpath '%s' does not start with $" % jsonpath)
+        original, jsonpath = jsonpath, '.%s' % jsonpath  # pre-process so that the $ character can be handled like any other
 
         match_dot_re = r"(?<=\.)(?P<dot>[^.\[\]]*)"
         match_bracket_re = r"(?<=\[)(?P<bracket>(?P<quote>')?[^'\]]*(?(quote)')\])"
         jsonpath_re = re.compile(r"%s|%s" % (match_dot_re, match_bracket_re))
 
         regex = r''
+        prefix, signature, wildcard = '', '', False
         weight = 1
         star_factor, exact_factor = 1, 2
         split = re.findall(jsonpath_re, jsonpath)
@@ -111,30 +151,41 @@ class PathMatcher(object):
                 if bracket_match in ('*', ''):
                     regex += r"\[[0-9]+\]"
                     weight *= star_factor
+                    wildcard = True
+                    signature += '[*]'
                 else:
                     if not bracket_match.startswith("'"):
                         try:
                             int(bracket_match)
                         except ValueError:
-                            raise
+                            raise ValueError("invalid index [%s] in jsonpath '%s'" % (bracket_match, original))
                     regex += r"\[%s\]" % re.escape(bracket_match)
                     weight *= exact_factor
+                    prefix += '' if wildcard else '[%s]' % bracket_match
+                    signature += '[%s]' % bracket_match
             else:
                 if not dot_match:
                     regex += r"\[\'[^']*\'\]"
                     weight *= star_factor
+                    wildcard = True
+                    signature += '[.]'
                 else:
                     if dot_match == '*':
                         if i == len(split) - 1:  # ending star
                             regex += r".*"
+                            signature += '[...]'
                         else:
                             regex += r"\[\'.*\'\]"
+                            signature += '[..]'
                         weight *= star_factor
+                        wildcard = True
                     else:
                         regex += r"\[\'%s\'\]" % re.escape(dot_match)
                         weight *= exact_factor
+                        prefix += '' if wildcard else "['%s']" % dot_match
+                        signature += "['%s']" % dot_match
         regex += r"$"
-        return cls(regex, weight)
+        return cls(regex, weight, prefix, original, not wildcard, signature)
 
 
 class ValueMatcher(object):
@@ -148,14 +199,35 @@ class ValueMatcher(object):
 
     @classmethod
     def from_dict(cls, d):
+        """
+            Compile a matching rule into a ValueMatcher.
+
+            Both pact v2 rules (``{"match": "type"}``) and v3 lists of rules
+            (``{"matchers": [...], "combine": "AND"}``) are supported.
+        """
+        if isinstance(d.get('matchers'), list):
+            matchers = [cls.from_dict(rule) for rule in d['matchers']]
+            if len(matchers) == 1:
+                return matchers[0]
+            return CombinedMatcher(matchers, d.get('combine', 'AND'))
         if d.get('match'):
             match = d['match']
             if match == 'regex':
                 return RegexMatcher(d['regex'])
+            if match == 'unordered':
+                return UnorderedMatcher()
             if match == 'type':
                 if d.get('min') or d.get('max'):
                     return MinMaxMatcher(d.get('min'), d.get('max'))
                 return TypeMatcher()
+            if match in TYPE_RULES:
+                return TypeRuleMatcher(match)
+            if match in DATETIME_FORMATS:
+                return DateTimeMatcher(match, d.get('format') or d.get(match))
+            if match == 'include':
+                return IncludeMatcher(d['value'])
+            if match == 'values':
+                return ValuesMatcher()
         elif d.get('min') or d.get('max'):
             return MinMaxMatcher(d.get('min'), d.get('max'))
         logger.debug('Unrecognised matcher %s, defaulting to equality matching', d)
@@ -197,9 +269,209 @@ class TypeMatcher(ValueMatcher):
             return TypeNotMatched(actual, expected)
 
 
+TYPE_RULES = {
+    'integer': lambda x: isinstance(x, INTEGER_TYPES) and not isinstance(x, bool),
+    'decimal': lambda x: isinstance(x, float),
+    'number': lambda x: isinstance(x, INTEGER_TYPES + (float,)) and not isinstance(x, bool),
+    'boolean': lambda x: isinstance(x, bool),
+    'null': lambda x: x is None,
+}
+
+
+class TypeRuleMatcher(ValueMatcher):
+    """Matches the v3 ``integer``, ``decimal``, ``number``, ``boolean`` and ``null`` rules."""
+    def __init__(self, rule):
+        self.rule = rule
+        self.check = TYPE_RULES[rule]
+
+    def diff(self, actual, expected):
+        if not self.check(actual):
+            return RuleNotMatched(actual, self.rule)
+
+
+DATETIME_FORMATS = {
+    'date': 'yyyy-MM-dd',
+    'time': 'HH:mm:ss',
+    'timestamp': "yyyy-MM-dd'T'HH:mm:ss",
+}
+
+# Java SimpleDateFormat patterns (used by pact) to strptime directives
+_DATETIME_DIRECTIVES = {
+    'yyyy': '%Y', 'yy': '%y',
+    'MMMM': '%B', 'MMM': '%b', 'MM': '%m', 'M': '%m',
+    'dd': '%d', 'd': '%d',
+    'EEEE': '%A', 'EEE': '%a',
+    'HH': '%H', 'H': '%H', 'hh': '%I', 'h': '%I',
+    'mm': '%M', 'm': '%M',
+    'ss': '%S', 's': '%S',
+    'SSS': '%f', 'SSSSSS': '%f',
+    'a': '%p',
+    'Z': '%z', 'X': '%z', 'XX': '%z', 'XXX': '%z',
+    'z': '%Z', 'zz': '%Z', 'zzz': '%Z',
+}
+# the timezones ending a format are checked with these regexes: strptime only
+# knows %z on Python 3 (and "Z" or "+01:00" since 3.7), %Z only for a few zones
+_TIMEZONE_RES = {
+    '%z': re.compile(r'(?:Z|[+-]\d{2}(?::?\d{2})?)$'),
+    '%Z': re.compile(r'(?:[A-Za-z]{1,5}|GMT[+-]\d{1,2}:\d{2})$'),
+}
+_DATETIME_TOKEN_RE = re.compile(r"'((?:[^']|'')*)'|([a-zA-Z])\2*|[^a-zA-Z']+")
+
+
+def java_to_strptime(java_format):
+    """
+        Convert a Java SimpleDateFormat pattern to a ``datetime.strptime`` format.
+
+        Raise ValueError on patterns that strptime can't handle.
+    """
+    ret = ''
+    for match in _DATETIME_TOKEN_RE.finditer(java_format):
+        literal, letter = match.group(1), match.group(2)
+        if literal is not None:
+            ret += (literal.replace("''", "'") or "'").replace('%', '%%')
+        elif letter:
+            try:
+                ret += _DATETIME_DIRECTIVES[match.group(0)]
+            except KeyError:
+                raise ValueError('unsupported pattern %s in date format %s' % (match.group(0), java_format))
+        else:
+            ret += match.group(0).replace('%', '%%')
+    return ret
+
+
+class DateTimeMatcher(ValueMatcher):
+    """
+        Matches the v3 ``date``, ``time`` and ``timestamp`` rules.
+
+        The format is converted once to a strptime format so that each value is
+        checked with the parser of the datetime module, except for a timezone
+        ending the format, checked with a regex. A format that can't be
+        converted is kept in ``error`` and reported for every value.
+    """
+    def __init__(self, rule, java_format=None):
+        self.rule = rule
+        self.java_format = java_format or DATETIME_FORMATS[rule]
+        self.error = None
+        self.timezone = None
+        try:
+            self.format = java_to_strptime(self.java_format)
+        except ValueError as e:
+            self.format, self.error = None, str(e)
+            return
+        self._parse_format = self.format
+        if self.format[-2:] in _TIMEZONE_RES and not self.format.endswith('%%' + self.format[-1]):
+            self.timezone = _TIMEZONE_RES[self.format[-2:]]
+            self._parse_format = self.format[:-2]
+
+    def diff(self, actual, expected):
+        if self.error is not None:
+            return RuleNotMatched(actual, '%s %s (%s)' % (self.rule, self.java_format, self.error))
+        try:
+            value = actual
+            if self.timezone is not None:
+                timezone = self.timezone.search(actual)
+                if timezone is None:
+                    raise ValueError('no timezone')
+                value = actual[:timezone.start()]
+            datetime.strptime(value, self._parse_format)
+        except (TypeError, ValueError):
+            return RuleNotMatched(actual, '%s %s' % (self.rule, self.java_format))
+
+
+class IncludeMatcher(ValueMatcher):
+    """Matches strings including ``value``."""
+    def __init__(self, value):
+        self.value = value
+
+    def diff(self, actual, expected):
+        if not isinstance(actual, type(self.value)) or self.value not in actual:
+            return RuleNotMatched(actual, 'include %s' % self.value)
+
+
+class ValuesMatcher(ValueMatcher):
+    """
+        Matches maps whatever their keys: the validator compares each actual
+        value with the expected ones instead of matching keys.
+    """
+    def diff(self, actual, expected):
+        if type(actual) != dict:
+            return TypeNotMatched(actual, expected)
+
+
+class CombinedMatcher(ValueMatcher):
+    """Combines a list of matchers with AND (all must match) or OR (at least one must match)."""
+    def __init__(self, matchers, combine='AND'):
+        if combine not in ('AND', 'OR'):
+            raise ValueError('unknown combine %s, expected AND or OR' % combine)
+        self.matchers = matchers
+        self.combine = combine
+        # the validator compares unordered arrays itself: it checks the other rules with ``others``
+        unordered = [x for x in matchers if isinstance(x, UnorderedMatcher)]
+        others = [x for x in matchers if not isinstance(x, UnorderedMatcher)]
+        self.unordered = unordered[0] if unordered else None
+        self.others = CombinedMatcher(others, combine) if unordered and others else None
+
+    def diff(self, actual, expected):
+        diffs = []
+        for matcher in self.matchers:
+            diff = matcher.diff(actual, expected)
+            if diff and self.combine == 'AND':
+                return diff
+            if not diff and self.combine == 'OR':
+                return None
+            diffs.append(diff)
+        if self.combine == 'OR' and diffs:
+            return diffs[0]
+
+
+class UnorderedMatcher(ValueMatcher):
+    """
+        Matches arrays whatever the order of their elements.
+
+        Elements are canonicalized and hashed so that identical elements are
+        paired in linear time. When other rules apply to the elements, the
+        validator compares the remaining ones pairwise.
+    """
+    @staticmethod
+    def canonical(value):
+        return json.dumps(value, sort_keys=True, separators=(',', ':'), default=repr)
+
+    def pair(self, actual, expected):
+        """
+            Pair the identical elements of ``actual`` and ``expected``.
+
+            Return: (pairs, actual_left, expected_left) where pairs maps indices
+                of actual to indices of expected, and actual_left and
+                expected_left are the indices left unpaired.
+        """
+        index = defaultdict(deque)
+        for j, value in enumerate(expected):
+            index[self.canonical(value)].append(j)
+        pairs, actual_left = {}, []
+        for i, value in enumerate(actual):
+            candidates = index.get(self.canonical(value))
+            if candidates:
+                pairs[i] = candidates.popleft()
+            else:
+                actual_left.append(i)
+        expected_left = sorted(j for candidates in index.values() for j in candidates)
+        return pairs, actual_left, expected_left
+
+    def diff(self, actual, expected):
+        if type(actual) not in (list, tuple):
+            return TypeNotMatched(actual, expected)
+        _pairs, actual_left, expected_left = self.pair(actual, expected)
+        if actual_left or expected_left:
+            return Difference(actual, expected)
+
+
 def get_best_matcher(matchers, path):
     """
-        Get the ValueMatcher that best matches path (in terms of weight).
+        Get the ValueMatcher that best matches path (in terms of weight, see ``PathMatcher.rank``).
+
+        The PathMatchers ranked after the best one found so far are not tested,
+        so that with the sorted lists built by ``compile_matchers`` the first
+        matching PathMatcher is returned.
 
         Args:
             matchers, list: a list of (PathMatcher, ValueMatcher)
@@ -207,7 +479,55 @@ def get_best_matcher(matchers, path):
 
         Return: ValueMatcher or None
     """
-    if matchers:
-        path_matcher, value_matcher = max(matchers, key=lambda x: x[0].weight(path))
-        if path_matcher.weight(path):
-            return value_matcher
+    best = None
+    for path_matcher, value_matcher in matchers:
+        if (best is None or path_matcher.rank < best[0].rank) and path_matcher.match(path):
+            best = path_matcher, value_matcher
+    if best is not None:
+        return best[1]
+
+
+def _ancestors(path):
+    """Yield ``path`` and the paths of its ancestors, in bracket notation."""
+    for i, char in enumerate(path):
+        if char == ']' and (i + 1 == len(path) or path[i + 1] == '['):
+            yield path[:i + 1]
+
+
+def _winner(path_matcher, by_prefix, by_signature):
+    """Return the PathMatcher already compiled always chosen instead of ``path_matcher``, or None."""
+    same = by_signature.get(path_matcher.signature)
+    if same is not None:
+        return same
+    if path_matcher.literal:
+        for prefix in _ancestors(path_matcher.prefix):
+            for other in by_prefix.get(prefix, ()):
+                if other.match(path_matcher.prefix):
+                    return other
+    return None
+
+
+def compile_matchers(rules):
+    """
+        Compile ``{jsonpath: rule}`` into a list of (PathMatcher, ValueMatcher) for ``get_best_matcher``.
+
+        The list is sorted by ``PathMatcher.rank``, so that the selection does
+        not depend on the order of ``rules``, and the rules that can never be
+        chosen (same jsonpath as a better ranked rule, or a path always matched
+        by a better ranked rule) are logged and left out.
+    """
+    compiled = sorted(
+        ((PathMatcher.from_jsonpath(jsonpath), ValueMatcher.from_dict(rule)) for jsonpath, rule in rules.items()),
+        key=lambda x: x[0].rank,
+    )
+    kept, by_prefix, by_signature = [], {}, {}
+    for path_matcher, value_matcher in compiled:
+        winner = _winner(path_matcher, by_prefix, by_signature)
+        if winner is not None:
+            logger.warning('matching rule %s is never used, %s always applies instead',
+                           path_matcher.jsonpath, winner.jsonpath)
+            continue
+        kept.append((path_matcher, value_matcher))
+        by_prefix.setdefault(path_matcher.prefix, []).append(path_matcher)
+        by_signature.setdefault(path_matcher.signature, path_matcher)
+    return kept
@@ -0,0 +1,115 @@
+"""Provides an on-disk store of recorded interactions for the mock service"""
+from collections import defaultdict
+import json
+import os
+
+from .validator import CompiledRequestExpectation
+
+
+def client_proxy(client):
+    """
+    Build a proxy for ``MockService`` forwarding requests through a verifier
+    client (a ``verifiers.base.PactClientMock``, e.g. ``verifiers.http.HttpClient``).
+    """
+    def proxy(request):
+        method = getattr(client, request['method'].lower())
+        return method(
+            client,
+            path=request['path'],
+            data=request.get('data', request.get('body')),  # the payload is in data, like in Provider.send_request
+            headers=request.get('headers', None),
+            query=request.get('query', None),
+        )
+    return proxy
+
+
+class InteractionStore(object):
+    """
+    Append-only on-disk store of recorded request/response pairs.
+
+    Records are appended as json lines to ``path``. An index file
+    (``path + '.index'``) stores the offset of each record by method and path,
+    so that opening the store only reads the index and a replay only reads
+    the records of the requested method and path, once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.index'
+        self._index = defaultdict(list)
+        self._records = {}
+        self._expectations = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r') as f:
+                for line in f:
+                    method, path, offset = json.loads(line)
+                    self._index[method, path].append(offset)
+
+    @staticmethod
+    def _key(request):
+        return request['method'].lower(), request['path']
+
+    def append(self, request, response):
+        """
+        Record a request and its response.
+        """
+        record = {'request': request, 'response': response}
+        with open(self.path, 'ab') as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write((json.dumps(record, sort_keys=True) + '\n').encode('utf-8'))
+        method, path = self._key(request)
+        with open(self.index_path, 'a') as f:
+            f.write(json.dumps([method, path, offset]) + '\n')
+        self._index[method, path].append(offset)
+        self._records[offset] = record
+
+    def _read(self, offset):
+        if offset not in self._records:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                self._records[offset] = json.loads(f.readline().decode('utf-8'))
+        return self._records[offset]
+
+    def lookup(self, method, path):
+        """
+        Return the records of the requests to ``path`` with ``method``, oldest first.
+        """
+        return [self._read(offset) for offset in self._index.get((method.lower(), path), [])]
+
+    def replay(self, request):
+        """
+        Return the recorded response of the first record whose request matches
+        ``request``, or None.
+
+        Recorded headers are not compared: they mostly hold client details
+        (user agent, tracing...) which change from one run to the other.
+        """
+        for offset in self._index.get(self._key(request), []):
+            if offset not in self._expectations:
+                recorded = dict(self._read(offset)['request'])
+                recorded.pop('headers', None)
+                self._expectations[offset] = CompiledRequestExpectation(recorded)
+            if self._expectations[offset].matches(request):
+                return self._read(offset)['response']
+        return None
+
+    def interactions(self):
+        """
+        Return the recorded request/response pairs as pact interactions,
+        without duplicates.
+        """
+        interactions, seen = [], set()
+        for offset in sorted(offset for offsets in self._index.values() for offset in offsets):
+            record = self._read(offset)
+            key = json.dumps(record, sort_keys=True)
+            if key in seen:
+                continue
+            seen.add(key)
+            interactions.append({
+                'provider_state': None,
+                'description': '%s %s' % (record['request']['method'].upper(), record['request']['path']),
+                'request': record['request'],
+                'response': record['response'],
+            })
+        return interactions
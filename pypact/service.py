@@ -1,21 +1,81 @@
+from contextlib import contextmanager
 import json
 
 from .exceptions import PyPactServiceException
 
 
+# lists of the services created while they are registered, see collect_services
+_collectors = []
+
+
+@contextmanager
+def collect_services():
+    """
+    Collect the ``MockService`` instances created inside the context.
+
+    Usage:
+        with service.collect_services() as services:
+            pytest.main(['test_consumer.py'])
+        interactions = [x.interactions for x in services]
+    """
+    services = []
+    _collectors.append(services)
+    try:
+        yield services
+    finally:
+        _collectors.remove(services)
+
+
+def party_name(party):
+    """Return the name of a consumer or provider, given as an object with a name or as a string."""
+    return getattr(party, 'name', party)
+
+
+def pact_document(consumer, provider, interactions):
+    """Return the pact between ``consumer`` and ``provider`` made of ``interactions``."""
+    return {
+        'provider': {
+            'name': party_name(provider),
+        },
+        'consumer': {
+            'name': party_name(consumer),
+        },
+        'interactions': interactions,
+        'metadata': {
+            'pact-specification': {
+                'version': '1.0.0',
+            },
+            'pypact': {
+                'version': '0.1.0',
+            }
+        }
+    }
+
+
 class MockService(object):
     """
     Interface to interact with pact mock server.
+
+    With a ``store`` (a ``recorder.InteractionStore``), requests matching none
+    of the interactions are replayed from the recordings of the store. With a
+    ``proxy`` as well (a callable taking a request and returning the response
+    of a provider stand-in, see ``recorder.client_proxy``), requests which
+    were never recorded are forwarded to the proxy and recorded.
     """
 
-    def __init__(self, consumer, provider, port, interaction_builder=None):
+    def __init__(self, consumer, provider, port, interaction_builder=None, store=None, proxy=None):
         self.consumer = consumer
         self.provider = provider
         self.port = port
         self.interaction_builder = interaction_builder
+        self.store = store
+        self.proxy = proxy
 
         self.stopped = True
         self.interactions = []
+        self._expectations = []
+        for services in _collectors:
+            services.append(self)
 
     def given(self, state):
         return self.interaction_builder(self.add_interaction).given(state)
@@ -31,6 +91,54 @@ class MockService(object):
         """
         self.interactions.append(interaction)
 
+    def _compiled_expectations(self):
+        # compiled on first use, once per interaction
+        from .validator import CompiledRequestExpectation
+        while len(self._expectations) < len(self.interactions):
+            interaction = self.interactions[len(self._expectations)]
+            self._expectations.append(CompiledRequestExpectation(interaction['request']))
+        return self._expectations
+
+    def match_request(self, request):
+        """
+        Return the first interaction whose request matches ``request``, or None.
+
+        The expected requests are normalized and their matching rules compiled
+        only once, when the first request is checked against them.
+        """
+        for interaction, expectation in zip(self.interactions, self._compiled_expectations()):
+            if expectation.matches(request):
+                return interaction
+        return None
+
+    def handle_request(self, request):
+        """
+        Return the response to ``request``: the one of the first matching
+        interaction, else the recorded one, else the one of the proxy (which is
+        then recorded).
+        """
+        interaction = self.match_request(request)
+        if interaction is not None:
+            return interaction['response']
+        if self.store is not None:
+            response = self.store.replay(request)
+            if response is not None:
+                return response
+            if self.proxy is not None:
+                response = self.proxy(request)
+                self.store.append(request, response)
+                return response
+        raise PyPactServiceException(
+            "No interaction matches request %s %s." % (request['method'].upper(), request['path']))
+
+    def add_recorded_interactions(self):
+        """
+        Add the interactions recorded in the store to the mock service, so that
+        they are published with the pact.
+        """
+        for interaction in self.store.interactions():
+            self.add_interaction(interaction)
+
     def start(self):
         """
         Start the mock service, loading the interactions into the pact server.
@@ -51,27 +159,21 @@ class MockService(object):
 
         self.stopped = True
 
-    def publish(self, filename=None):
-        pact = json.dumps({
-            'provider': {
-                'name': self.provider,
-            },
-            'consumer': {
-                'name': self.provider,
-            },
-            'interactions': self.interactions,
-            'metadata': {
-                'pact-specification': {
-                    'version': '1.0.0',
-                },
-                'pypact': {
-                    'version': '0.1.0',
-                }
-            }
-        })
+    def publish(self, filename=None, binary=False):
+        """
+        Return the pact of the interactions as JSON, or in the binary encoding
+        of ``pypact.binary`` (bytes) with ``binary``, and write it to
+        ``filename`` when given.
+        """
+        document = pact_document(self.consumer, self.provider, self.interactions)
+        if binary:
+            from . import binary as binary_module
+            pact = binary_module.dumps(document)
+        else:
+            pact = json.dumps(document)
 
         if filename is not None:
-            with open(filename, 'w+') as f:
+            with open(filename, 'wb+' if binary else 'w+') as f:
                 f.write(pact)
 
         return pact
@@ -0,0 +1,130 @@
+"""
+Interning of the strings and sharing of the identical subtrees of loaded pacts.
+
+Large pacts repeat the same header names and values, paths, provider states
+and matching rules in thousands of interactions. ``share_pact`` replaces the
+copies by a single immutable object, a ``SharedDict`` or a ``SharedList``,
+interning their strings, so that a loaded pact takes less memory and the
+values derived from a shared object, e.g. the matchers compiled from a
+``matchingRules`` block by ``validator.CompiledExpectation``, are computed
+once for all the interactions using it.
+
+Only the interaction metadata are shared: the bodies are left as loaded. The
+comparison tells containers from leaves by their exact type: the expectations
+compiled by the validator hold plain copies of the shared values, see
+``unshare``.
+"""
+import json
+
+try:
+    STRING_TYPES = (str, unicode)
+except NameError:  # Python 3
+    STRING_TYPES = (str,)
+
+_key = json.JSONEncoder(sort_keys=True, separators=(',', ':')).encode
+
+
+def _immutable(self, *args, **kwargs):
+    raise TypeError('%s objects are shared by several interactions and cannot be modified' % type(self).__name__)
+
+
+class SharedDict(dict):
+    """
+        Immutable dict shared by the interactions of a pact, see ``share_pact``.
+
+        ``compiled_matchers`` caches the matchers compiled from a shared
+        ``matchingRules`` block.
+    """
+    compiled_matchers = None
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+class SharedList(list):
+    """Immutable list shared by the interactions of a pact, see ``share_pact``."""
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = __iadd__ = __imul__ = _immutable
+    append = extend = insert = pop = remove = reverse = sort = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (list(self),))
+
+
+class Interner(object):
+    """Table of the strings and subtrees shared by ``share_pact``, possibly across several pacts."""
+    def __init__(self):
+        self.strings = {}
+        self.subtrees = {}
+
+    def string(self, value):
+        """Return the interned copy of the string ``value``."""
+        return self.strings.setdefault(value, value)
+
+    def share(self, value):
+        """Return the shared copy of ``value``, a JSON value whose dicts and lists are made immutable."""
+        if isinstance(value, STRING_TYPES):
+            return self.string(value)
+        if isinstance(value, (SharedDict, SharedList)) or not isinstance(value, (dict, list)):
+            return value
+        # the subtrees are small (headers, rules, states), their dumps are cheap
+        key = _key(value)
+        shared = self.subtrees.get(key)
+        if shared is None:
+            if isinstance(value, dict):
+                shared = SharedDict((self.string(k), self.share(v)) for k, v in value.items())
+            else:
+                shared = SharedList(self.share(x) for x in value)
+            self.subtrees[key] = shared
+        return shared
+
+    def share_interaction(self, interaction):
+        """Share the metadata of ``interaction`` in place."""
+        for key in ('providerStates', 'provider_state'):
+            if key in interaction:
+                interaction[key] = self.share(interaction[key])
+        for side, keys in (
+            ('request', ('method', 'path', 'query', 'headers', 'matchingRules')),
+            ('response', ('headers', 'matchingRules')),
+        ):
+            tree = interaction.get(side)
+            if not isinstance(tree, dict):
+                continue
+            for key in keys:
+                if key in tree:
+                    tree[key] = self.share(tree[key])
+
+
+def unshare(value):
+    """Return a plain copy of ``value`` if it is shared, e.g. for code comparing ``type(x)`` with dict or list."""
+    if isinstance(value, SharedDict):
+        return dict((k, unshare(v)) for k, v in value.items())
+    if isinstance(value, SharedList):
+        return [unshare(x) for x in value]
+    return value
+
+
+def share_pact(pact, interner=None):
+    """
+        Share the metadata of the interactions of a loaded ``pact`` in place, return the pact.
+
+        Give the same ``interner`` to share the subtrees of several pacts.
+    """
+    interner = Interner() if interner is None else interner
+    for interaction in pact.get('interactions', []):
+        if isinstance(interaction, dict):
+            interner.share_interaction(interaction)
+    return pact
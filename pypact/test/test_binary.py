@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from .. import binary
+from .. import cli
+from ..service import MockService
+from ..verifiers import base
+
+
+def _interaction(path, status=200):
+    return {
+        'description': u'get %s' % path,
+        'providerStates': [{'name': 'some cows', 'params': {}}],
+        'request': {'method': 'GET', 'path': path, 'headers': {'Accept': 'application/json'}},
+        'response': {
+            'status': status,
+            'headers': {'Content-Type': 'application/json'},
+            'body': {
+                'cows': [{'name': u'Marguerite ☘', 'age': 3, 'weight': 612.5, 'calf': None, 'milked': True}],
+                'total': 2 ** 70,
+                'empty': {},
+                'tags': [],
+                'negative': -2 ** 63,
+                'false': False,
+                '': '',
+            },
+        },
+    }
+
+
+PACT = {
+    'provider': {'name': 'zoo'},
+    'consumer': {'name': 'farmer'},
+    'interactions': [_interaction('/cows'), _interaction('/bulls', 404), _interaction('/calves')],
+    'metadata': {'pact-specification': {'version': '1.0.0'}},
+}
+
+
+def test_round_trip():
+    assert binary.loads(binary.dumps(PACT)) == PACT
+    assert binary.loads(binary.dumps({})) == {'interactions': []}
+
+
+def test_strings_are_stored_once():
+    data = binary.dumps(PACT)
+    assert data.count(b'application/json') == 1
+    assert data.count(u'Marguerite ☘'.encode('utf-8')) == 1
+
+
+def test_random_access():
+    pact = binary.BinaryPact(binary.dumps(PACT))
+    document = pact.document
+    assert document['consumer'] == {'name': 'farmer'}
+    interactions = document['interactions']
+    assert len(interactions) == 3
+    assert interactions._decoded == {}
+    assert interactions[1] == PACT['interactions'][1]
+    assert list(interactions._decoded) == [1]
+    assert interactions[-1] == PACT['interactions'][2]
+    assert interactions[1:] == PACT['interactions'][1:]
+    with pytest.raises(IndexError):
+        interactions[3]
+
+
+def test_decoded_strings_are_shared():
+    interactions = binary.BinaryPact(binary.dumps(PACT)).document['interactions']
+    assert interactions[0]['request']['headers']['Accept'] is interactions[2]['request']['headers']['Accept']
+
+
+def test_rejects_other_data():
+    with pytest.raises(binary.BadBinaryPact):
+        binary.BinaryPact(json.dumps(PACT).encode('utf-8'))
+    with pytest.raises(TypeError):
+        binary.dumps({'interactions': [{1: 'cow'}]})
+    with pytest.raises(TypeError):
+        binary.dumps({'interactions': [{'cow': object()}]})
+
+
+def test_json_conversion(tmpdir):
+    source = tmpdir.join('pact.json')
+    source.write(json.dumps(PACT))
+    converted = tmpdir.join('pact.bin')
+    back = tmpdir.join('back.json')
+
+    assert cli.main(['convert', str(source), str(converted)]) == 0
+    assert binary.is_binary(converted.read_binary())
+    assert cli.main(['convert', str(converted), str(back)]) == 0
+    assert json.loads(back.read()) == PACT
+    assert json.loads(binary.to_json(binary.from_json(json.dumps(PACT)))) == PACT
+
+
+def test_publish_and_verify_binary_pact(tmpdir):
+    path = str(tmpdir.join('pact.bin'))
+    service = MockService('farmer', 'zoo', 1234)
+    for interaction in PACT['interactions']:
+        service.add_interaction(interaction)
+    data = service.publish(path, binary=True)
+
+    provider = base.Provider(path, base.PactClientMock())
+    assert provider.pact['consumer'] == {'name': 'farmer'}
+    assert isinstance(provider.pact['interactions'], binary.BinaryInteractions)
+    assert list(provider.pact['interactions']) == PACT['interactions']
+    assert binary.loads(data) == binary.loads(open(path, 'rb').read())
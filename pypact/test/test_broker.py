@@ -0,0 +1,163 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import threading
+
+import pytest
+import requests
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from ..verifiers import base
+from ..verifiers import broker
+
+
+def _pact(consumer):
+    return {
+        'provider': {'name': 'zoo'},
+        'consumer': {'name': consumer},
+        'interactions': [],
+    }
+
+
+class StandInBroker(object):
+    """Local HTTP server serving pacts by path with an ETag, recording the requests it receives."""
+    def __init__(self):
+        self.pacts = {}
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.requests.append((self.path, self.headers.get('If-None-Match')))
+                if self.path not in stand_in.pacts:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                content = json.dumps(stand_in.pacts[self.path]).encode('utf-8')
+                etag = '"%s"' % hashlib.md5(content).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in_broker():
+    stand_in = StandInBroker()
+    yield stand_in
+    stand_in.stop()
+
+
+def test_fetch_pact_revalidates_the_cached_document(stand_in_broker, tmpdir):
+    stand_in_broker.pacts['/pacts/cows'] = _pact('cows')
+    url = stand_in_broker.url + '/pacts/cows'
+    cache = broker.PactCache(str(tmpdir))
+
+    assert broker.fetch_pact(url, cache) == _pact('cows')
+    assert broker.fetch_pact(url, broker.PactCache(str(tmpdir))) == _pact('cows')
+    assert stand_in_broker.requests[0][1] is None
+    assert stand_in_broker.requests[1][1] == cache.etag(url)
+
+    stand_in_broker.pacts['/pacts/cows'] = _pact('bulls')
+    assert broker.fetch_pact(url, cache) == _pact('bulls')
+    assert len(tmpdir.listdir(lambda x: x.basename != 'refs.json')) == 2
+
+
+def test_fetch_pact_stores_identical_documents_once(stand_in_broker, tmpdir):
+    stand_in_broker.pacts['/pacts/cows/latest'] = _pact('cows')
+    stand_in_broker.pacts['/pacts/cows/1.0'] = _pact('cows')
+    cache = broker.PactCache(str(tmpdir))
+
+    first = broker.fetch_pact(stand_in_broker.url + '/pacts/cows/latest', cache)
+    second = broker.fetch_pact(stand_in_broker.url + '/pacts/cows/1.0', cache)
+
+    assert first == second
+    first['interactions'].append({})
+    assert second['interactions'] == []
+    assert len(tmpdir.listdir(lambda x: x.basename != 'refs.json')) == 1
+
+
+def test_fetch_pact_without_cache(stand_in_broker):
+    stand_in_broker.pacts['/pacts/cows'] = _pact('cows')
+    assert broker.fetch_pact(stand_in_broker.url + '/pacts/cows') == _pact('cows')
+    with pytest.raises(requests.HTTPError):
+        broker.fetch_pact(stand_in_broker.url + '/pacts/unknown')
+
+
+def test_fetch_pacts_concurrently(stand_in_broker, tmpdir):
+    consumers = ['consumer%d' % i for i in range(8)]
+    for consumer in consumers:
+        stand_in_broker.pacts['/pacts/%s' % consumer] = _pact(consumer)
+    urls = [stand_in_broker.url + '/pacts/%s' % consumer for consumer in consumers]
+
+    pacts = broker.fetch_pacts(urls, broker.PactCache(str(tmpdir)), workers=3)
+
+    assert [x['consumer']['name'] for x in pacts] == consumers
+
+
+def test_provider_accepts_a_pact_url(stand_in_broker, tmpdir):
+    stand_in_broker.pacts['/pacts/cows'] = _pact('cows')
+    provider = base.Provider(
+        stand_in_broker.url + '/pacts/cows', base.PactClientMock(), pact_cache=broker.PactCache(str(tmpdir)))
+    assert provider.get_and_assert_key('consumer.name') == 'cows'
+
+
+class CowClient(base.PactClientMock):
+    def get(self, *args, **kwargs):
+        return {'status': 200, 'headers': {}, 'body': {'id': 2}}
+
+    @contextmanager
+    def set_up(self, init_states):
+        yield
+
+
+def _pact_with_rules(consumer):
+    pact = _pact(consumer)
+    pact['interactions'] = [{
+        'description': 'get a cow',
+        'request': {'method': 'GET', 'path': '/cows/2'},
+        'response': {'status': 200, 'body': {'id': 1}, 'matchingRules': {'$.body.id': {'match': 'type'}}},
+    }]
+    return pact
+
+
+def test_providers_verify_the_same_cached_pact(stand_in_broker, tmpdir):
+    stand_in_broker.pacts['/pacts/cows'] = _pact_with_rules('cows')
+    cache = broker.PactCache(str(tmpdir))
+
+    for _ in range(2):
+        provider = base.Provider(stand_in_broker.url + '/pacts/cows', CowClient(), pact_cache=cache)
+        assert provider.verification_report('cows').passed
+
+
+def test_verify_pacts_served_under_several_urls(stand_in_broker, tmpdir):
+    stand_in_broker.pacts['/pacts/cows/latest'] = _pact_with_rules('cows')
+    stand_in_broker.pacts['/pacts/cows/1.0'] = _pact_with_rules('cows')
+    urls = [stand_in_broker.url + '/pacts/cows/latest', stand_in_broker.url + '/pacts/cows/1.0']
+
+    reports = base.verify_pacts(urls, CowClient(), pact_cache=broker.PactCache(str(tmpdir)))
+
+    assert [report.passed for report in reports] == [True, True]
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from .. import cli
+from ..service import MockService, collect_services
+
+
+CONSUMER_MODULE = '''
+from pypact import Consumer, Interaction, Provider
+
+
+def test_{name}():
+    service = Consumer('Farmer').has_pact_with(Provider('Zoo'), port=1234)
+    service.interaction_builder = Interaction
+    (service
+        .upon_receiving('a request for {name}')
+        .with_request(method='get', path='/{name}')
+        .will_respond_with(status={status}))
+    (service
+        .upon_receiving('a request for cows')
+        .with_request(method='get', path='/cows')
+        .will_respond_with(status=200))
+'''
+
+
+def _result(path, *interactions):
+    return cli.ModuleResult(path, 0, 0., [('farmer', 'zoo', list(interactions))])
+
+
+def _interaction(description, status=200):
+    return {
+        'provider_state': None,
+        'description': description,
+        'request': {'method': 'get', 'path': '/'},
+        'response': {'status': status},
+    }
+
+
+def test_collect_services():
+    with collect_services() as services:
+        service = MockService('farmer', 'zoo', 1234)
+    MockService('farmer', 'zoo', 1234)
+    assert services == [service]
+
+
+def test_discover(tmpdir):
+    tmpdir.join('test_cows.py').write('')
+    tmpdir.join('helpers.py').write('')
+    tmpdir.mkdir('bulls').join('test_bulls.py').write('')
+    assert cli.discover([str(tmpdir)]) == [
+        str(tmpdir.join('bulls', 'test_bulls.py')),
+        str(tmpdir.join('test_cows.py')),
+    ]
+
+
+def test_merge_pacts():
+    pacts, conflicts = cli.merge_pacts([
+        _result('test_a.py', _interaction('cows'), _interaction('bulls')),
+        _result('test_b.py', _interaction('cows'), _interaction('bulls', 404), _interaction('calves')),
+    ])
+    assert list(pacts) == [('farmer', 'zoo')]
+    assert [x['description'] for x in pacts['farmer', 'zoo']] == ['cows', 'bulls', 'calves']
+    assert pacts['farmer', 'zoo'][1]['response']['status'] == 200
+    assert conflicts == [
+        "test_b.py: interaction 'bulls' of farmer with zoo conflicts with the one of test_a.py",
+    ]
+
+
+def test_merge_pacts_with_structured_states():
+    first = dict(_interaction('cows'), provider_state={'herd': ['Mary']})
+    second = dict(_interaction('cows', 404), provider_state={'herd': ['Mary']})
+    pacts, conflicts = cli.merge_pacts([_result('test_a.py', first, dict(first, provider_state=['Marie'])),
+                                        _result('test_b.py', second)])
+    assert len(pacts['farmer', 'zoo']) == 2
+    assert len(conflicts) == 1
+
+
+def test_pact_filename():
+    assert cli.pact_filename('My Consumer', 'the-provider') == 'my_consumer-the_provider.json'
+
+
+@pytest.mark.integration
+def test_generate(tmpdir):
+    tests = tmpdir.mkdir('tests')
+    tests.join('test_bulls.py').write(CONSUMER_MODULE.format(name='bulls', status=200))
+    tests.join('test_calves.py').write(CONSUMER_MODULE.format(name='calves', status=404))
+    pact_dir = tmpdir.join('pacts')
+
+    assert cli.main(['generate', '--workers', '2', '--timeout', '60', '--pact-dir', str(pact_dir), str(tests)]) == 0
+
+    pact = json.loads(pact_dir.join('farmer-zoo.json').read())
+    assert pact['consumer'] == {'name': 'Farmer'}
+    assert pact['provider'] == {'name': 'Zoo'}
+    assert [x['description'] for x in pact['interactions']] == [
+        'a request for bulls', 'a request for cows', 'a request for calves',
+    ]
+
+
+@pytest.mark.integration
+def test_generate_timeout(tmpdir):
+    tests = tmpdir.mkdir('tests')
+    tests.join('test_slow.py').write('import time\n\n\ndef test_slow():\n    time.sleep(30)\n')
+    pact_dir = tmpdir.join('pacts')
+
+    with tmpdir.join('out').open('w') as out:
+        assert cli.generate([str(tests)], str(pact_dir), workers=1, timeout=0.5, out=out) == 1
+    assert 'aborting' in tmpdir.join('out').read()
+    assert not pact_dir.check()
@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+import importlib
+import sys
+import types
+
+import pytest
+
+
+class FakeTransaction(object):
+    """Stand-in for ``django.db.transaction`` logging the calls the DRF client makes."""
+    def __init__(self):
+        self.calls = []
+        self.savepoints = 0
+
+    @contextmanager
+    def atomic(self, using):
+        self.calls.append('atomic')
+        yield
+        self.calls.append('end atomic')
+
+    def set_rollback(self, rollback, using):
+        self.calls.append('set rollback')
+
+    def savepoint(self, using):
+        self.savepoints += 1
+        sid = 's%d' % self.savepoints
+        self.calls.append(('savepoint', sid))
+        return sid
+
+    def savepoint_rollback(self, sid, using):
+        self.calls.append(('rollback', sid))
+
+    def savepoint_commit(self, sid, using):
+        self.calls.append(('release', sid))
+
+
+class StateFactory(object):
+    def __init__(self, transaction):
+        self.transaction = transaction
+
+    def cow(self, name):
+        self.transaction.calls.append('cow %s' % name)
+        return name
+
+    def bull(self):
+        self.transaction.calls.append('bull')
+
+
+@pytest.fixture
+def drf(monkeypatch):
+    """The drf verifier module bound to a FakeTransaction, whether Django is installed or not."""
+    transaction = FakeTransaction()
+    django = types.ModuleType('django')
+    django.db = types.ModuleType('django.db')
+    django.db.DEFAULT_DB_ALIAS = 'default'
+    django.db.transaction = transaction
+    monkeypatch.setitem(sys.modules, 'django', django)
+    monkeypatch.setitem(sys.modules, 'django.db', django.db)
+    name = __package__.rsplit('.', 1)[0] + '.verifiers.drf'
+    monkeypatch.delitem(sys.modules, name, raising=False)
+    module = importlib.import_module(name)
+    yield module
+    sys.modules.pop(name, None)
+
+
+def _set_up(client, *states_list):
+    for states in states_list:
+        with client.set_up(init_states=states):
+            client.state_factory.transaction.calls.append('request')
+
+
+def test_set_up_without_savepoints(drf):
+    transaction = drf.transaction
+    client = drf.DjangoRestFrameworkClient(None, StateFactory(transaction))
+    _set_up(client, [('cow', {'name': 'Mary'})], [])
+
+    assert transaction.calls == ['atomic', 'cow Mary', 'request', 'end atomic', 'atomic', 'request', 'end atomic']
+
+
+def test_savepoints_keep_the_common_states(drf):
+    transaction = drf.transaction
+    client = drf.DjangoRestFrameworkClient(None, StateFactory(transaction))
+    with client.savepoints(base_fixtures=lambda: transaction.calls.append('fixtures')):
+        _set_up(
+            client,
+            [('cow', {'name': 'Mary'})],
+            [('cow', {'name': 'Mary'}), ('bull', {})],
+            [('cow', {'name': 'Marie'})],
+        )
+
+    assert transaction.calls == [
+        'atomic', 'fixtures',
+        ('savepoint', 's1'), 'cow Mary', ('savepoint', 's2'), 'request', ('rollback', 's2'), ('release', 's2'),
+        ('savepoint', 's3'), 'bull', ('savepoint', 's4'), 'request', ('rollback', 's4'), ('release', 's4'),
+        ('rollback', 's1'), ('release', 's1'),
+        ('savepoint', 's5'), 'cow Marie', ('savepoint', 's6'), 'request', ('rollback', 's6'), ('release', 's6'),
+        'set rollback', 'end atomic',
+    ]
+    assert client._states is None
+
+
+def test_savepoints_keep_states_builds_each_state_once(drf):
+    transaction = drf.transaction
+    client = drf.DjangoRestFrameworkClient(None, StateFactory(transaction))
+    mary, bull = [('cow', {'name': 'Mary'})], [('bull', {})]
+    with client.savepoints(keep_states=True):
+        _set_up(client, mary, bull, mary, bull)
+        assert client._kept_states == {('cow', '{"name": "Mary"}'): 'Mary', ('bull', '{}'): None}
+
+    built = [x for x in transaction.calls if x in ('cow Mary', 'bull')]
+    assert built == ['cow Mary', 'bull']
+    interactions = [x for x in transaction.calls if isinstance(x, tuple)]
+    assert interactions == [
+        (action, 's%d' % i) for i in range(1, 5) for action in ('savepoint', 'rollback', 'release')
+    ]
+    assert client._kept_states is None
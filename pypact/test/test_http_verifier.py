@@ -0,0 +1,99 @@
+import json
+import tempfile
+
+import pytest
+import requests_mock
+
+from ..verifiers import base
+from ..verifiers import http
+
+
+TEST_BASE_URI = 'http://provider'
+
+
+PACT = {
+    "provider": {"name": "myAwesomeService"},
+    "consumer": {"name": "anotherService"},
+    "interactions": [
+        {
+            "description": "a request for cows",
+            "request": {"method": "GET", "path": "/zoo/cows", "query": {"name": "Mary"}},
+            "response": {"status": 200, "body": {"cows": ["Mary"]}},
+        },
+        {
+            "description": "a request for pigs",
+            "request": {"method": "GET", "path": "/zoo/pigs"},
+            "response": {"status": 200, "body": {"pigs": []}},
+        },
+        {
+            "description": "a new cow",
+            "providerStates": [{"name": "a zoo", "params": {}}],
+            "request": {"method": "POST", "path": "/zoo/cows", "data": {"name": "Marie"}},
+            "response": {"status": 201},
+        },
+    ]
+}
+
+
+@pytest.fixture
+def adapter():
+    adapter = requests_mock.Adapter()
+    adapter.register_uri('GET', '%s/zoo/cows' % TEST_BASE_URI, json={'cows': ['Mary']})
+    adapter.register_uri('GET', '%s/zoo/pigs' % TEST_BASE_URI, json={'pigs': ['Babe']})
+    adapter.register_uri('POST', '%s/zoo/cows' % TEST_BASE_URI, status_code=201)
+    adapter.register_uri('POST', '%s/states' % TEST_BASE_URI)
+    return adapter
+
+
+@pytest.fixture
+def client(adapter):
+    client = http.HttpClient(TEST_BASE_URI, state_setup_uri='%s/states' % TEST_BASE_URI)
+    client.session.mount(TEST_BASE_URI, adapter)  # longer prefix than the pooled adapter's
+    return client
+
+
+@pytest.fixture
+def provider(client):
+    with tempfile.NamedTemporaryFile(mode='w') as f:
+        json.dump(PACT, f)
+        f.flush()
+        return base.Provider(f.name, client)
+
+
+def test_http_client_request(client, adapter):
+    response = client.get(client, path='/zoo/cows', data=None, headers={'X-Test': '1'}, query={'name': 'Mary'})
+
+    assert response['status'] == 200
+    assert response['body'] == {'cows': ['Mary']}
+    assert adapter.last_request.qs == {'name': ['mary']}
+    assert adapter.last_request.headers['X-Test'] == '1'
+
+
+def test_http_client_sends_json_data(client, adapter):
+    client.post(client, path='zoo/cows', data={'name': 'Marie'}, headers=None, query=None)
+
+    assert adapter.last_request.json() == {'name': 'Marie'}
+
+
+def test_http_client_set_up_posts_states(client, adapter):
+    with client.set_up(init_states=[('a_zoo', {'size': 1})]):
+        pass
+
+    assert adapter.last_request.url == '%s/states' % TEST_BASE_URI
+    assert adapter.last_request.json() == {'state': 'a_zoo', 'params': {'size': 1}}
+
+
+def test_verify_concurrently(provider, adapter):
+    results = http.verify_concurrently(provider, 'anotherService', workers=2)
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert [bool(result.diff) for result in results] == [False, True, False]
+    assert all(result.latency >= 0 for result in results)
+    assert adapter.call_count == 4  # three interactions and one provider state
+
+
+def test_latency_percentiles():
+    results = [http.InteractionResult(i, None, '', latency) for i, latency in enumerate([4, 1, 3, 2])]
+
+    assert http.latency_percentiles(results, percentiles=(25, 50, 100)) == {25: 1, 50: 2, 100: 4}
+    assert http.latency_percentiles([], percentiles=(50,)) == {50: None}
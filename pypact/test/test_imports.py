@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def _loaded_modules(statement):
+    output = subprocess.check_output([
+        sys.executable, '-c', '%s; import sys; print(" ".join(sorted(sys.modules)))' % statement,
+    ])
+    return set(output.decode('utf-8').split())
+
+
+def _imported_modules(statement):
+    """Return the modules loaded by ``statement``, except the ones loaded on the interpreter start up."""
+    return _loaded_modules(statement) - _loaded_modules('pass')
+
+
+@pytest.mark.parametrize('statement', ['import pypact', 'import pypact.verifiers'])
+def test_importing_the_package_does_not_load_the_heavy_dependencies(statement):
+    modules = _imported_modules(statement)
+    for module in ('requests', 'django', 'difflib', 'urlparse', 'xml.etree', 'pypact.validator'):
+        assert module not in modules
+
+
+def test_importing_the_base_verifier_does_not_load_the_http_stack():
+    modules = _imported_modules('import pypact.verifiers.base')
+    for module in ('requests', 'django', 'difflib', 'urlparse', 'xml.etree'):
+        assert module not in modules
+    assert 'pypact.validator' in modules
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='module __getattr__ requires Python 3.7')
+def test_submodules_are_loaded_on_attribute_access():
+    modules = _imported_modules('import pypact; pypact.verifiers.base')
+    assert 'pypact.verifiers.base' in modules
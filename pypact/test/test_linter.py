@@ -0,0 +1,120 @@
+import json
+
+from .. import linter
+
+
+def _pact(*interactions):
+    return {
+        'consumer': {'name': 'farmer'},
+        'provider': {'name': 'zoo'},
+        'interactions': list(interactions),
+    }
+
+
+def _interaction(description='get cows', path='/cows', body=None, matching_rules=None):
+    response = {'status': 200, 'body': body if body is not None else {'cows': [{'name': 'Mary', 'age': 3}]}}
+    if matching_rules is not None:
+        response['matchingRules'] = matching_rules
+    return {
+        'description': description,
+        'providerStates': [{'name': 'some cows', 'params': {}}],
+        'request': {'method': 'GET', 'path': path, 'query': 'page=1', 'headers': {'Accept': 'application/json'}},
+        'response': response,
+    }
+
+
+def _codes(diagnostics):
+    return [(diagnostic.location, diagnostic.code) for diagnostic in diagnostics]
+
+
+def test_lint_valid_pact():
+    assert linter.lint(_pact(_interaction(matching_rules={
+        '$.body.cows': {'min': 1},
+        '$.body.cows[*].name': {'match': 'regex', 'regex': '^[A-Z]'},
+        '$.body.cows[*].age': {'match': 'integer'},
+    }))) == []
+
+
+def test_lint_structure():
+    interaction = _interaction()
+    del interaction['description']
+    interaction['providerStates'][0].pop('params')
+    interaction['request']['method'] = 'FETCH'
+    interaction['response']['status'] = '200'
+    pact = _pact(interaction, 'oops')
+    del pact['provider']['name']
+
+    assert _codes(linter.lint(pact)) == [
+        ('provider.name', 'missing-key'),
+        ('interactions[0].description', 'missing-key'),
+        ('interactions[0].providerStates[0].params', 'missing-key'),
+        ('interactions[0].request.method', 'invalid-method'),
+        ('interactions[0].response.status', 'invalid-type'),
+        ('interactions[1]', 'invalid-type'),
+    ]
+    assert _codes(linter.lint([])) == [('', 'invalid-type')]
+
+
+def test_lint_matching_rules():
+    diagnostics = linter.lint(_pact(_interaction(matching_rules={
+        '$.body.cows[x]': {'match': 'type'},
+        '$.body.cows[*].age': {'match': 'regex'},
+        '$.body.cows[0].age': {'match': 'roman'},
+        '$.body.bulls': {'match': 'type'},
+        '$.body.*[0].name': {'match': 'type'},
+        '$.body.cows[*].name': {'match': 'regex', 'regex': '^[A-Z]'},
+        '$.body.cows[0].name': {'match': 'type'},
+        "$.body.cows[0]['name']": {'match': 'regex', 'regex': '^M'},
+        '$.body.cows': {'min': 1},
+        '$.body.cows.*': {'match': 'type'},
+    })))
+    location = "interactions[0].response.matchingRules['%s']"
+    assert sorted(_codes(diagnostics)) == sorted([
+        (location % '$.body.cows[x]', 'invalid-jsonpath'),
+        (location % '$.body.cows[*].age', 'invalid-rule'),
+        (location % '$.body.cows[0].age', 'unknown-rule'),
+        (location % '$.body.bulls', 'unreachable-rule'),
+        (location % '$.body.*[0].name', 'shadowed-rule'),
+        (location % "$.body.cows[0]['name']", 'shadowed-rule'),
+    ])
+
+
+def test_lint_v3_matching_rules():
+    interaction = _interaction()
+    interaction['request']['matchingRules'] = {
+        'header': {'ACCEPT': {'matchers': [{'match': 'regex', 'regex': 'json'}]}},
+        'query': {'page': {'matchers': [{'match': 'integer'}]}, 'size': {'matchers': [{'match': 'integer'}]}},
+    }
+    assert _codes(linter.lint(_pact(interaction))) == [
+        ("interactions[0].request.matchingRules['$.query['size'][*]']", 'unreachable-rule'),
+    ]
+
+
+def test_lint_combined_rules():
+    diagnostics = linter.lint(_pact(_interaction(matching_rules={
+        '$.body.cows': {'matchers': [{'match': 'type'}, {'match': 'roman'}], 'combine': 'OR'},
+        '$.body.cows[*].name': {'matchers': [{'match': 'date', 'format': 'yyyy-ww'}]},
+    })))
+    location = "interactions[0].response.matchingRules['%s']"
+    assert sorted(_codes(diagnostics)) == [
+        (location % '$.body.cows' + '.matchers[1]', 'unknown-rule'),
+        (location % '$.body.cows[*].name' + '.matchers[0]', 'invalid-rule'),
+    ]
+
+
+def test_lint_duplicate_interactions():
+    diagnostics = linter.lint(_pact(_interaction(), _interaction('other'), _interaction(path='/bulls')))
+    assert _codes(diagnostics) == [('interactions[1]', 'duplicate-interaction')]
+    assert 'interactions[0]' in diagnostics[0].message
+
+
+def test_lint_cli(tmpdir, capsys):
+    valid, invalid = tmpdir.join('valid.json'), tmpdir.join('invalid.json')
+    valid.write(json.dumps(_pact(_interaction())))
+    invalid.write('{"consumer": ')
+
+    assert linter.main([str(valid)]) == 0
+    assert linter.main([str(valid), str(invalid)]) == 1
+    out = capsys.readouterr()[0]
+    assert out.count('\n') == 1
+    assert '[invalid-json]' in out
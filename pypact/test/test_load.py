@@ -0,0 +1,169 @@
+from contextlib import contextmanager
+import json
+import random
+import re
+import threading
+
+import pytest
+
+from .. import validator
+from ..verifiers import base
+from ..verifiers import load
+
+
+REQUEST = {
+    'method': 'GET',
+    'path': '/cows/1',
+    'query': 'page=1&size=20',
+    'headers': {'Accept': 'application/json', 'X-Herd': 'abc-12'},
+    'body': {
+        'ids': [1, 2],
+        'name': 'Mary',
+        'weight': 612.5,
+        'born': '2020-01-01',
+        'tags': ['milk', 'farm'],
+        'milked': True,
+    },
+    'matchingRules': {
+        '$.path': {'match': 'regex', 'regex': '^/cows/[0-9]+$'},
+        "$.headers['x-herd']": {'match': 'regex', 'regex': '[a-z]{3}-[0-9]{2}'},
+        '$.query.page[*]': {'match': 'regex', 'regex': '[1-9][0-9]*'},
+        '$.body.ids': {'min': 1, 'max': 5},
+        '$.body.ids[*]': {'match': 'type'},
+        '$.body.name': {'match': 'type'},
+        '$.body.weight': {'match': 'decimal'},
+        '$.body.born': {'match': 'date'},
+        '$.body.tags': {'match': 'unordered'},
+    },
+}
+
+
+def _interaction(path, status=200, states=()):
+    return {
+        'description': 'get %s' % path,
+        'providerStates': [{'name': name, 'params': {}} for name in states],
+        'request': {'method': 'GET', 'path': path},
+        'response': {'status': status},
+    }
+
+
+PACT = {
+    'consumer': {'name': 'farmer'},
+    'provider': {'name': 'zoo'},
+    'interactions': [
+        dict(_interaction('/cows'), request=REQUEST),
+        _interaction('/bulls', status=404),
+        _interaction('/calves', states=['some calves']),
+    ],
+}
+
+
+class StatusClient(base.PactClientMock):
+    """Thread-safe client answering 200 to the requests for cows and 500 to the others."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []
+
+    def get(self, client, path, data, headers, query):
+        with self.lock:
+            self.requests.append({'method': 'get', 'path': path, 'body': data, 'headers': headers, 'query': query})
+        if path == '/fail':
+            raise IOError('connection refused')
+        return {'status': 200 if path.startswith('/cows') else 500, 'headers': {}, 'body': None}
+
+    post = get
+
+    @contextmanager
+    def set_up(self, init_states):
+        yield
+
+
+@pytest.mark.parametrize('pattern', [
+    r'^[a-z]+-[0-9]{2,4}$',
+    r'/cows/\d+',
+    r'(moo|baa)!\1?',
+    r'[^abc]x.',
+    r'\w+@\w+\.(com|org)',
+    r'^(?:v|V)(?P<major>\d)\.\d+$',
+])
+def test_regex_generator(pattern):
+    generator = load.RegexGenerator(pattern)
+    rng = random.Random(0)
+    values = [generator.generate(rng) for _ in range(50)]
+    assert all(re.match(pattern, value) for value in values)
+    assert len(set(values)) > 1
+
+
+def test_request_synthesizer_variants_match_the_pact():
+    synthesizer = load.RequestSynthesizer(REQUEST)
+    expectation = validator.CompiledRequestExpectation(REQUEST)
+    rng = random.Random(0)
+    variants = [synthesizer.variant(rng) for _ in range(50)]
+
+    assert all(expectation.matches(variant) for variant in variants)
+    assert all(isinstance(variant['query'], str) for variant in variants)
+    assert len(set(variant['path'] for variant in variants)) > 10
+    assert len(set(variant['headers']['x-herd'] for variant in variants)) > 10
+    assert len(set(len(variant['body']['ids']) for variant in variants)) > 1
+    assert set(variant['body']['name'] for variant in variants) != {'Mary'}
+    assert set(variant['body']['born'] for variant in variants) != {'2020-01-01'}
+    assert set(tuple(variant['body']['tags']) for variant in variants) == {('milk', 'farm'), ('farm', 'milk')}
+    assert set(variant['body']['milked'] for variant in variants) == {True}  # no rule
+
+
+def test_request_synthesizer_falls_back_to_the_example():
+    # the rule can't be generated: the value of the pact is kept
+    request = dict(REQUEST, matchingRules={'$.path': {'match': 'regex', 'regex': r'^/cows/(?=\d)[a-z]+$'}})
+    rng = random.Random(0)
+    assert load.RequestSynthesizer(request).variant(rng)['path'] == '/cows/1'
+
+
+def test_synthesize_is_reproducible():
+    plan, skipped = load.synthesize(PACT, 20, seed=1)
+    assert skipped == [2]
+    assert [i for i, _request in plan] == [i for i, _request in load.synthesize(PACT, 20, seed=1)[0]]
+    assert json.dumps(plan, sort_keys=True) == json.dumps(load.synthesize(PACT, 20, seed=1)[0], sort_keys=True)
+    assert set(i for i, _request in plan) == {0, 1}
+
+
+def test_run_load(tmpdir):
+    path = tmpdir.join('pact.json')
+    path.write(json.dumps(PACT))
+    client = StatusClient()
+
+    report = load.run_load(str(path), client, requests=40, workers=4, seed=0)
+
+    assert len(report.results) == len(client.requests) == 40
+    assert report.skipped == [2]
+    assert report.errors == []
+    assert report.unexpected == [x for x in report.results if x.index == 1]
+    assert sum(count for _bound, count in report.histogram()) == 40
+    assert report.throughput > 0
+    summary = report.to_dict()
+    assert summary['requests'] == 40
+    assert summary['statuses']['200'] + summary['statuses']['500'] == 40
+    assert report.format().startswith('40 requests in ')
+
+
+def test_run_load_sends_the_payload(tmpdir):
+    interaction = _interaction('/cows')
+    interaction['request'].update(method='POST', data={'name': 'Marie'})
+    path = tmpdir.join('pact.json')
+    path.write(json.dumps(dict(PACT, interactions=[interaction])))
+    client = StatusClient()
+
+    load.run_load(str(path), client, requests=3, workers=1)
+
+    assert [x['body'] for x in client.requests] == [{'name': 'Marie'}] * 3
+
+
+def test_run_load_rate_and_errors(tmpdir):
+    pact = dict(PACT, interactions=[_interaction('/fail')])
+    path = tmpdir.join('pact.json')
+    path.write(json.dumps(pact))
+
+    report = load.run_load(str(path), StatusClient(), requests=10, rate=200, workers=2)
+
+    assert report.duration >= 9 / 200.
+    assert len(report.errors) == 10
+    assert isinstance(report.errors[0].error, IOError)
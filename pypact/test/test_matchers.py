@@ -1,6 +1,6 @@
 import pytest
 
-from ..matchers import PathMatcher, ValueMatcher
+from ..matchers import PathMatcher, RegexMatcher, ValueMatcher, compile_matchers, get_best_matcher, java_to_strptime
 
 def json_path_testcases():
     return [
@@ -111,3 +111,113 @@ def test_value_matchers_number_matcher():
     assert ValueMatcher.from_dict({"match": "type", "min": 1, "max": 1}).diff(['toto'], ['titi']) is None
     assert ValueMatcher.from_dict({"match": "type", "min": 1, "max": 1}).diff([], ['titi']) is not None
     assert ValueMatcher.from_dict({"match": "type", "min": 1, "max": 1}).diff(['toto', 'oups'], ['titi']) is not None
+
+
+def test_value_matchers_unordered_matcher():
+    assert ValueMatcher.from_dict({"match": "unordered"}).diff([1, 2, 2], [2, 1, 2]) is None
+    assert ValueMatcher.from_dict({"match": "unordered"}).diff([{'a': 1, 'b': 2}], [{'b': 2, 'a': 1}]) is None
+    assert ValueMatcher.from_dict({"match": "unordered"}).diff([1, 2], [2, 1, 2]) is not None
+    assert ValueMatcher.from_dict({"match": "unordered"}).diff([1, 1], [1, 2]) is not None
+    assert ValueMatcher.from_dict({"match": "unordered"}).diff('12', [1, 2]) is not None
+
+
+def test_value_matchers_type_rules():
+    assert ValueMatcher.from_dict({"match": "integer"}).diff(1, 2) is None
+    assert ValueMatcher.from_dict({"match": "integer"}).diff(1.5, 2) is not None
+    assert ValueMatcher.from_dict({"match": "integer"}).diff(True, 2) is not None
+    assert ValueMatcher.from_dict({"match": "decimal"}).diff(1.5, 2.5) is None
+    assert ValueMatcher.from_dict({"match": "decimal"}).diff(1, 2.5) is not None
+    assert ValueMatcher.from_dict({"match": "number"}).diff(1, 2.5) is None
+    assert ValueMatcher.from_dict({"match": "number"}).diff('1', 2.5) is not None
+    assert ValueMatcher.from_dict({"match": "boolean"}).diff(False, True) is None
+    assert ValueMatcher.from_dict({"match": "boolean"}).diff(0, True) is not None
+    assert ValueMatcher.from_dict({"match": "null"}).diff(None, None) is None
+    assert ValueMatcher.from_dict({"match": "null"}).diff('', None) is not None
+    assert ValueMatcher.from_dict({"match": "include", "value": "cow"}).diff('a cow', 'x') is None
+    assert ValueMatcher.from_dict({"match": "include", "value": "cow"}).diff('a pig', 'x') is not None
+    assert ValueMatcher.from_dict({"match": "include", "value": "cow"}).diff(1, 'x') is not None
+
+
+def test_value_matchers_datetime_rules():
+    assert ValueMatcher.from_dict({"match": "date"}).diff('2016-02-29', None) is None
+    assert ValueMatcher.from_dict({"match": "date"}).diff('2015-02-29', None) is not None
+    assert ValueMatcher.from_dict({"match": "date", "date": "dd/MM/yy"}).diff('29/02/16', None) is None
+    assert ValueMatcher.from_dict({"match": "time", "format": "HH:mm"}).diff('23:59', None) is None
+    assert ValueMatcher.from_dict({"match": "time", "format": "HH:mm"}).diff('24:00', None) is not None
+    matcher = ValueMatcher.from_dict({"match": "timestamp", "format": "yyyy-MM-dd'T'HH:mm:ss.SSS"})
+    assert matcher.diff('2016-02-29T10:00:00.123', None) is None
+    assert matcher.diff('2016-02-29 10:00:00.123', None) is not None
+    assert matcher.diff(12, None) is not None
+    # unsupported patterns are reported for each value
+    matcher = ValueMatcher.from_dict({"match": "date", "format": "yyyy-ww"})
+    assert 'unsupported pattern ww' in matcher.diff('2016-09', None).expected
+
+
+@pytest.mark.parametrize('java_format, valid, invalid', [
+    ("yyyy-MM-dd'T'HH:mm:ss.SSSXXX", ['2016-02-29T10:00:00.123+01:00', '2016-02-29T10:00:00.123Z'],
+     ['2016-02-29T10:00:00.123', '2016-02-30T10:00:00.123Z']),
+    ("yyyy-MM-dd'T'HH:mm:ssZ", ['2016-02-29T10:00:00-0800'], ['2016-02-29T10:00:00', '2016-02-29T10:00-0800']),
+    ("yyyy-MM-dd'T'HH:mm:ssX", ['2016-02-29T10:00:00-08', '2016-02-29T10:00:00Z'], ['2016-02-29T10:00:00']),
+    ('yyyy-MM-dd HH:mm z', ['2016-02-29 10:00 PST', '2016-02-29 10:00 GMT-08:00'], ['2016-02-29 10:00 +']),
+])
+def test_value_matchers_datetime_timezones(java_format, valid, invalid):
+    matcher = ValueMatcher.from_dict({"match": "timestamp", "format": java_format})
+    assert [value for value in valid if matcher.diff(value, None)] == []
+    assert [value for value in invalid if not matcher.diff(value, None)] == []
+
+
+def test_java_to_strptime():
+    assert java_to_strptime("yyyy-MM-dd'T'HH:mm:ss") == '%Y-%m-%dT%H:%M:%S'
+    assert java_to_strptime("hh 'o''clock' a, 100%") == "%I o'clock %p, 100%%"
+
+
+def test_value_matchers_combined_rules():
+    and_rule = {"matchers": [{"match": "integer"}, {"match": "regex", "regex": "^1"}], "combine": "AND"}
+    assert ValueMatcher.from_dict(and_rule).diff(12, 0) is None
+    assert ValueMatcher.from_dict(and_rule).diff(22, 0) is not None
+    assert ValueMatcher.from_dict(and_rule).diff('12', 0) is not None
+    or_rule = {"matchers": [{"match": "null"}, {"match": "integer"}], "combine": "OR"}
+    assert ValueMatcher.from_dict(or_rule).diff(None, 0) is None
+    assert ValueMatcher.from_dict(or_rule).diff(1, 0) is None
+    assert ValueMatcher.from_dict(or_rule).diff('1', 0) is not None
+    assert ValueMatcher.from_dict({"matchers": [{"match": "type"}]}).diff(1, 2) is None
+
+
+def test_path_matcher_prefix():
+    assert PathMatcher.from_jsonpath('$.body.items[*].id').prefix == "['$']['body']['items']"
+    assert PathMatcher.from_jsonpath("$.headers['x-id']").prefix == "['$']['headers']['x-id']"
+    assert PathMatcher.from_jsonpath('$.body.a[2].b').prefix == "['$']['body']['a'][2]['b']"
+
+
+@pytest.mark.parametrize('path', ['body.id', '$.body.items[x]'])
+def test_path_matcher_invalid_jsonpath(path):
+    with pytest.raises(ValueError) as e:
+        PathMatcher.from_jsonpath(path)
+    assert path in str(e.value)
+
+
+def test_get_best_matcher_resolves_ties_by_jsonpath():
+    rules = [
+        (PathMatcher.from_jsonpath('$.body.prices.*'), 'star'),
+        (PathMatcher.from_jsonpath('$.body.prices'), 'exact'),
+    ]
+    path = "['$']['body']['prices']"
+    assert get_best_matcher(rules, path) == 'exact'
+    assert get_best_matcher(rules[::-1], path) == 'exact'
+    assert get_best_matcher(rules, "['$']['body']['prices'][0]") == 'star'
+    assert get_best_matcher(rules, "['$']['body']['items']") is None
+
+
+def test_compile_matchers_sorts_and_prunes_rules():
+    compiled = compile_matchers({
+        '$.body.items[*].id': {'match': 'type'},
+        '$.body.items[0].id': {'match': 'regex', 'regex': '^[0-9]+$'},
+        "$.body.items[0]['id']": {'match': 'type'},
+        '$.body.items[*]': {'match': 'type'},
+        "$.body.items[]['id']": {'match': 'type'},
+        '$.body.*': {'match': 'type'},
+    })
+    assert [path_matcher.jsonpath for path_matcher, _ in compiled] == [
+        '$.body.items[0].id', '$.body.items[*].id', '$.body.items[*]', '$.body.*',
+    ]
+    assert isinstance(get_best_matcher(compiled, "['$']['body']['items'][0]['id']"), RegexMatcher)
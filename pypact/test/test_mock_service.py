@@ -3,7 +3,8 @@ import pytest
 import mock
 
 from ..service import MockService
-from ..exceptions import PyPactException
+from ..exceptions import PyPactException, PyPactServiceException
+from ..recorder import InteractionStore
 
 
 @pytest.fixture
@@ -125,3 +126,54 @@ def test_mock_service_accepts_a_new_interaction(mock_service):
     mock_interaction = mock.Mock()
     mock_service.add_interaction(mock_interaction)
     assert len(mock_service.interactions) == 1
+
+
+def test_mock_service_matches_requests(mock_service):
+    request = {
+        'method': 'get',
+        'path': '/alligators',
+        'query': 'name=Mary',
+        'headers': {'Accept': 'application/json'},
+    }
+    mock_service.add_interaction({'description': 'a', 'request': dict(request, path='/crocodiles')})
+    mock_service.add_interaction({
+        'description': 'b',
+        'request': dict(request, matchingRules={'$.query.name[0]': {'match': 'regex', 'regex': '^M'}}),
+    })
+
+    actual = {
+        'method': 'GET',
+        'path': '/alligators',
+        'query': 'name=Maria',
+        'headers': {'ACCEPT': 'application/json', 'X-Trace': 'x'},
+    }
+    assert mock_service.match_request(actual)['description'] == 'b'
+    assert mock_service.match_request(actual)['description'] == 'b'
+    assert actual['method'] == 'GET'
+    assert 'matchingRules' in mock_service.interactions[1]['request']
+    assert mock_service.match_request(dict(actual, query='name=Anna')) is None
+
+
+def test_mock_service_records_and_replays_requests(tmpdir, mock_service):
+    store = InteractionStore(str(tmpdir.join('recordings.jsonl')))
+    proxy = mock.Mock(return_value={'status': 200, 'body': {'name': 'Mary'}})
+    mock_service.store, mock_service.proxy = store, proxy
+    request = {'method': 'GET', 'path': '/alligators', 'query': 'name=Mary', 'headers': {'X-Trace': '1'}}
+
+    assert mock_service.handle_request(request) == {'status': 200, 'body': {'name': 'Mary'}}
+    assert mock_service.handle_request(dict(request, headers={'X-Trace': '2'}))['body'] == {'name': 'Mary'}
+    assert proxy.call_count == 1
+
+    mock_service.proxy = None
+    mock_service.store = InteractionStore(store.path)
+    assert mock_service.handle_request(request)['status'] == 200
+    with pytest.raises(PyPactServiceException):
+        mock_service.handle_request(dict(request, query='name=Anna'))
+
+    mock_service.add_recorded_interactions()
+    assert mock_service.interactions == [{
+        'provider_state': None,
+        'description': 'GET /alligators',
+        'request': request,
+        'response': {'status': 200, 'body': {'name': 'Mary'}},
+    }]
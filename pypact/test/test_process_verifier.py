@@ -0,0 +1,142 @@
+from contextlib import contextmanager
+from functools import partial
+import json
+import os
+import time
+
+import pytest
+
+from ..verifiers import base
+from ..verifiers import processes
+from ..verifiers import results
+
+
+class CowsClient(base.PactClientMock):
+    def get(self, client, path, data, headers, query):
+        return {'status': 200, 'headers': {}, 'body': {'cows': ['Mary' if path != 'zoo/bulls' else 'Ferdinand']}}
+
+    @contextmanager
+    def set_up(self, init_states):
+        yield
+
+
+class LoggingClient(CowsClient):
+    """Client appending its requests and provider states set up to the file at ``log_path``, shared by the workers."""
+    def __init__(self, log_path):
+        self.log_path = log_path
+
+    def _log(self, line):
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, (line + '\n').encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    def get(self, client, path, data, headers, query):
+        time.sleep(0.05)
+        self._log(path)
+        return super(LoggingClient, self).get(client, path, data, headers, query)
+
+    @contextmanager
+    def set_up(self, init_states):
+        if init_states:
+            self._log('set up')
+        yield
+
+
+def _interaction(path, states=()):
+    return {
+        'description': 'get %s' % path,
+        'providerStates': [{'name': name, 'params': {}} for name in states],
+        'request': {'method': 'GET', 'path': path},
+        'response': {'status': 200, 'body': {'cows': ['Mary']}},
+    }
+
+
+PACT = {
+    'provider': {'name': 'zoo'},
+    'consumer': {'name': 'farmer'},
+    'interactions': [
+        _interaction('zoo/cows'),
+        _interaction('zoo/bulls'),
+        _interaction('zoo/cows', states=['a cow']),
+        _interaction('zoo/calves'),
+    ],
+}
+
+
+def test_shared_pact_decodes_interactions_on_access(tmpdir):
+    path = str(tmpdir.join('pact.shared'))
+    processes.write_shared_pact(PACT, path)
+    shared = processes.SharedPact(path)
+    try:
+        assert shared.document['consumer'] == {'name': 'farmer'}
+        interactions = shared.document['interactions']
+        assert len(interactions) == 4
+        assert interactions._decoded == {}
+        assert interactions[2] == PACT['interactions'][2]
+        assert list(interactions._decoded) == [2]
+        assert interactions[-1] == PACT['interactions'][3]
+        assert list(interactions) == PACT['interactions']
+        with pytest.raises(IndexError):
+            interactions[4]
+    finally:
+        shared.close()
+
+
+def test_shared_pact_rejects_other_files(tmpdir):
+    path = tmpdir.join('pact.json')
+    path.write(json.dumps(PACT))
+    with pytest.raises(base.BadPactFormat):
+        processes.SharedPact(str(path))
+
+
+def test_provider_accepts_a_shared_pact(tmpdir):
+    path = str(tmpdir.join('pact.shared'))
+    processes.write_shared_pact(PACT, path)
+    shared = processes.SharedPact(path)
+    try:
+        provider = base.Provider(shared.document, CowsClient())
+        verification = provider.verification_report('farmer')
+        assert [x.passed for x in verification.interactions] == [True, False, True, True]
+    finally:
+        shared.close()
+
+
+def test_verify_in_processes(tmpdir):
+    path = tmpdir.join('pact.json')
+    path.write(json.dumps(PACT))
+
+    verification = processes.verify_in_processes(str(path), CowsClient, 'farmer', workers=2)
+
+    assert verification.provider == 'zoo'
+    assert [x.index for x in verification.interactions] == [0, 1, 2, 3]
+    assert [x.index for x in verification.failures] == [1]
+    assert 'Ferdinand' in verification.failures[0].diff
+
+
+def test_verify_in_processes_verifies_stateful_interactions_last(tmpdir):
+    path = tmpdir.join('pact.json')
+    path.write(json.dumps(PACT))
+    log_path = tmpdir.join('log')
+
+    verification = processes.verify_in_processes(
+        str(path), partial(LoggingClient, str(log_path)), 'farmer', workers=3)
+
+    assert len(verification.interactions) == 4
+    assert log_path.read().splitlines()[-2:] == ['set up', 'zoo/cows']
+
+
+def test_verify_in_processes_records_the_results(tmpdir):
+    path = tmpdir.join('pact.json')
+    path.write(json.dumps(PACT))
+    store_path = str(tmpdir.join('results.json'))
+
+    for skipped in ([], [0, 2, 3]):
+        verification = processes.verify_in_processes(
+            str(path), CowsClient, 'farmer', workers=2,
+            results_store=results.ResultsStore(store_path), fingerprint='tree1',
+        )
+        assert [x.index for x in verification.interactions] == [0, 1, 2, 3]
+        assert [x.index for x in verification.interactions if x.skipped] == skipped
+        assert [x.index for x in verification.failures] == [1]
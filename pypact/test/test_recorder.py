@@ -0,0 +1,58 @@
+import mock
+
+from ..recorder import InteractionStore, client_proxy
+
+
+def test_store_appends_records_and_indexes_them_by_method_and_path(tmpdir):
+    path = str(tmpdir.join('recordings.jsonl'))
+    store = InteractionStore(path)
+    store.append({'method': 'GET', 'path': '/a'}, {'status': 200})
+    store.append({'method': 'POST', 'path': '/a', 'body': {'x': 1}}, {'status': 201})
+    store.append({'method': 'get', 'path': '/a', 'query': 'page=2'}, {'status': 200, 'body': [2]})
+
+    assert [x['response']['status'] for x in store.lookup('get', '/a')] == [200, 200]
+    assert store.lookup('DELETE', '/a') == []
+    assert len(tmpdir.join('recordings.jsonl.index').readlines()) == 3
+
+    reloaded = InteractionStore(path)
+    assert reloaded._records == {}
+    assert reloaded.lookup('post', '/a') == store.lookup('post', '/a')
+    assert len(reloaded._records) == 1
+
+
+def test_store_replays_the_first_matching_record(tmpdir):
+    store = InteractionStore(str(tmpdir.join('recordings.jsonl')))
+    store.append({'method': 'get', 'path': '/a', 'query': 'page=1', 'headers': {'X-Trace': '1'}}, {'status': 200})
+    store.append({'method': 'get', 'path': '/a', 'query': 'page=2'}, {'status': 404})
+
+    assert store.replay({'method': 'GET', 'path': '/a', 'query': 'page=2'}) == {'status': 404}
+    assert store.replay({'method': 'get', 'path': '/a', 'query': 'page=1'}) == {'status': 200}
+    assert store.replay({'method': 'get', 'path': '/a', 'query': 'page=3'}) is None
+    assert store.replay({'method': 'get', 'path': '/b', 'query': 'page=1'}) is None
+
+
+def test_store_emits_interactions_without_duplicates(tmpdir):
+    store = InteractionStore(str(tmpdir.join('recordings.jsonl')))
+    for _ in range(2):
+        store.append({'method': 'get', 'path': '/a'}, {'status': 200})
+    store.append({'method': 'get', 'path': '/b'}, {'status': 200})
+
+    assert [x['description'] for x in store.interactions()] == ['GET /a', 'GET /b']
+
+
+def test_client_proxy_forwards_requests_to_the_client():
+    client = mock.Mock()
+    client.post.return_value = {'status': 201}
+    proxy = client_proxy(client)
+
+    assert proxy({'method': 'POST', 'path': '/a', 'body': {'x': 1}}) == {'status': 201}
+    client.post.assert_called_once_with(client, path='/a', data={'x': 1}, headers=None, query=None)
+
+
+def test_client_proxy_forwards_the_data_payload():
+    client = mock.Mock()
+    client.put.return_value = {'status': 200}
+    proxy = client_proxy(client)
+
+    assert proxy({'method': 'PUT', 'path': '/a', 'data': {'x': 2}, 'headers': {'A': 'b'}}) == {'status': 200}
+    client.put.assert_called_once_with(client, path='/a', data={'x': 2}, headers={'A': 'b'}, query=None)
@@ -0,0 +1,102 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from .. import sharing
+from .. import validator
+from ..verifiers import base
+
+
+def _interaction(i):
+    return {
+        'description': 'get cow %d' % i,
+        'providerStates': [{'name': 'some cows', 'params': {'herd': ['Mary', 'Marguerite']}}],
+        'request': {'method': 'GET', 'path': '/cows', 'headers': {'Accept': 'application/json'}},
+        'response': {
+            'status': 200,
+            'headers': {'Content-Type': 'application/json', 'X-Cow': 'cow %d' % i},
+            'body': {'name': 'Mary', 'age': i},
+            'matchingRules': {'$.body.name': {'match': 'type'}, '$.body.age': {'match': 'integer'}},
+        },
+    }
+
+
+def _pact():
+    # round-trip through json so that no string nor subtree is shared beforehand
+    return json.loads(json.dumps({'consumer': {'name': 'farmer'}, 'interactions': [_interaction(i) for i in range(3)]}))
+
+
+def test_share_pact_shares_identical_subtrees():
+    pact = _pact()
+    expected = copy.deepcopy(pact)
+    first, second, third = sharing.share_pact(pact)['interactions']
+
+    assert pact == expected
+    assert first['providerStates'] is second['providerStates'] is third['providerStates']
+    assert first['request']['headers'] is third['request']['headers']
+    assert first['request']['path'] is third['request']['path']
+    assert first['response']['matchingRules'] is third['response']['matchingRules']
+    assert first['response']['headers'] is not third['response']['headers']
+    assert first['response']['headers']['Content-Type'] is third['response']['headers']['Content-Type']
+    assert first['response']['body'] is not third['response']['body']
+
+
+def test_shared_objects_are_immutable():
+    pact = sharing.share_pact(_pact())
+    states = pact['interactions'][0]['providerStates']
+    assert isinstance(states, sharing.SharedList)
+    with pytest.raises(TypeError):
+        states.append({'name': 'a bull'})
+    with pytest.raises(TypeError):
+        states[0]['name'] = 'a bull'
+    with pytest.raises(TypeError):
+        states[0]['params'].pop('herd')
+    with pytest.raises(TypeError):
+        states[0]['params']['herd'] += ['Ferdinand']
+    assert copy.deepcopy(states) is states
+    assert pickle.loads(pickle.dumps(states)) == states
+
+
+def test_compiled_matchers_are_shared():
+    pact = sharing.share_pact(_pact())
+    expectations = [
+        validator.CompiledExpectation(
+            x['response'], validator.RESPONSE_KEYS, validator.RESPONSE_SANITIZED_KEYS,
+            validator.RESPONSE_IGNORE_EXTRA_KEYS,
+        )
+        for x in pact['interactions']
+    ]
+    assert expectations[0].matchers is expectations[2].matchers
+    for i, age, errors in ((1, 1, 0), (2, 'old', 1)):
+        actual = {
+            'status': 200,
+            'headers': {'Content-Type': 'application/json', 'X-Cow': 'cow %d' % i},
+            'body': {'name': u'Marguerite', 'age': age},
+        }
+        assert len(expectations[i].diff(actual)[0]) == errors
+
+
+def test_loaded_pacts_are_shared(tmpdir):
+    path = tmpdir.join('pact.json')
+    path.write(json.dumps(_pact()))
+    pact = base._get_pact(str(path))
+    assert pact['interactions'][0]['request']['headers'] is pact['interactions'][1]['request']['headers']
+
+
+def test_shared_interactions_are_compared_like_plain_ones():
+    request = {
+        'method': 'GET',
+        'path': '/cows',
+        'query': {'name': ['Mary']},
+        'headers': {'Accept': 'application/json'},
+        'matchingRules': {'$.query.name[0]': {'match': 'regex', 'regex': '^M'}},
+    }
+    pact = {'interactions': [{'description': 'get cows', 'request': request}]}
+    actual = {'method': 'get', 'path': '/cows', 'query': 'name=Maria', 'headers': {'Accept': 'application/json'}}
+    shared = sharing.share_pact(copy.deepcopy(pact))['interactions'][0]['request']
+    assert isinstance(shared['query'], sharing.SharedDict)
+    for expected in (request, shared):
+        assert validator.diff_requests(dict(actual), expected)[0] == []
+        assert len(validator.diff_requests(dict(actual, query='name=Tom'), expected)[0]) == 1
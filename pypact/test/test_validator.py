@@ -4,6 +4,8 @@ import os
 
 import pytest
 
+from .. import matchers
+from .. import validator
 from ..validator import compare_requests, compare_responses, format_diff
 
 
@@ -66,3 +68,242 @@ def test_diff_formatter():
         '\x1b[1;31m-}\n\x1b[0;m',
         '\x1b[1;32m+{}\n\x1b[0;m',
     ]
+
+
+def test_profile():
+    actual = {'status': 200, 'body': {'ids': [1, 2], 'name': 'Mary'}}
+    expected = {
+        'status': 200,
+        'body': {'ids': [3], 'name': 'Marie'},
+        'matchingRules': {'$.body.ids': {'min': 1}, '$.body.ids[*]': {'match': 'type'}},
+    }
+    with validator.profile() as profile:
+        diff = list(compare_responses(actual, expected))
+
+    assert diff
+    assert profile.comparisons == 1
+    assert set(profile.timings) == {'prepare', 'compile', 'compare', 'trees_from_diff', 'format_errors'}
+    assert profile.nodes == 7  # status, headers, body, ids, ids[0], ids[1] and name
+    assert profile.matcher_lookups == 7
+    assert profile.bytes_serialized > 0
+    assert not validator._callbacks
+
+
+def test_profile_callbacks():
+    records = []
+    validator.add_callback(records.append)
+    try:
+        list(compare_responses({'status': 200}, {'status': 200}))
+    finally:
+        validator.remove_callback(records.append)
+
+    assert len(records) == 2  # one for the comparison, one for the diff rendering
+    assert records[0].nodes == 3
+    assert list(records[1].timings) == ['format_errors']
+
+
+def test_errors_formatter():
+    actual = {'status': 200, 'body': {'cows': ['Marie', 'Mary'], 'farm': {'name': 'Old'}}}
+    expected = {'status': 200, 'body': {'cows': ['Mary'], 'farm': {'name': 'Old', 'size': 1}}}
+    errors = validator.diff_responses(actual, expected)[0]
+
+    assert sorted(error.path for error in errors) == [
+        "['$']['body']['cows'][0]",
+        "['$']['body']['cows'][1]",
+        "['$']['body']['farm']['size']",
+    ]
+    assert list(validator.format_errors(errors, with_color=False)) == [
+        '--- actual\n',
+        '+++ expected\n',
+        "@@ ['$']['body']['cows'][0] Difference @@\n",
+        '-"Marie"\n',
+        '+"Mary"\n',
+        "@@ ['$']['body']['cows'][1] Difference @@\n",
+        '-"Mary"\n',
+        '+"UnexpectedIndex"\n',
+        "@@ ['$']['body']['farm']['size'] Difference @@\n",
+        '-"KeyNotFound"\n',
+        '+1\n',
+    ]
+    assert list(validator.format_errors([])) == []
+
+
+def test_errors_formatter_truncates_values():
+    errors = validator.diff_responses({'body': {'a': list(range(100))}}, {'body': {'a': 'a string'}})[0]
+    lines = list(validator.format_errors(errors, with_color=True, max_lines=5))
+
+    assert lines[3] == '\x1b[1;31m-[\n\x1b[0;m'
+    assert lines[8] == '\x1b[1;31m-... (97 more lines)\n\x1b[0;m'
+    assert lines[9] == '\x1b[1;32m+"a string"\n\x1b[0;m'
+
+
+def test_error_budget_max_errors():
+    actual = {'status': 500, 'body': dict(('key%d' % i, i) for i in range(100))}
+    expected = {'status': 200, 'body': dict(('key%d' % i, -i) for i in range(100))}
+    with validator.profile() as profile:
+        errors = validator.diff_responses(actual, expected, max_errors=5)[0]
+
+    assert len(errors) == 6
+    summary = errors[-1]
+    assert isinstance(summary, matchers.ErrorBudgetExceeded)
+    assert summary.errors == 5
+    assert summary.not_compared > 90
+    assert profile.nodes < 10
+    lines = list(validator.format_errors(errors, with_color=False))
+    assert lines[-3:] == [
+        "@@ ['$'] ErrorBudgetExceeded @@\n",
+        '-"%d values not compared"\n' % summary.not_compared,
+        '+"stopped after 5 errors"\n',
+    ]
+
+
+def test_error_budget_max_depth():
+    actual = {'body': {'a': {'b': {'c': 1, 'd': 2}}, 'e': 3}}
+    expected = {'body': {'a': {'b': {'c': 0, 'd': 0}}, 'e': 3}}
+
+    errors = validator.diff_responses(copy.deepcopy(actual), copy.deepcopy(expected), max_depth=2)[0]
+    assert [error.path for error in errors] == ["['$']['body']['a']"]
+    assert errors[0].split() == ({'b': {'c': 1, 'd': 2}}, {'b': {'c': 0, 'd': 0}})
+
+    errors = validator.diff_responses(copy.deepcopy(actual), copy.deepcopy(expected))[0]
+    assert len(errors) == 2
+
+
+def test_unordered_arrays():
+    expected = {
+        'body': {'ids': list(range(1000)), 'tags': ['a', 'b', 'b']},
+        'matchingRules': {'$.body.ids': {'match': 'unordered'}, '$.body.tags': {'match': 'unordered'}},
+    }
+    actual = {'body': {'ids': list(reversed(range(1000))), 'tags': ['b', 'a', 'c']}}
+    with validator.profile() as profile:
+        errors = validator.diff_responses(actual, copy.deepcopy(expected))[0]
+
+    assert profile.nodes < 10  # elements are paired by hash, not compared
+    assert sorted((error.path, error.split()) for error in errors) == [
+        ("['$']['body']['tags'][2]", ('c', 'UnexpectedIndex')),
+        ("['$']['body']['tags'][3]", ('IndexNotFound', 'b')),
+    ]
+
+
+def test_unordered_arrays_with_element_rules():
+    expected = {
+        'body': [{'id': 1, 'name': 'Mary'}, {'id': 2, 'name': 'Marie'}],
+        'matchingRules': {'$.body': {'match': 'unordered'}, '$.body[*].id': {'match': 'type'}},
+    }
+    actual = {'body': [{'id': 20, 'name': 'Marie'}, {'id': 10, 'name': 'Mary'}]}
+    assert validator.diff_responses(copy.deepcopy(actual), copy.deepcopy(expected))[0] == []
+
+    actual = {'body': [{'id': 20, 'name': 'Marie'}, {'id': 10, 'name': 'Maria'}]}
+    errors = validator.diff_responses(actual, copy.deepcopy(expected))[0]
+    assert [error.path for error in errors] == ["['$']['body'][1]", "['$']['body'][2]"]
+
+
+@pytest.mark.parametrize('actual_body, expected_body', [
+    ([{'id': 2, 'name': 'b'}, {'id': 1, 'name': 'a'}], [{'id': 1}, {'id': 2}]),
+    ([2, 1.0], [1, 2]),
+])
+def test_unordered_arrays_match_like_ordered_ones(actual_body, expected_body):
+    expected = {'body': expected_body, 'matchingRules': {'$.body': {'match': 'unordered'}}}
+    assert validator.diff_responses({'body': list(reversed(actual_body))}, copy.deepcopy(expected))[0] == []
+    assert validator.diff_responses({'body': actual_body}, expected)[0] == []
+
+
+def test_unordered_arrays_in_combined_rules():
+    expected = {
+        'body': {'tags': ['a', 'b', 'c']},
+        'matchingRules': {'$.body.tags': {'matchers': [{'match': 'unordered'}, {'min': 2}], 'combine': 'AND'}},
+    }
+    assert validator.diff_responses({'body': {'tags': ['c', 'a', 'b']}}, expected)[0] == []
+    errors = validator.diff_responses({'body': {'tags': ['c', 'a', 'd']}}, expected)[0]
+    assert [error.path for error in errors] == ["['$']['body']['tags'][2]", "['$']['body']['tags'][3]"]
+
+
+def test_unsupported_date_formats_are_reported():
+    expected = {
+        'body': {'id': 1, 'week': '2016-09'},
+        'matchingRules': {'$.body.week': {'match': 'date', 'format': 'yyyy-ww'}, '$.body.id': {'match': 'type'}},
+    }
+    errors = validator.diff_responses({'body': {'id': 'x', 'week': '2016-09'}}, expected)[0]
+    assert sorted(error.path for error in errors) == ["['$']['body']['id']", "['$']['body']['week']"]
+
+
+def test_v3_matching_rules():
+    expected = {
+        'headers': {'X-Request-Id': 'abc'},
+        'body': {'id': 1, 'created': '2016-01-01', 'prices': {'eur': 1.5}},
+        'matchingRules': {
+            'header': {'X-Request-Id': {'matchers': [{'match': 'regex', 'regex': '^[a-z]+$'}]}},
+            'body': {
+                '$.id': {'matchers': [{'match': 'integer'}]},
+                '$.created': {'matchers': [{'match': 'date', 'format': 'yyyy-MM-dd'}]},
+                '$.prices': {'matchers': [{'match': 'values'}]},
+                '$.prices.*': {'matchers': [{'match': 'decimal'}]},
+            },
+        },
+    }
+    actual = {
+        'headers': {'x-request-id': 'xyz'},
+        'body': {'id': 42, 'created': '2017-12-31', 'prices': {'usd': 2.5, 'gbp': 1.25}},
+    }
+    assert validator.diff_responses(actual, copy.deepcopy(expected))[0] == []
+
+    actual = {
+        'headers': {'x-request-id': 'XYZ'},
+        'body': {'id': 4.2, 'created': '31/12/2017', 'prices': {'usd': 2}},
+    }
+    errors = validator.diff_responses(actual, copy.deepcopy(expected))[0]
+    assert sorted(error.path for error in errors) == [
+        "['$']['body']['created']",
+        "['$']['body']['id']",
+        "['$']['body']['prices']['usd']",
+        "['$']['headers']['x-request-id']",
+    ]
+
+
+def test_prepare_normalizes_only_expected_headers_and_params():
+    actual = {
+        'headers': dict([('Content-Type', 'a , b')] + [('X-Trace-%d' % i, 'x') for i in range(50)]),
+        'query': 'a=1&b=2&c=3',
+    }
+    expected = {'headers': {'Content-Type': 'a,b'}, 'query': 'a=1'}
+    validator.prepare(actual, expected, ('headers', 'query'), ignore_extra_keys=('headers', 'query'))
+
+    assert actual == {'headers': {'content-type': 'a,b'}, 'query': {'a': ['1']}}
+    assert expected == {'headers': {'content-type': 'a,b'}, 'query': {'a': ['1']}}
+
+    actual = {'query': 'a=1&b=2'}
+    validator.prepare(actual, {'query': 'a=1'}, ('query',))
+    assert actual == {'query': {'a': ['1'], 'b': ['2']}}
+
+
+def test_compiled_request_expectation():
+    expected = {
+        'method': 'POST',
+        'path': '/cows',
+        'headers': {'Content-Type': 'application/json'},
+        'body': {'name': 'Mary'},
+        'matchingRules': {'$.body.name': {'match': 'type'}},
+    }
+    expectation = validator.CompiledRequestExpectation(expected)
+    assert 'matchingRules' in expected
+
+    actual = {'method': 'post', 'path': '/cows', 'headers': {'content-type': 'application/json'}, 'body': {'name': 'Marie'}}
+    assert expectation.matches(actual)
+    assert expectation.matches(actual)
+    assert actual['headers'] == {'content-type': 'application/json'}
+    errors = expectation.diff(dict(actual, body={'name': 1}))[0]
+    assert [error.path for error in errors] == ["['$']['body']['name']"]
+
+
+def test_diff_responses_does_not_modify_the_expected_response():
+    expected = {
+        'status': 200,
+        'headers': {'Content-Type': 'application/json'},
+        'body': {'id': 1},
+        'matchingRules': {'$.body.id': {'match': 'type'}},
+    }
+    original = copy.deepcopy(expected)
+    for _ in range(2):
+        actual = {'status': 200, 'headers': {'Content-Type': 'application/json'}, 'body': {'id': 2}}
+        assert validator.diff_responses(actual, expected)[0] == []
+    assert expected == original
@@ -1,10 +1,13 @@
 from contextlib import contextmanager
 import json
 import tempfile
+from xml.etree import ElementTree
 
 import pytest
 
+from .. import binary
 from ..verifiers import base
+from ..verifiers import results
 
 
 @pytest.fixture()
@@ -66,7 +69,7 @@ PACT = json.dumps({
 })
 
 def test_honours_pact_with(mock_client_class):
-    with tempfile.NamedTemporaryFile() as f:
+    with tempfile.NamedTemporaryFile(mode='w') as f:
         f.write(PACT)
         f.seek(0)
         client = mock_client_class()
@@ -85,3 +88,155 @@ def test_honours_pact_with(mock_client_class):
         with pytest.raises(AssertionError):
             provider = base.Provider(f.name, mock_client_class(fail=True))
             provider.honours_pact_with('anotherService')
+
+
+def test_verification_report(mock_client_class):
+    with tempfile.NamedTemporaryFile(mode='w') as f:
+        f.write(PACT)
+        f.seek(0)
+        provider = base.Provider(f.name, mock_client_class(fail=True))
+        report = provider.verification_report('anotherService')
+
+    assert not report.passed
+    assert report.provider == 'myAwesomeService'
+    assert len(report.failures) == 1
+    interaction = report.interactions[0]
+    assert [error.__class__.__name__ for error in interaction.errors] == ['Difference']
+    assert '\x1b' not in interaction.diff
+    assert interaction.total_time >= interaction.request_time >= 0
+
+    as_dict = json.loads(report.to_json())
+    assert as_dict['interactions'][0]['errors'] == [{'type': 'Difference', 'actual': 'Marie', 'expected': 'Mary'}]
+    assert set(as_dict['interactions'][0]) >= {'state_time', 'request_time', 'compare_time', 'render_time'}
+
+    xml = ElementTree.fromstring(report.to_junit_xml())
+    assert xml.get('tests') == '1'
+    assert xml.get('failures') == '1'
+    assert len(xml.findall('testcase/failure')) == 1
+    assert len(xml.findall('testcase/properties/property')) == 4
+
+
+def test_incremental_verification(mock_client_class, tmpdir):
+    store_path = str(tmpdir.join('results.json'))
+    with tempfile.NamedTemporaryFile(mode='w') as f:
+        f.write(PACT)
+        f.seek(0)
+
+        def run(fingerprint, fail=False):
+            client = mock_client_class(fail=fail)
+            provider = base.Provider(f.name, client, results.ResultsStore(store_path), fingerprint=fingerprint)
+            try:
+                provider.honours_pact_with('anotherService')
+            except AssertionError:
+                pass
+            return provider, client
+
+        provider, client = run('tree1', fail=True)
+        assert provider.skipped == [] and len(client.calls) == 1
+        provider, client = run('tree1')
+        assert provider.skipped == [] and len(client.calls) == 1
+        provider, client = run('tree1')
+        assert provider.skipped == [0] and client.calls == []
+        provider, client = run('tree2')
+        assert provider.skipped == [] and len(client.calls) == 1
+
+        provider = base.Provider(f.name, mock_client_class(), results.ResultsStore(store_path), fingerprint='tree2')
+        report = provider.verification_report('anotherService')
+        assert [interaction.skipped for interaction in report.interactions] == [True]
+        assert report.passed
+        assert ElementTree.fromstring(report.to_junit_xml()).get('skipped') == '1'
+
+
+def test_results_store(tmpdir):
+    store_path = str(tmpdir.join('results.json'))
+    store = results.ResultsStore(store_path, max_fingerprints=2)
+    for fingerprint in ('a', 'b', 'c'):
+        store.mark_verified(fingerprint, 'key')
+    store.save()
+
+    store = results.ResultsStore(store_path)
+    assert not store.is_verified('a', 'key')
+    assert store.is_verified('b', 'key')
+    assert store.is_verified('c', 'key')
+    assert results.interaction_hash({'a': 1, 'b': [1, 2]}) == results.interaction_hash({'b': [1, 2], 'a': 1})
+
+
+def test_verify_pacts_replays_shared_requests_once(mock_client_class, tmpdir):
+    other = json.loads(PACT)
+    other['consumer']['name'] = 'thirdService'
+    other['interactions'][0]['response']['body']['cows'] = ['Marie']
+    other['interactions'].append(dict(other['interactions'][0], providerStates=[]))
+    paths = [str(tmpdir.join('first.json')), str(tmpdir.join('second.json'))]
+    for path, pact in zip(paths, (json.loads(PACT), other)):
+        with open(path, 'w') as f:
+            json.dump(pact, f)
+
+    client = mock_client_class()
+    reports = base.verify_pacts(paths, client)
+
+    assert len(client.calls) == 2
+    assert [report.consumer for report in reports] == ['anotherService', 'thirdService']
+    assert reports[0].passed
+    assert [interaction.passed for interaction in reports[1].interactions] == [False, False]
+    assert 'Marie' in reports[1].interactions[0].diff
+    assert reports[1].interactions[0].request_time == 0.
+
+
+def test_verify_pacts_replays_equivalent_requests_once(mock_client_class, tmpdir):
+    first, second = json.loads(PACT), json.loads(PACT)
+    second['consumer']['name'] = 'thirdService'
+    first['interactions'][0]['request'].update(method='GET', query='a=1', headers={'Accept': 'json'})
+    second['interactions'][0]['request'].update(method='get', query={'a': ['1']}, headers={'ACCEPT': 'json'})
+    paths = [str(tmpdir.join('first.json')), str(tmpdir.join('second.json'))]
+    for path, pact in zip(paths, (first, second)):
+        with open(path, 'w') as f:
+            json.dump(pact, f)
+
+    client = mock_client_class()
+    reports = base.verify_pacts(paths, client)
+
+    assert len(client.calls) == 1
+    assert [report.passed for report in reports] == [True, True]
+
+
+@pytest.mark.parametrize('encoding', ['json', 'binary'])
+def test_provider_verifies_a_pact_twice(mock_client_class, tmpdir, encoding):
+    pact = json.loads(PACT)
+    pact['interactions'][0]['response']['matchingRules'] = {'$.body.cows[*]': {'match': 'regex', 'regex': '^Ma'}}
+    path = tmpdir.join('pact.json')
+    if encoding == 'binary':
+        path.write_binary(binary.dumps(pact))
+    else:
+        path.write(json.dumps(pact))
+
+    provider = base.Provider(str(path), mock_client_class(fail=True))  # Marie matches the rule
+    for _ in range(2):
+        provider.honours_pact_with('anotherService')
+
+
+@pytest.mark.parametrize('cached_methods, calls', [
+    (base.SAFE_METHODS, 3),
+    (base.SAFE_METHODS + ('POST',), 2),
+    ((), 4),
+])
+def test_response_snapshot_cache(mock_client_class, cached_methods, calls):
+    class Client(mock_client_class):
+        post = mock_client_class.get
+
+    pact = json.loads(PACT)
+    first = pact['interactions'][0]
+    first['request']['query'] = 'b=2&a=1'
+    second = json.loads(json.dumps(first))
+    second['request'].update(method='get', query='a=1&b=2', headers={'ACCEPT': 'json'})
+    first['request']['headers'] = {'Accept': 'json'}
+    second['response']['body']['cows'] = ['Marie']
+    third = dict(first, request=dict(first['request'], method='POST'))
+    pact['interactions'] = [first, second, third, third]
+
+    client = Client()
+    provider = base.Provider(pact, client, cached_methods=cached_methods)
+    report = provider.verification_report('anotherService')
+
+    assert len(client.calls) == calls
+    assert [interaction.passed for interaction in report.interactions] == [True, False, True, True]
+    assert (report.interactions[1].request_time == 0.) == bool(cached_methods)
@@ -2,15 +2,134 @@
 
 from __future__ import unicode_literals
 
-import difflib
+from collections import defaultdict
+from contextlib import contextmanager
+import copy
 import json
 import re
-import urlparse
+import threading
+from timeit import default_timer
 
 from . import matchers as matchers_module
+from . import sharing
 
 
-def prepare(actual, expected, sanitized_keys):
+# Instrumentation: callbacks registered here receive a ComparisonStats after
+# each instrumented call. When none is registered, the hot path only pays for
+# a truthiness check of ``_callbacks``.
+_callbacks = []
+_local = threading.local()
+
+
+class ComparisonStats(object):
+    """Statistics recorded during one instrumented call (``_diff_pacts`` or ``format_diff``)."""
+    def __init__(self):
+        self.timings = {}
+        self.nodes = 0
+        self.matcher_lookups = 0
+        self.bytes_serialized = 0
+
+
+class Profile(object):
+    """
+        Callback aggregating ComparisonStats, e.g. across a whole provider run.
+
+        ``timings`` holds the cumulated time spent in each stage and ``calls``
+        the number of times each stage was run.
+    """
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.nodes = 0
+        self.matcher_lookups = 0
+        self.bytes_serialized = 0
+
+    def __call__(self, stats):
+        for stage, timing in stats.timings.items():
+            self.timings[stage] += timing
+            self.calls[stage] += 1
+        self.nodes += stats.nodes
+        self.matcher_lookups += stats.matcher_lookups
+        self.bytes_serialized += stats.bytes_serialized
+
+    @property
+    def comparisons(self):
+        return self.calls['compare']
+
+    def to_dict(self):
+        return {
+            'comparisons': self.comparisons,
+            'timings': dict(self.timings),
+            'calls': dict(self.calls),
+            'nodes': self.nodes,
+            'matcher_lookups': self.matcher_lookups,
+            'bytes_serialized': self.bytes_serialized,
+        }
+
+
+def add_callback(callback):
+    """Register ``callback`` to be called with a ComparisonStats after each instrumented call."""
+    _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    _callbacks.remove(callback)
+
+
+@contextmanager
+def profile(aggregate=None):
+    """
+        Aggregate the statistics of all the comparisons run inside the context in a Profile.
+
+        Usage:
+            with validator.profile() as p:
+                provider.honours_pact_with('consumer')
+            print(p.to_dict())
+    """
+    aggregate = Profile() if aggregate is None else aggregate
+    add_callback(aggregate)
+    try:
+        yield aggregate
+    finally:
+        remove_callback(aggregate)
+
+
+def _begin_stats():
+    """Start recording statistics, or join the recording in progress in this thread."""
+    if not _callbacks:
+        return None
+    if getattr(_local, 'stats', None) is None:
+        _local.stats = ComparisonStats()
+        _local.depth = 0
+    _local.depth += 1
+    return _local.stats
+
+
+def _end_stats(stats):
+    if stats is not None:
+        _local.depth -= 1
+        if not _local.depth:
+            _local.stats = None
+            for callback in list(_callbacks):
+                callback(stats)
+
+
+def _count(attribute):
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        setattr(stats, attribute, getattr(stats, attribute) + 1)
+
+
+def _stage(stats, name, function, *args, **kwargs):
+    if stats is None:
+        return function(*args, **kwargs)
+    start = default_timer()
+    ret = function(*args, **kwargs)
+    stats.timings[name] = stats.timings.get(name, 0.) + default_timer() - start
+    return ret
+
+
+def prepare(actual, expected, sanitized_keys, ignore_extra_keys=()):
     """
         This function tries to sanitize actual and expected trees so that they can be processed by the differ.
         Both trees are processed with the following:
@@ -20,46 +139,132 @@ def prepare(actual, expected, sanitized_keys):
         - query params are converted to a dict of lists
         - if one key is missing in ``expected``, remove it from ``actual``
 
+        The headers and query params of ``actual`` are normalized on demand:
+        if ``headers`` or ``query`` is in ``ignore_extra_keys``, only the
+        entries also found in ``expected`` are kept, the others would be
+        ignored by the comparison anyway.
+
         **The input trees are modified in place**.
     """
-    def sanitize_empty_keys(actual, expected, keys):
-        for key in keys:
-            if key not in expected:
-                actual.pop(key, None)  # No check at all if key is not in expected
+    _normalize(expected)
+    _prepare_actual(actual, expected, sanitized_keys, _wanted_keys(expected, ignore_extra_keys))
 
-    def apply_safe(function, x):
-        try:
-            return function(x)
-        except:
-            return x
 
-    def format_header_value(header_value):
-        return ','.join(value.strip(' ') for value in header_value.split(','))
+def _apply_safe(function, x):
+    try:
+        return function(x)
+    except:
+        return x
 
-    sanitize_empty_keys(actual, expected, sanitized_keys)
 
-    for tree in (actual, expected):
-        if 'method' in tree:
-            tree['method'] = apply_safe(lambda x: x.lower(), tree['method'])
-        if 'headers' in tree:
-            tree['headers'] = apply_safe(
-                lambda x: dict((k.lower(), format_header_value(v)) for k, v in x.items()),
-                tree['headers'],
-            )
-        if 'matchingRules' in tree:
-            lower_header = lambda x: x.lower() if x.startswith('$.headers') else x
-            tree['matchingRules'] = apply_safe(
-                lambda d: dict((lower_header(k), v) for k, v in d.items()),
-                tree['matchingRules'],
-            )
-        if 'query' in tree:
-            tree['query'] = apply_safe(
-                lambda x: urlparse.parse_qs(x, keep_blank_values=True),
-                tree['query'],
-            )
+def _format_header_value(header_value):
+    return ','.join(value.strip(' ') for value in header_value.split(','))
+
 
+def _format_headers(headers, wanted=None):
+    ret = {}
+    for key, value in headers.items():
+        key = key.lower()
+        if wanted is None or key in wanted:
+            ret[key] = _format_header_value(value)
+    return ret
 
-def compare(actual, expected, path=None, matchers=None, ignore_extra_keys=True):
+
+def _parse_query(query, wanted=None):
+    try:
+        from urllib.parse import parse_qs, unquote
+    except ImportError:  # Python 2
+        from urlparse import parse_qs, unquote
+    if wanted is not None:
+        query = '&'.join(
+            param for param in query.split('&')
+            if unquote(param.split('=', 1)[0].replace('+', ' ')) in wanted
+        )
+    return parse_qs(query, keep_blank_values=True)
+
+
+def _lower_header_rule(path):
+    return path.lower() if path.startswith('$.headers') else path
+
+
+def _normalize(tree, wanted=None):
+    """Normalize the method, headers, matchingRules and query of ``tree`` in place (see ``prepare``)."""
+    wanted = wanted or {}
+    if 'method' in tree:
+        tree['method'] = _apply_safe(lambda x: x.lower(), tree['method'])
+    if 'headers' in tree:
+        tree['headers'] = _apply_safe(lambda x: _format_headers(x, wanted.get('headers')), tree['headers'])
+    if 'matchingRules' in tree:
+        tree['matchingRules'] = _apply_safe(
+            lambda d: dict((_lower_header_rule(k), v) for k, v in d.items()),
+            tree['matchingRules'],
+        )
+    if 'query' in tree:
+        tree['query'] = _apply_safe(lambda x: _parse_query(x, wanted.get('query')), tree['query'])
+
+
+def _wanted_keys(expected, ignore_extra_keys):
+    """Return the entries of the normalized ``expected`` to keep in the actual headers and query."""
+    wanted = {}
+    for key in ('headers', 'query'):
+        if key in ignore_extra_keys and type(expected.get(key)) == dict:
+            wanted[key] = set(expected[key])
+    return wanted
+
+
+def _prepare_actual(actual, expected, sanitized_keys, wanted):
+    for key in sanitized_keys:
+        if key not in expected:
+            actual.pop(key, None)  # No check at all if key is not in expected
+    _normalize(actual, wanted)
+
+
+class ErrorBudget(object):
+    """
+        Bounds the errors reported by ``compare``.
+
+        Once ``max_errors`` errors have been found, ``compare`` stops descending
+        in the trees and only counts the values it did not compare. Subtrees
+        deeper than ``max_depth`` (``['$']['body']`` has a depth of 1) are
+        compared but their errors are collapsed into a single Difference
+        reported at ``max_depth``.
+
+        A budget holds the state of one comparison and must not be reused.
+    """
+    def __init__(self, max_errors=None, max_depth=None):
+        self.max_errors = max_errors
+        self.max_depth = max_depth
+        self.errors = 0
+        self.depth = 0
+        self.not_compared = 0
+
+    @property
+    def exhausted(self):
+        return self.max_errors is not None and self.errors >= self.max_errors
+
+    def record(self, diff):
+        if isinstance(diff, matchers_module.BaseError):
+            self.errors += 1
+        return diff
+
+    def skip(self, count):
+        self.not_compared += count
+
+    def summary(self):
+        """Return an ErrorBudgetExceeded if some values were not compared, None otherwise."""
+        if self.not_compared:
+            return matchers_module.ErrorBudgetExceeded(self.errors, self.not_compared)
+
+
+def _has_errors(diff):
+    if type(diff) == dict:
+        return any(_has_errors(value) for value in diff.values())
+    if type(diff) in (list, tuple):
+        return any(_has_errors(value) for value in diff)
+    return isinstance(diff, matchers_module.BaseError)
+
+
+def compare(actual, expected, path=None, matchers=None, ignore_extra_keys=True, budget=None):
     """
         Build the diff tree of the two trees given as input.
 
@@ -70,29 +275,57 @@ def compare(actual, expected, path=None, matchers=None, ignore_extra_keys=True):
             path:
             matchers:
             ignore_extra_keys (bool): whether to ignore extra keys in the ``actual`` tree or not
+            budget (ErrorBudget): bounds the number of errors and the depth at which they are reported
     """
     path = path or "['$']"
     matchers = matchers or []
+    if _callbacks:
+        _count('nodes')
+
+    if (budget is not None and budget.max_depth is not None and budget.depth + 1 >= budget.max_depth and
+            type(expected) in (dict, list, tuple)):
+        # below max_depth: compare without budget and collapse the errors found
+        diff = compare(actual, expected, path, matchers, ignore_extra_keys)
+        if _has_errors(diff):
+            return budget.record(matchers_module.Difference(actual, expected))
+        return diff
 
     if type(expected) == dict:
         if type(actual) != dict:
-            return matchers_module.TypeNotMatched(actual, expected)
-        return _compare_dicts(actual, expected, path, matchers, ignore_extra_keys)
+            return _record(budget, matchers_module.TypeNotMatched(actual, expected))
+        return _compare_dicts(actual, expected, path, matchers, ignore_extra_keys, budget)
     # Do not use collections.Sequence, it also matches strings which must be
     # treated as tree leaves.
     elif type(expected) in (list, tuple):
         if type(actual) not in (list, tuple):
-            return matchers_module.TypeNotMatched(actual, expected)
-        return _compare_lists(actual, expected, path, matchers, ignore_extra_keys)
+            return _record(budget, matchers_module.TypeNotMatched(actual, expected))
+        return _compare_lists(actual, expected, path, matchers, ignore_extra_keys, budget)
     else:
-        return _compare_values(actual, expected, path, matchers)
+        return _compare_values(actual, expected, path, matchers, budget)
+
 
+def _record(budget, diff):
+    return diff if budget is None else budget.record(diff)
 
-def _compare_dicts(actual, expected, path, matchers, ignore_extra_keys):
+
+def _compare_dicts(actual, expected, path, matchers, ignore_extra_keys, budget=None):
+    # only ``values`` rules apply to dicts, other rules apply to their leaves
+    values_matchers = _values_matchers(matchers)
+    if values_matchers:
+        if _callbacks:
+            _count('matcher_lookups')
+        if matchers_module.get_best_matcher(values_matchers, path):
+            return _compare_values_of_dicts(actual, expected, path, matchers, ignore_extra_keys, budget)
     diff_tree = {}
-    for key, expected_value in expected.items():
+    if budget is not None:
+        budget.depth += 1
+    for i, (key, expected_value) in enumerate(expected.items()):
+        if budget is not None and budget.exhausted:
+            budget.skip(len(expected) - i)
+            break
         if key not in actual:
-            diff_tree[key] = matchers_module.Difference(matchers_module.KeyNotFound, expected_value)
+            diff_tree[key] = _record(
+                budget, matchers_module.Difference(matchers_module.KeyNotFound, expected_value))
         else:
             actual_value = actual[key]
             diff_tree[key] = compare(
@@ -101,29 +334,85 @@ def _compare_dicts(actual, expected, path, matchers, ignore_extra_keys):
                 path=_append_key_to_path(path, key),
                 matchers=matchers,
                 ignore_extra_keys=ignore_extra_keys,
+                budget=budget,
             )
     if not ignore_extra_keys:
-        unexpected_keys = set(actual.keys()) - set(expected.keys())
-        for key in unexpected_keys:
-            diff_tree[key] = matchers_module.Difference(actual[key], matchers_module.UnexpectedKey)
+        for key in actual:
+            if key in expected:
+                continue
+            if budget is not None and budget.exhausted:
+                budget.skip(1)
+                continue
+            diff_tree[key] = _record(budget, matchers_module.Difference(actual[key], matchers_module.UnexpectedKey))
+    if budget is not None:
+        budget.depth -= 1
+    return diff_tree
+
+
+def _values_matchers(matchers):
+    return [x for x in matchers if isinstance(x[1], matchers_module.ValuesMatcher)]
+
+
+def _compare_values_of_dicts(actual, expected, path, matchers, ignore_extra_keys, budget=None):
+    """
+        Compare the values of two dicts whatever their keys (``values`` rule).
+
+        Each actual value is compared with the expected value of the same key,
+        or with the first expected value (by key order) if there is none.
+    """
+    if not expected:
+        return dict(actual)
+    template = expected[sorted(expected)[0]]
+    diff_tree = {}
+    for key, actual_value in actual.items():
+        if budget is not None and budget.exhausted:
+            budget.skip(1)
+            continue
+        diff_tree[key] = compare(
+            actual_value,
+            expected.get(key, template),
+            path=_append_key_to_path(path, key),
+            matchers=matchers,
+            ignore_extra_keys=ignore_extra_keys,
+            budget=budget,
+        )
     return diff_tree
 
 
-def _compare_lists(actual, expected, path, matchers, ignore_extra_keys):
+def _compare_lists(actual, expected, path, matchers, ignore_extra_keys, budget=None):
     diff_tree = []
     max_length = max(len(actual), len(expected))
+    if _callbacks:
+        _count('matcher_lookups')
     value_matcher = matchers_module.get_best_matcher(matchers, path)
+    if isinstance(value_matcher, matchers_module.UnorderedMatcher):
+        return _compare_unordered(actual, expected, value_matcher, path, matchers, ignore_extra_keys, budget)
+    if isinstance(value_matcher, matchers_module.CombinedMatcher) and value_matcher.unordered is not None:
+        diff = value_matcher.others.diff(actual, expected) if value_matcher.others is not None else None
+        if diff and value_matcher.combine == 'AND':
+            return _record(budget, diff)
+        if diff or value_matcher.others is None or value_matcher.combine == 'AND':
+            return _compare_unordered(
+                actual, expected, value_matcher.unordered, path, matchers, ignore_extra_keys, budget)
+        value_matcher = None  # OR: the other rules match, the elements are compared in order
     if value_matcher:
         diff = value_matcher.diff(actual, expected)
         if diff:
-            return diff
-
-    for i in xrange(max_length):
+            return _record(budget, diff)
+
+    if budget is not None:
+        budget.depth += 1
+    for i in range(max_length):
+        if budget is not None and budget.exhausted:
+            budget.skip(max_length - i)
+            break
         next_path = _append_index_to_path(path, i)
         actual_value = actual[i] if i < len(actual) else matchers_module.IndexNotFound
         if i < len(expected):
             expected_value = expected[i]
         else:
+            if _callbacks and expected:
+                _count('matcher_lookups')
             if expected and matchers_module.get_best_matcher(matchers, next_path):
                 expected_value = expected[0]
             else:
@@ -135,14 +424,83 @@ def _compare_lists(actual, expected, path, matchers, ignore_extra_keys):
                 matchers=matchers,
                 path=next_path,
                 ignore_extra_keys=ignore_extra_keys,
+                budget=budget,
             )
         )
+    if budget is not None:
+        budget.depth -= 1
+    return diff_tree
+
+
+def _compare_unordered(actual, expected, value_matcher, path, matchers, ignore_extra_keys, budget=None):
+    """
+        Compare two lists whatever the order of their elements.
+
+        Identical elements are paired by hash by the UnorderedMatcher. The
+        elements left are then paired with a maximum bipartite matching,
+        compatibility between two elements being checked with ``compare``, so
+        that elements matching like in an ordered comparison (extra keys,
+        other matching rules, 1 and 1.0...) are paired too.
+
+        The diff tree contains the actual elements, the unpaired ones being
+        replaced by a Difference, followed by a Difference for each expected
+        element that was not found.
+    """
+    pairs, actual_left, expected_left = value_matcher.pair(actual, expected)
+    if actual_left and expected_left:
+        def compatible(i, j):
+            diff = compare(actual[i], expected[j], _append_index_to_path(path, i), matchers, ignore_extra_keys)
+            return not _has_errors(diff)
+        pairs.update(_assign(actual_left, expected_left, compatible))
+        paired = set(pairs.values())
+        actual_left = [i for i in actual_left if i not in pairs]
+        expected_left = [j for j in expected_left if j not in paired]
+
+    diff_tree = []
+    for i, value in enumerate(actual):
+        if i in pairs:
+            diff_tree.append(value)
+        else:
+            diff_tree.append(_record(budget, matchers_module.Difference(value, matchers_module.UnexpectedIndex)))
+    for j in expected_left:
+        diff_tree.append(_record(budget, matchers_module.Difference(matchers_module.IndexNotFound, expected[j])))
     return diff_tree
 
 
-def _compare_values(actual, expected, path, matchers):
+def _assign(left, right, compatible):
+    """
+        Maximum bipartite matching between ``left`` and ``right`` (Kuhn's algorithm).
+
+        Return: a dict mapping elements of left to elements of right.
+    """
+    cache = {}
+    match_right = {}
+
+    def is_compatible(i, j):
+        if (i, j) not in cache:
+            cache[i, j] = compatible(i, j)
+        return cache[i, j]
+
+    def augment(i, seen):
+        for j in right:
+            if j in seen or not is_compatible(i, j):
+                continue
+            seen.add(j)
+            if j not in match_right or augment(match_right[j], seen):
+                match_right[j] = i
+                return True
+        return False
+
+    for i in left:
+        augment(i, set())
+    return dict((i, j) for j, i in match_right.items())
+
+
+def _compare_values(actual, expected, path, matchers, budget=None):
+    if _callbacks:
+        _count('matcher_lookups')
     matcher = matchers_module.get_best_matcher(matchers, path) or matchers_module.EqualityMatcher()
-    return matcher.diff(actual, expected) or actual
+    return _record(budget, matcher.diff(actual, expected)) or actual
 
 
 def _append_key_to_path(path, key):
@@ -158,28 +516,33 @@ def _append_index_to_path(path, index):
     return "%s[%s]" % (path, index)
 
 
-def trees_from_diff(diff, errors):
+def trees_from_diff(diff, errors, path=None):
     """
         Rebuild the actual and expected trees from the diff tree.
 
         The expected tree is modified with values from actual when those values
         match the expected rules. These trees can then be exported to json and
         compared to display a nice diff to the end user.
+
+        Errors found on the way are appended to ``errors`` and their ``path``
+        attribute is set to their location in the trees.
     """
+    path = path or "['$']"
     if type(diff) == dict:
         actual, expected = {}, {}
         for key, value in diff.items():
-            actual_next, expected_next = trees_from_diff(value, errors)
+            actual_next, expected_next = trees_from_diff(value, errors, _append_key_to_path(path, key))
             actual[key] = actual_next
             expected[key] = expected_next
     elif type(diff) in (list, tuple, set):
         actual, expected = [], []
-        for el in diff:
-            actual_next, expected_next = trees_from_diff(el, errors)
+        for i, el in enumerate(diff):
+            actual_next, expected_next = trees_from_diff(el, errors, _append_index_to_path(path, i))
             actual.append(actual_next)
             expected.append(expected_next)
     else:
         if isinstance(diff, matchers_module.BaseError):
+            diff.path = path
             errors.append(diff)
             actual, expected = diff.split()
         else:
@@ -187,54 +550,249 @@ def trees_from_diff(diff, errors):
     return actual, expected
 
 
-def compare_requests(actual, expected):
+REQUEST_KEYS = ('method', 'path', 'query', 'headers', 'body')
+REQUEST_SANITIZED_KEYS = ('headers', 'query', 'body')
+REQUEST_IGNORE_EXTRA_KEYS = ('headers',)
+
+RESPONSE_KEYS = ('status', 'headers', 'body')
+RESPONSE_SANITIZED_KEYS = ('headers', 'status', 'body')
+RESPONSE_IGNORE_EXTRA_KEYS = ('headers', 'body')
+
+
+def compare_requests(actual, expected, max_errors=None, max_depth=None):
     """
         Travel actual and expected request trees and search for differences.
-    """
-    keys = ('method', 'path', 'query', 'headers', 'body')
-    sanitized_keys = ('headers', 'query', 'body')
-    ignore_extra_keys = ('headers',)
 
-    return _compare_pacts(actual, expected, keys, sanitized_keys, ignore_extra_keys)
+        See ``ErrorBudget`` for ``max_errors`` and ``max_depth``.
+    """
+    return format_errors(diff_requests(actual, expected, max_errors, max_depth)[0])
 
 
-def compare_responses(actual, expected):
+def compare_responses(actual, expected, max_errors=None, max_depth=None):
     """
         Travel actual and expected response trees and search for differences.
+
+        See ``ErrorBudget`` for ``max_errors`` and ``max_depth``.
+    """
+    return format_errors(diff_responses(actual, expected, max_errors, max_depth)[0])
+
+
+def diff_requests(actual, expected, max_errors=None, max_depth=None):
     """
-    keys = ('status', 'headers', 'body')
-    sanitized_keys = ('headers', 'status', 'body')
-    ignore_extra_keys = ('headers', 'body')
+        Same as ``compare_requests`` but return the errors and trees instead of the rendered diff.
+    """
+    return _diff_pacts(
+        actual, expected, REQUEST_KEYS, REQUEST_SANITIZED_KEYS, REQUEST_IGNORE_EXTRA_KEYS, max_errors, max_depth)
+
 
-    return _compare_pacts(actual, expected, keys, sanitized_keys, ignore_extra_keys)
+def diff_responses(actual, expected, max_errors=None, max_depth=None):
+    """
+        Same as ``compare_responses`` but return the errors and trees instead of the rendered diff.
+    """
+    return _diff_pacts(
+        actual, expected, RESPONSE_KEYS, RESPONSE_SANITIZED_KEYS, RESPONSE_IGNORE_EXTRA_KEYS, max_errors, max_depth)
 
 
-def _compare_pacts(actual, expected, keys, sanitized_keys, ignore_extra_keys):
+def _diff_pacts(actual, expected, keys, sanitized_keys, ignore_extra_keys, max_errors=None, max_depth=None):
     """
         Travel actual and expected trees and search for differences.
 
-        Return: an array of str representing the diff between actual and expected.
-            If actual and expected match, the array is empty.
+        Return: a tuple (errors, actual, expected) where errors is the list of
+            BaseError found and actual and expected are the trees rebuilt by
+            ``trees_from_diff``. If actual and expected match, errors is empty.
+            If the error budget was exceeded, the last error is an
+            ErrorBudgetExceeded summarizing what was not compared.
     """
-    prepare(actual, expected, sanitized_keys=sanitized_keys)
-    matchers = [
-        (matchers_module.PathMatcher.from_jsonpath(path), matchers_module.ValueMatcher.from_dict(rule))
-        for path, rule in expected.pop('matchingRules', {}).items()
-    ]
+    stats = _begin_stats()
+    expectation = CompiledExpectation(expected, keys, sanitized_keys, ignore_extra_keys, copy_expected=False)
+    ret = expectation.diff(actual, max_errors, max_depth, copy_actual=False)
+    _end_stats(stats)
+    return ret
+
+
+class CompiledExpectation(object):
+    """
+        An expected request or response normalized and with its matching rules compiled once.
+
+        Many actual trees can then be checked against it without parsing the
+        expectation again. Neither the expected tree given to the constructor
+        nor the actual trees given to ``diff`` are modified. With
+        ``copy_expected=False`` the expected tree is only copied shallowly:
+        its values must then not be modified while the expectation is used.
+
+        The matchers of a ``sharing.SharedDict`` of matching rules are compiled
+        once for all the expectations using it.
+    """
+    def __init__(self, expected, keys, sanitized_keys, ignore_extra_keys, copy_expected=True):
+        stats = _begin_stats()
+        if copy_expected:
+            expected = copy.deepcopy(expected)
+        else:
+            expected = dict(expected)  # the normalization only replaces top level values
+        rules = expected.get('matchingRules')
+        _stage(stats, 'prepare', _normalize, expected)
+        normalized_rules = expected.pop('matchingRules', {})
+        for key, value in expected.items():
+            # the comparison tells dicts and lists from leaves by their exact type
+            expected[key] = sharing.unshare(value)
+        if isinstance(rules, sharing.SharedDict):
+            if rules.compiled_matchers is None:
+                rules.compiled_matchers = _stage(stats, 'compile', _compile_matchers, normalized_rules)
+            self.matchers = rules.compiled_matchers
+        else:
+            self.matchers = _stage(stats, 'compile', _compile_matchers, normalized_rules)
+        self.expected = expected
+        self.keys = keys
+        self.sanitized_keys = sanitized_keys
+        self.ignore_extra_keys = ignore_extra_keys
+        self.wanted = _wanted_keys(expected, ignore_extra_keys)
+        _end_stats(stats)
+
+    def diff(self, actual, max_errors=None, max_depth=None, copy_actual=True):
+        """
+            Compare ``actual`` with the expectation, see ``diff_requests`` and ``diff_responses``.
+        """
+        stats = _begin_stats()
+        if copy_actual:
+            actual = dict(actual)  # the normalization only replaces top level values
+        budget = None
+        if max_errors is not None or max_depth is not None:
+            budget = ErrorBudget(max_errors, max_depth)
+        _stage(stats, 'prepare', _prepare_actual, actual, self.expected, self.sanitized_keys, self.wanted)
+        diff_tree = _stage(
+            stats, 'compare', _compare_keys,
+            actual, self.expected, self.keys, self.matchers, self.ignore_extra_keys, budget,
+        )
+        errors = []
+        actual, expected = _stage(stats, 'trees_from_diff', trees_from_diff, diff_tree, errors)
+        _end_stats(stats)
+        summary = budget.summary() if budget is not None else None
+        if summary is not None:
+            summary.path = "['$']"
+            errors.append(summary)
+        return errors, actual, expected
+
+    def matches(self, actual):
+        return not self.diff(actual)[0]
+
+
+class CompiledRequestExpectation(CompiledExpectation):
+    """CompiledExpectation of a request, e.g. to check the requests received by a mock service."""
+    def __init__(self, expected):
+        super(CompiledRequestExpectation, self).__init__(
+            expected, REQUEST_KEYS, REQUEST_SANITIZED_KEYS, REQUEST_IGNORE_EXTRA_KEYS)
+
+
+class CompiledResponseExpectation(CompiledExpectation):
+    """CompiledExpectation of a response."""
+    def __init__(self, expected):
+        super(CompiledResponseExpectation, self).__init__(
+            expected, RESPONSE_KEYS, RESPONSE_SANITIZED_KEYS, RESPONSE_IGNORE_EXTRA_KEYS)
+
+
+def _compile_matchers(matching_rules):
+    return matchers_module.compile_matchers(_flatten_matching_rules(matching_rules))
+
+
+def _flatten_matching_rules(matching_rules):
+    """
+        Convert pact v3 matching rules, grouped by category, to v2 rules keyed by a path from the root.
+
+        e.g. ``{"body": {"$.id": rule}, "header": {"X-Id": rule}}`` becomes
+        ``{"$.body.id": rule, "$.headers['x-id']": rule}``. v2 rules are returned as is.
+    """
+    if all(key.startswith('$') for key in matching_rules):
+        return matching_rules
+    flat = {}
+    for category, rules in matching_rules.items():
+        if category.startswith('$'):
+            flat[category] = rules
+        elif category == 'body':
+            for path, rule in rules.items():
+                flat['$.body%s' % path[1:]] = rule
+        elif category in ('header', 'headers'):
+            for name, rule in rules.items():
+                flat["$.headers['%s']" % name.lower()] = rule
+        elif category == 'query':
+            # query values are parsed as lists, the rules apply to each value
+            for name, rule in rules.items():
+                flat["$.query['%s'][*]" % name] = rule
+        else:  # path, status, method: the rule applies to the whole value
+            flat['$.%s' % category] = rules
+    return flat
+
+
+def normalize_expected(expected):
+    """
+        Return a normalized copy of the expected request or response ``expected`` and its matching rules.
+
+        Return: a tuple (expected, rules) where expected is normalized like
+            for a comparison and without its matchingRules, and rules are its
+            matching rules as v2 rules keyed by a path from the root.
+        Raise: AttributeError if a v3 rule category is not an object.
+    """
+    expected = copy.deepcopy(expected)
+    _normalize(expected)
+    return expected, _flatten_matching_rules(expected.pop('matchingRules', {}))
+
+
+def _compare_keys(actual, expected, keys, matchers, ignore_extra_keys, budget=None):
     diff_tree = {}
-    for key in keys:
+    for i, key in enumerate(keys):
+        if budget is not None and budget.exhausted:
+            budget.skip(len(keys) - i)
+            break
         diff_tree[key] = compare(
             actual.get(key, None),
             expected.get(key, None),
             path=_append_key_to_path(path=None, key=key),
             matchers=matchers,
             ignore_extra_keys=key in ignore_extra_keys,
+            budget=budget,
         )
+    return diff_tree
+
+
+def _colorize(line, color, with_color):
+    return '\033[%sm%s\033[0;m' % (color, line) if with_color else line
+
 
-    errors = []
-    actual, expected = trees_from_diff(diff_tree, errors)
-    diff = format_diff(actual, expected)
-    return diff
+def _dump_value(value, max_lines):
+    lines = json.dumps(value, sort_keys=True, indent=4, separators=(',', ': '), default=repr).splitlines()
+    if len(lines) > max_lines:
+        lines = lines[:max_lines] + ['... (%d more lines)' % (len(lines) - max_lines)]
+    return lines
+
+
+def format_errors(errors, with_color=True, max_lines=20):
+    """
+        Render the errors found by ``trees_from_diff`` as a human readable diff.
+
+        Contrary to ``format_diff`` which diffs the whole trees, only the
+        mismatching values are rendered, each one under its path and truncated
+        to ``max_lines`` lines, so the rendering time grows with the number and
+        size of the errors rather than with the size of the trees.
+
+        Return: an iterable of lines, empty if there is no error.
+    """
+    stats = _begin_stats()
+    start = default_timer() if stats else None
+    lines = []
+    if errors:
+        lines.extend(['--- actual\n', '+++ expected\n'])
+    # keep the budget summary last
+    ordered = sorted(errors, key=lambda x: (isinstance(x, matchers_module.ErrorBudgetExceeded), getattr(x, 'path', '')))
+    for error in ordered:
+        actual, expected = error.split()
+        lines.append('@@ %s %s @@\n' % (getattr(error, 'path', "['$']"), error.__class__.__name__))
+        for prefix, value, color in (('-', actual, '1;31'), ('+', expected, '1;32')):
+            for line in _dump_value(value, max_lines):
+                lines.append(_colorize('%s%s\n' % (prefix, line), color, with_color))
+    if stats is not None:
+        stats.bytes_serialized += sum(len(line) for line in lines)
+        stats.timings['format_errors'] = default_timer() - start
+        _end_stats(stats)
+    return iter(lines)
 
 
 def format_diff(actual, expected, with_color=True):
@@ -248,11 +806,24 @@ def format_diff(actual, expected, with_color=True):
             ret = re.sub(removed_re, r'\033[1;31m\1\033[0;m', x)
         return ret
 
+    import difflib
+
+    stats = _begin_stats()
+    start = default_timer() if stats else None
     keepends = True
+    actual_json = json.dumps(actual, sort_keys=True, indent=4) + '\n'
+    expected_json = json.dumps(expected, sort_keys=True, indent=4) + '\n'
     lines = difflib.unified_diff(
-        (json.dumps(actual, sort_keys=True, indent=4) + '\n').splitlines(keepends),
-        (json.dumps(expected, sort_keys=True, indent=4) + '\n').splitlines(keepends),
+        actual_json.splitlines(keepends),
+        expected_json.splitlines(keepends),
         fromfile='actual',
         tofile='expected',
     )
-    return (colorize(line) for line in lines)
+    lines = (colorize(line) for line in lines)
+    if stats is not None:
+        # consume the generator so that the whole rendering is timed
+        lines = iter(list(lines))
+        stats.bytes_serialized += len(actual_json) + len(expected_json)
+        stats.timings['format_diff'] = default_timer() - start
+        _end_stats(stats)
+    return lines
@@ -0,0 +1,16 @@
+"""
+Provider verifiers.
+
+The verifiers are loaded on first attribute access (Python 3.7+) so that
+importing the package pulls in neither ``requests`` nor Django.
+"""
+import importlib
+
+
+_SUBMODULES = ('base', 'broker', 'drf', 'http', 'load', 'processes', 'report', 'results')
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
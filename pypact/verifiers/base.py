@@ -1,7 +1,12 @@
+from collections import OrderedDict
 from contextlib import contextmanager
 import json
+from timeit import default_timer
 
+from .. import sharing
 from .. import validator
+from . import report
+from . import results
 
 
 class BadPactFormat(Exception):
@@ -29,16 +34,71 @@ class PactClientMock(object):
         raise NotImplementedError
 
 
-def _get_pact(pact_uri):
-    with open(pact_uri, 'r') as pact_file:
-        pact = json.load(pact_file)
-    return pact
+def _get_pact(pact_uri, cache=None):
+    """
+        Load the pact at ``pact_uri``, sharing the repeated metadata of its interactions (see ``sharing.share_pact``).
+
+        The strings of a binary pact are already shared by its decoder.
+    """
+    if hasattr(pact_uri, 'get'):
+        return pact_uri  # already loaded, e.g. a processes.SharedPact document
+    if pact_uri.startswith('http://') or pact_uri.startswith('https://'):
+        from . import broker
+        return sharing.share_pact(broker.fetch_pact(pact_uri, cache=cache))
+    from .. import binary
+    with open(pact_uri, 'rb') as pact_file:
+        data = pact_file.read()
+    if binary.is_binary(data):
+        return binary.BinaryPact(data).document
+    return sharing.share_pact(json.loads(data.decode('utf-8')))
+
+
+SAFE_METHODS = ('get', 'head', 'options')
+
+try:
+    STRING_TYPES = (str, unicode)
+except NameError:  # Python 3
+    STRING_TYPES = (str,)
+
+
+def get_init_states(interaction):
+    return [(s['name'].replace(' ', '_'), s['params']) for s in interaction.get('providerStates', [])]
 
 
 class Provider(object):
-    def __init__(self, pact_uri, client):
-        self.pact = _get_pact(pact_uri)
+    """
+        Verify that a provider honours the pact at ``pact_uri`` by replaying its interactions through ``client``.
+
+        ``pact_uri`` may also be an already loaded pact, or the URL of a pact
+        on a broker, fetched through ``pact_cache`` (a ``broker.PactCache``)
+        when given. The interactions of a binary pact file (see
+        ``pypact.binary``) are only decoded when they are replayed.
+
+        When a ``results_store`` (see ``results.ResultsStore``) is given, the
+        interactions already verified against the same provider ``fingerprint``
+        are skipped, and their indices are listed in ``skipped`` after a run.
+
+        ``max_errors`` and ``max_depth`` bound the errors reported for each
+        interaction (see ``validator.ErrorBudget``).
+
+        Within a run, the response to a request of one of ``cached_methods``
+        is kept and compared with the expectations of the next interactions
+        having the same request and provider states, instead of calling the
+        provider again. Only safe methods are cached by default.
+    """
+    def __init__(self, pact_uri, client, results_store=None, fingerprint=None, max_errors=None, max_depth=None,
+                 pact_cache=None, cached_methods=SAFE_METHODS):
+        if results_store is not None and fingerprint is None:
+            raise ValueError('a fingerprint is required to use a results store')
+        self.pact = _get_pact(pact_uri, pact_cache)
         self.client = client
+        self.results_store = results_store
+        self.fingerprint = fingerprint
+        self.max_errors = max_errors
+        self.max_depth = max_depth
+        self.cached_methods = set(method.lower() for method in cached_methods)
+        self.skipped = []
+        self._responses = {}
 
     def get_and_assert_key(self, key):
         ret, path = self.pact, ''
@@ -54,25 +114,195 @@ class Provider(object):
                 raise BadPactFormat('key %s not found' % path)
         return ret
 
+    def send_request(self, i, interaction):
+        """Send the request of the ``i``-th interaction through the client and return its response."""
+        method = self.get_and_assert_key('interactions.%s.request.method' % i).lower()
+        method = getattr(self.client, method, None)
+        if not method:
+            raise BadPactFormat('method %s is not a valid method' % method)
+        request = interaction['request']
+        path = self.get_and_assert_key('interactions.%s.request.path' % i)
+        return method(
+            self.client,
+            path=path,
+            data=request.get('data', None),
+            headers=request.get('headers', None),
+            query=request.get('query', None),
+        )
+
+    def _response_key(self, interaction):
+        """Return the key of the response to ``interaction`` in the snapshot cache, or None if it is not cached."""
+        if interaction['request'].get('method', '').lower() not in self.cached_methods:
+            return None
+        return _request_key(interaction)
+
+    def report_interaction(self, i, interaction, with_color=True):
+        """
+            Replay the ``i``-th interaction and return an ``InteractionReport`` with the timing of each step.
+
+            A response taken from the snapshot cache has no state nor request time.
+        """
+        key = self._response_key(interaction)
+        if key is not None and key in self._responses:
+            # the comparison replaces top level values of the response, keep the snapshot intact
+            return self.report_response(i, interaction, dict(self._responses[key]), with_color)
+        timer = default_timer()
+        with self.client.set_up(init_states=get_init_states(interaction)):
+            state_time, timer = default_timer() - timer, default_timer()
+            response = self.send_request(i, interaction)
+            request_time = default_timer() - timer
+        if key is not None:
+            self._responses[key] = dict(response)
+        return self.report_response(i, interaction, response, with_color, state_time, request_time)
+
+    def report_response(self, i, interaction, response, with_color=True, state_time=0., request_time=0.):
+        """Compare ``response`` with the expected response of the ``i``-th interaction and return an ``InteractionReport``."""
+        timer = default_timer()
+        expected_response = self.get_and_assert_key('interactions.%s.response' % i)
+        errors, _actual, _expected = validator.diff_responses(
+            response, expected_response, max_errors=self.max_errors, max_depth=self.max_depth)
+        compare_time, timer = default_timer() - timer, default_timer()
+        diff = ''.join(validator.format_errors(errors, with_color=with_color))
+        render_time = default_timer() - timer
+        return report.InteractionReport(
+            i,
+            interaction.get('description'),
+            errors=errors,
+            diff=diff,
+            state_time=state_time,
+            request_time=request_time,
+            compare_time=compare_time,
+            render_time=render_time,
+        )
+
+    def verify_interaction(self, i, interaction):
+        """Replay the ``i``-th interaction and return the diff with the expected response (empty if it matches)."""
+        return self.report_interaction(i, interaction).diff
+
+    def _pending_interactions(self):
+        """
+            Yield (index, interaction, key) for each interaction that must be verified.
+
+            ``key`` is the hash of the interaction in the results store, computed
+            before the verification alters the interaction.
+        """
+        self.skipped = []
+        self._responses = {}
+        for i, interaction in enumerate(self.get_and_assert_key('interactions')):
+            key = None
+            if self.results_store is not None:
+                key = results.interaction_hash(interaction)
+                if self.results_store.is_verified(self.fingerprint, key):
+                    self.skipped.append(i)
+                    continue
+            yield i, interaction, key
+
+    def _mark_verified(self, key):
+        if self.results_store is not None:
+            self.results_store.mark_verified(self.fingerprint, key)
+
+    def _save_results(self):
+        if self.results_store is not None:
+            self.results_store.save()
+
+    def verification_report(self, consumer):
+        """
+            Verify every interaction with ``consumer`` and return a ``VerificationReport``.
+
+            Contrary to ``honours_pact_with``, all the interactions are verified even if some fail.
+        """
+        assert self.get_and_assert_key('consumer.name') == consumer
+        interactions = []
+        try:
+            for i, interaction, key in self._pending_interactions():
+                interaction_report = self.report_interaction(i, interaction, with_color=False)
+                interactions.append(interaction_report)
+                if interaction_report.passed:
+                    self._mark_verified(key)
+        finally:
+            self._save_results()
+        return self._verification_report(interactions)
+
+    def _verification_report(self, interactions):
+        """Build the ``VerificationReport`` of the verified ``interactions`` and the skipped ones."""
+        all_interactions = self.get_and_assert_key('interactions')
+        interactions = interactions + [
+            report.InteractionReport(i, all_interactions[i].get('description'), skipped=True)
+            for i in self.skipped
+        ]
+        return report.VerificationReport(
+            self.pact.get('provider', {}).get('name'),
+            self.get_and_assert_key('consumer.name'),
+            sorted(interactions, key=lambda x: x.index),
+        )
+
     def honours_pact_with(self, consumer):
         assert self.get_and_assert_key('consumer.name') == consumer
-        for i, interaction in enumerate(self.get_and_assert_key('interactions')):
-            init_states = [(s['name'].replace(' ', '_'), s['params']) for s in interaction.get('providerStates', [])]
-            with self.client.set_up(init_states=init_states):
-                method = self.get_and_assert_key('interactions.%s.request.method' % i).lower()
-                method = getattr(self.client, method, None)
-                if not method:
-                    raise BadPactFormat('method %s is not a valid method' % method)
-                request = interaction['request']
-                path = self.get_and_assert_key('interactions.%s.request.path' % i)
-                response = method(
-                    self.client,
-                    path=path,
-                    data=request.get('data', None),
-                    headers=request.get('headers', None),
-                    query=request.get('query', None),
-                )
-                expected_response = self.get_and_assert_key('interactions.%s.response' % i)
-                diff = ''.join(validator.compare_responses(response, expected_response))
+        try:
+            for i, interaction, key in self._pending_interactions():
+                diff = self.verify_interaction(i, interaction)
                 if diff:
                     raise AssertionError(diff)
+                self._mark_verified(key)
+        finally:
+            self._save_results()
+
+
+def _request_key(interaction):
+    """Return the hash of the request of ``interaction``, whatever the case of its method and headers and its query form."""
+    request = interaction['request']
+    query = request.get('query')
+    return results.interaction_hash({
+        'request': {
+            'method': request.get('method', '').lower(),
+            'path': request.get('path'),
+            'query': validator._parse_query(query) if isinstance(query, STRING_TYPES) else query,
+            'headers': dict((key.lower(), value) for key, value in (request.get('headers') or {}).items()),
+            'data': request.get('data'),
+        },
+        'providerStates': interaction.get('providerStates', []),
+    })
+
+
+def verify_pacts(pact_uris, client, **provider_kwargs):
+    """
+        Verify the pacts at ``pact_uris``, of any consumers, in a single pass through ``client``.
+
+        Interactions sharing the same request and provider states, whatever
+        their consumer, are replayed once: the response is compared with the
+        expected response of each of them. The state and request times are
+        reported on the first of these interactions only.
+
+        ``provider_kwargs`` are given to the ``Provider`` of each pact.
+
+        Return: a ``VerificationReport`` per pact, in the order of ``pact_uris``.
+    """
+    providers = [Provider(pact_uri, client, **provider_kwargs) for pact_uri in pact_uris]
+    groups = OrderedDict()
+    for provider in providers:
+        for i, interaction, key in provider._pending_interactions():
+            groups.setdefault(_request_key(interaction), []).append((provider, i, interaction, key))
+
+    interactions = dict((id(provider), []) for provider in providers)
+    try:
+        for group in groups.values():
+            provider, i, interaction, _key = group[0]
+            timer = default_timer()
+            with client.set_up(init_states=get_init_states(interaction)):
+                state_time, timer = default_timer() - timer, default_timer()
+                response = provider.send_request(i, interaction)
+                request_time = default_timer() - timer
+            for n, (provider, i, interaction, key) in enumerate(group):
+                # the comparison replaces top level values of the response, keep it intact for the next interactions
+                actual = dict(response) if n < len(group) - 1 else response
+                interaction_report = provider.report_response(
+                    i, interaction, actual, with_color=False,
+                    state_time=state_time if n == 0 else 0., request_time=request_time if n == 0 else 0.,
+                )
+                interactions[id(provider)].append(interaction_report)
+                if interaction_report.passed:
+                    provider._mark_verified(key)
+    finally:
+        for provider in providers:
+            provider._save_results()
+    return [provider._verification_report(interactions[id(provider)]) for provider in providers]
@@ -0,0 +1,116 @@
+"""
+Fetch pacts from a pact broker, or any HTTP server, through a local cache.
+"""
+import hashlib
+import json
+from multiprocessing.pool import ThreadPool
+import os
+import tempfile
+import threading
+
+import requests
+
+try:
+    from os import replace as _replace
+except ImportError:  # Python 2: os.rename only overwrites an existing file on POSIX
+    from os import rename as _replace
+
+
+class PactCache(object):
+    """
+        Content-addressed on-disk cache of the pacts fetched over HTTP.
+
+        The documents are stored in ``directory`` under the sha256 of their
+        content, so that identical pacts published under several URLs are
+        stored once. ``refs.json`` maps each URL to the ETag and digest of its
+        last fetched document, to revalidate it with If-None-Match.
+
+        The documents are kept in memory by digest: a pact fetched several
+        times, or under several URLs, is only read from the disk once. Each
+        ``load`` parses a fresh document that the caller may modify.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.refs_path = os.path.join(directory, 'refs.json')
+        self._lock = threading.Lock()
+        self._contents = {}
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._refs = {}
+        if os.path.exists(self.refs_path):
+            with open(self.refs_path, 'r') as f:
+                self._refs = json.load(f)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, '%s.json' % digest)
+
+    def etag(self, url):
+        """Return the ETag of the cached document of ``url``, or None."""
+        ref = self._refs.get(url)
+        if ref is None or not os.path.exists(self._path(ref['digest'])):
+            return None
+        return ref['etag']
+
+    def store(self, url, etag, content):
+        """Store ``content`` (bytes) fetched from ``url`` and return its digest."""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            _replace(tmp_path, path)
+        with self._lock:
+            self._refs[url] = {'etag': etag, 'digest': digest}
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._refs, f)
+            _replace(tmp_path, self.refs_path)
+        return digest
+
+    def load(self, url):
+        """Return the cached document of ``url``."""
+        digest = self._refs[url]['digest']
+        with self._lock:
+            if digest not in self._contents:
+                with open(self._path(digest), 'rb') as f:
+                    self._contents[digest] = f.read().decode('utf-8')
+            content = self._contents[digest]
+        return json.loads(content)
+
+
+def fetch_pact(url, cache=None, session=None, timeout=None):
+    """
+        Fetch the pact at ``url``.
+
+        With a ``cache`` (a ``PactCache``) the cached document is revalidated
+        with its ETag and only downloaded again if it changed.
+    """
+    session = session or requests.Session()
+    headers = {'Accept': 'application/json'}
+    etag = cache.etag(url) if cache is not None else None
+    if etag is not None:
+        headers['If-None-Match'] = etag
+    response = session.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and etag is not None:
+        return cache.load(url)
+    response.raise_for_status()
+    if cache is None or not response.headers.get('ETag'):
+        return response.json()
+    cache.store(url, response.headers['ETag'], response.content)
+    return cache.load(url)
+
+
+def fetch_pacts(urls, cache=None, workers=4, timeout=None):
+    """
+        Fetch the pacts at ``urls`` concurrently on ``workers`` threads, sharing a single session.
+
+        Return: the list of the pacts, in the order of ``urls``.
+    """
+    session = requests.Session()
+    pool = ThreadPool(workers)
+    try:
+        return pool.map(lambda url: fetch_pact(url, cache, session, timeout), urls)
+    finally:
+        pool.close()
+        pool.join()
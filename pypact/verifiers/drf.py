@@ -1,6 +1,9 @@
 from contextlib import contextmanager
 import json
-from urllib import urlencode
+try:
+    from urllib.parse import urlencode
+except ImportError:  # Python 2
+    from urllib import urlencode
 
 from django.db import DEFAULT_DB_ALIAS
 from django.db import transaction
@@ -9,9 +12,28 @@ from . import base
 
 
 class DjangoRestFrameworkClient(base.PactClientMock):
-    def __init__(self, django_test_client, state_factory):
+    """
+        Pact client replaying interactions through a Django REST framework test client.
+
+        Provider states are built by calling the methods of ``state_factory``
+        named after them. By default they are built again for each interaction,
+        in a transaction.
+
+        Within ``savepoints()``, the whole run is done in a transaction rolled
+        back at the end: shared base fixtures are built once, each provider
+        state is built in its own savepoint which is kept as long as the next
+        interactions start with the same states, and each interaction runs in
+        a savepoint rolled back afterwards. With ``keep_states`` each state is
+        built once for the whole run instead.
+    """
+    def __init__(self, django_test_client, state_factory, using=DEFAULT_DB_ALIAS):
         self.client = django_test_client
         self.state_factory = state_factory
+        self.using = using
+        # (name, params, savepoint id) of the states built, None outside of savepoints()
+        self._states = None
+        # {(name, params as JSON): factory result} of the states kept until the end of savepoints(keep_states=True)
+        self._kept_states = None
 
     @staticmethod
     def _format_header(header):
@@ -47,8 +69,63 @@ class DjangoRestFrameworkClient(base.PactClientMock):
             return super(DjangoRestFrameworkClient, self).__getattribute__(attribute)
 
     @contextmanager
-    def set_up(self, init_states):
-        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+    def savepoints(self, base_fixtures=None, keep_states=False):
+        """
+            Isolate the interactions with savepoints until exit, ``base_fixtures``
+            (a callable) being called once to build the data shared by all of them.
+
+            With ``keep_states`` the result of each state factory call is cached
+            by state name and params, and its data kept until exit: a state is
+            built once whatever the order of the interactions, so the states of
+            the pact must not conflict with each other.
+        """
+        with transaction.atomic(using=self.using):
+            if base_fixtures is not None:
+                base_fixtures()
+            self._states = []
+            self._kept_states = {} if keep_states else None
+            try:
+                yield
+            finally:
+                self._states = self._kept_states = None
+                transaction.set_rollback(True, using=self.using)
+
+    def _build_states(self, init_states):
+        """Keep the states already built that ``init_states`` starts with, roll back the others and build the missing ones."""
+        if self._kept_states is not None:
             for name, params in init_states:
-                getattr(self.state_factory, name)(**params)
+                key = (name, json.dumps(params, sort_keys=True))
+                if key not in self._kept_states:
+                    self._kept_states[key] = getattr(self.state_factory, name)(**params)
+            return
+        kept = 0
+        for (name, params, _sid), state in zip(self._states, init_states):
+            if (name, params) != tuple(state):
+                break
+            kept += 1
+        if kept < len(self._states):
+            # rolling back to the first dropped state also destroys the savepoints of the next ones
+            transaction.savepoint_rollback(self._states[kept][2], using=self.using)
+            transaction.savepoint_commit(self._states[kept][2], using=self.using)
+            del self._states[kept:]
+        for name, params in init_states[kept:]:
+            sid = transaction.savepoint(using=self.using)
+            getattr(self.state_factory, name)(**params)
+            self._states.append((name, params, sid))
+
+    @contextmanager
+    def set_up(self, init_states):
+        if self._states is None:
+            with transaction.atomic(using=self.using):
+                for name, params in init_states:
+                    getattr(self.state_factory, name)(**params)
+                yield
+            return
+        self._build_states(init_states)
+        sid = transaction.savepoint(using=self.using)
+        try:
             yield
+        finally:
+            transaction.savepoint_rollback(sid, using=self.using)
+            # release it, the savepoints would otherwise pile up until the end of the run
+            transaction.savepoint_commit(sid, using=self.using)
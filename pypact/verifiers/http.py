@@ -0,0 +1,128 @@
+from collections import namedtuple
+from contextlib import contextmanager
+import json
+import math
+from multiprocessing.pool import ThreadPool
+from timeit import default_timer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import base
+
+
+InteractionResult = namedtuple('InteractionResult', ['index', 'description', 'diff', 'latency'])
+
+
+class HttpClient(base.PactClientMock):
+    """
+        Pact client replaying interactions against a provider reachable over HTTP.
+
+        A single ``requests.Session`` is shared by all the interactions so that
+        connections are kept alive and reused. The session pool is sized with
+        ``pool_size`` so that concurrent dispatch does not open a new connection
+        for each request.
+
+        Provider states are set up by posting ``{"state": name, "params": params}``
+        to ``state_setup_uri`` when it is given, and ignored otherwise.
+    """
+    def __init__(self, base_uri, state_setup_uri=None, pool_size=10, timeout=None, session=None):
+        self.base_uri = base_uri.rstrip('/')
+        self.state_setup_uri = state_setup_uri
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _url(self, path):
+        return '%s/%s' % (self.base_uri, path.lstrip('/'))
+
+    def _request(self, method, path, data, headers, query):
+        kwargs = {'headers': headers, 'params': query, 'timeout': self.timeout}
+        if isinstance(data, (dict, list)):
+            kwargs['json'] = data
+        else:
+            kwargs['data'] = data
+        response = self.session.request(method.upper(), self._url(path), **kwargs)
+        try:
+            content = response.json()
+        except ValueError:
+            content = response.text
+        return {
+            'status': response.status_code,
+            'body': content,
+            'headers': dict(response.headers),
+        }
+
+    def __getattribute__(self, attribute):
+        """Hook the http methods to return a Pact response object."""
+        if attribute in ('get', 'post', 'put', 'patch', 'delete'):
+            def fun(self, path, data, headers, query):
+                return self._request(attribute, path, data, headers, query)
+            return fun
+        else:
+            return super(HttpClient, self).__getattribute__(attribute)
+
+    @contextmanager
+    def set_up(self, init_states):
+        if self.state_setup_uri:
+            for name, params in init_states:
+                response = self.session.post(
+                    self.state_setup_uri,
+                    data=json.dumps({'state': name, 'params': params}),
+                    headers={'Content-Type': 'application/json'},
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+        yield
+
+
+def _timed_verification(provider, i, interaction):
+    start = default_timer()
+    diff = provider.verify_interaction(i, interaction)
+    return InteractionResult(i, interaction.get('description'), diff, default_timer() - start)
+
+
+def verify_concurrently(provider, consumer, workers=4):
+    """
+        Verify all the interactions of ``provider`` with ``consumer`` and return an ``InteractionResult`` per interaction.
+
+        Interactions without provider states do not depend on each other and are
+        dispatched concurrently on ``workers`` threads; the others are replayed
+        one after the other because their states would clash. The client of
+        ``provider`` must be thread-safe, which is the case of ``HttpClient``.
+
+        Contrary to ``Provider.honours_pact_with`` no exception is raised on
+        mismatch: the diff of each failing interaction is stored in its result.
+    """
+    assert provider.get_and_assert_key('consumer.name') == consumer
+    interactions = list(enumerate(provider.get_and_assert_key('interactions')))
+    stateless = [(i, x) for i, x in interactions if not base.get_init_states(x)]
+    stateful = [(i, x) for i, x in interactions if base.get_init_states(x)]
+
+    pool = ThreadPool(workers)
+    try:
+        results = pool.map(lambda args: _timed_verification(provider, *args), stateless)
+    finally:
+        pool.close()
+        pool.join()
+    results.extend(_timed_verification(provider, i, x) for i, x in stateful)
+    return sorted(results, key=lambda result: result.index)
+
+
+def latency_percentiles(results, percentiles=(50, 90, 99)):
+    """
+        Compute latency percentiles (nearest-rank method) over a list of ``InteractionResult``.
+
+        Return: dict mapping each percentile to a latency in seconds, or None if there is no result.
+    """
+    latencies = sorted(result.latency for result in results)
+    ret = {}
+    for percentile in percentiles:
+        if not latencies:
+            ret[percentile] = None
+            continue
+        rank = int(math.ceil(percentile / 100.0 * len(latencies)))
+        ret[percentile] = latencies[max(rank - 1, 0)]
+    return ret
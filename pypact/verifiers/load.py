@@ -0,0 +1,397 @@
+"""
+Load testing of a provider with requests synthesized from the interactions of a pact.
+
+Each request of the pact is turned into a ``RequestSynthesizer`` generating
+random variants of it which still match the pact: the values constrained by
+a matching rule (regex, type, min/max, integer, decimal, date...) are drawn
+at random, the others are kept. Every generated value is checked with the
+rule it was drawn from, and every variant with the expected request, the
+example of the pact being used instead when the check fails.
+
+``run_load`` replays the variants through a ``base.PactClientMock`` (e.g. an
+``http.HttpClient``) on a pool of threads, at a given rate, and returns a
+``LoadReport`` with the throughput and the latency histogram.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+from multiprocessing.pool import ThreadPool
+import random
+import string
+from timeit import default_timer
+import time
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from .. import matchers
+from .. import validator
+from . import base
+
+try:
+    unichr
+except NameError:  # Python 3
+    unichr = chr
+
+
+# upper bounds, in seconds, of the buckets of the latency histogram
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1., 2., 5., float('inf'))
+
+_PRINTABLE = string.ascii_letters + string.digits + ' -_.'
+_CATEGORIES = {
+    'category_digit': string.digits,
+    'category_not_digit': string.ascii_letters + ' -_.',
+    'category_word': string.ascii_letters + string.digits + '_',
+    'category_not_word': ' -.',
+    'category_space': ' ',
+    'category_not_space': string.ascii_letters + string.digits + '-_.',
+}
+
+
+def _opcode(op):
+    # opcodes are strings in Python 2 ('literal') and named ints in Python 3 (LITERAL)
+    return str(op).lower()
+
+
+class RegexGenerator(object):
+    """
+        Generate random strings matched by a regex.
+
+        Repetitions are limited to ``max_repeat`` occurrences above their
+        minimum. Lookarounds are ignored: the strings generated must be checked
+        with the regex.
+    """
+    def __init__(self, pattern, max_repeat=5):
+        self.pattern = pattern
+        self.max_repeat = max_repeat
+        self.parsed = sre_parse.parse(pattern)
+
+    def generate(self, rng):
+        groups = {}
+        return ''.join(self._generate(self.parsed, rng, groups))
+
+    def _choices(self, items):
+        chars, negate = [], False
+        for op, av in items:
+            op = _opcode(op)
+            if op == 'negate':
+                negate = True
+            elif op == 'literal':
+                chars.append(unichr(av))
+            elif op == 'range':
+                chars.extend(unichr(x) for x in range(av[0], min(av[1], av[0] + 255) + 1))
+            elif op == 'category':
+                chars.extend(_CATEGORIES.get(_opcode(av), ''))
+            else:
+                raise ValueError('unsupported set item %s' % op)
+        if negate:
+            excluded = set(chars)
+            chars = [x for x in _PRINTABLE if x not in excluded]
+        return chars
+
+    def _generate(self, parsed, rng, groups):
+        for op, av in parsed:
+            op = _opcode(op)
+            if op == 'literal':
+                yield unichr(av)
+            elif op == 'not_literal':
+                yield rng.choice([x for x in _PRINTABLE if x != unichr(av)])
+            elif op == 'any':
+                yield rng.choice(_PRINTABLE)
+            elif op == 'in':
+                yield rng.choice(self._choices(av))
+            elif op == 'category':
+                yield rng.choice(_CATEGORIES[_opcode(av)])
+            elif op == 'branch':
+                for x in self._generate(rng.choice(av[1]), rng, groups):
+                    yield x
+            elif op == 'subpattern':
+                # (group, pattern) in Python 2, (group, add_flags, del_flags, pattern) in Python 3
+                value = ''.join(self._generate(av[-1], rng, groups))
+                if av[0] is not None:
+                    groups[av[0]] = value
+                yield value
+            elif op in ('max_repeat', 'min_repeat', 'possessive_repeat'):
+                minimum, maximum, pattern = av
+                for _ in range(rng.randint(minimum, min(maximum, minimum + self.max_repeat))):
+                    for x in self._generate(pattern, rng, groups):
+                        yield x
+            elif op == 'groupref':
+                yield groups.get(av, '')
+            elif op in ('at', 'assert', 'assert_not'):
+                continue
+            else:
+                raise ValueError('unsupported regex operator %s in %s' % (op, self.pattern))
+
+
+class RequestSynthesizer(object):
+    """
+        Generate random variants of the expected ``request`` of an interaction.
+
+        Headers names are lower cased and the query is given as in the pact:
+        a query string is encoded again after its values are drawn.
+    """
+    def __init__(self, request):
+        self.expectation = validator.CompiledRequestExpectation(request)
+        self.query_string = isinstance(request.get('query'), base.STRING_TYPES)
+        self._regexes = {}
+
+    def variant(self, rng):
+        """Return a random variant of the request, the example of the pact if the variant does not match it."""
+        request = {}
+        for key, value in self.expectation.expected.items():
+            request[key] = self._value(value, validator._append_key_to_path(None, key), rng)
+        if not self.expectation.matches(request):
+            request = dict(self.expectation.expected)
+        if self.query_string and isinstance(request.get('query'), dict):
+            request['query'] = _urlencode(request['query'])
+        return request
+
+    def _value(self, expected, path, rng):
+        value_matcher = matchers.get_best_matcher(self.expectation.matchers, path)
+        if type(expected) == dict:
+            return dict(
+                (key, self._value(value, validator._append_key_to_path(path, key), rng))
+                for key, value in expected.items()
+            )
+        if type(expected) in (list, tuple):
+            return self._list(expected, value_matcher, path, rng)
+        if value_matcher is None:
+            return expected
+        try:
+            value = self._leaf(expected, value_matcher, rng)
+        except (ValueError, TypeError, IndexError):
+            return expected
+        return expected if value_matcher.diff(value, expected) else value
+
+    def _list(self, expected, value_matcher, path, rng):
+        if not expected:
+            return []
+        length = len(expected)
+        if isinstance(value_matcher, matchers.MinMaxMatcher):
+            # the validator also requires the expected elements: the list can only grow
+            minimum = max(value_matcher.minimum or 0, length)
+            length = rng.randint(minimum, max(value_matcher.maximum or minimum + 3, minimum))
+        # like in the validator, the extra elements are compared with the first one
+        items = [
+            self._value(expected[i] if i < len(expected) else expected[0], validator._append_index_to_path(path, i), rng)
+            for i in range(length)
+        ]
+        if isinstance(value_matcher, matchers.UnorderedMatcher) or getattr(value_matcher, 'unordered', None):
+            rng.shuffle(items)
+        return items
+
+    def _leaf(self, expected, value_matcher, rng):
+        """Draw a value matching ``value_matcher``, raise ValueError when it can't be generated."""
+        if isinstance(value_matcher, matchers.CombinedMatcher):
+            if value_matcher.combine == 'OR':
+                return self._leaf(expected, rng.choice(value_matcher.matchers), rng)
+            return self._leaf(expected, value_matcher.matchers[0], rng)
+        if isinstance(value_matcher, matchers.RegexMatcher):
+            pattern = value_matcher.regex.pattern
+            if pattern not in self._regexes:
+                self._regexes[pattern] = RegexGenerator(pattern)
+            value = self._regexes[pattern].generate(rng)
+            # e.g. an integer id constrained by \d+ stays an integer
+            return expected[:0] + value if isinstance(expected, base.STRING_TYPES) else type(expected)(value)
+        if isinstance(value_matcher, matchers.TypeRuleMatcher):
+            return _random_of_rule(value_matcher.rule, rng)
+        if isinstance(value_matcher, matchers.DateTimeMatcher):
+            moment = datetime(2000, 1, 1) + timedelta(seconds=rng.randint(0, 30 * 365 * 24 * 3600))
+            return moment.strftime(value_matcher.format)
+        if isinstance(value_matcher, matchers.IncludeMatcher):
+            return _random_string(rng, 3) + value_matcher.value + _random_string(rng, 3)
+        if isinstance(value_matcher, (matchers.TypeMatcher, matchers.MinMaxMatcher)):
+            return _random_like(expected, rng)
+        raise ValueError('no generator for %s' % type(value_matcher).__name__)
+
+
+def _random_string(rng, length):
+    return ''.join(rng.choice(string.ascii_letters + string.digits) for _ in range(rng.randint(1, length)))
+
+
+def _random_like(expected, rng):
+    """Return a random value of the type of ``expected``."""
+    if isinstance(expected, bool):
+        return rng.choice((True, False))
+    if isinstance(expected, base.STRING_TYPES):
+        return expected[:0] + _random_string(rng, max(len(expected), 1) + 5)
+    if isinstance(expected, float):
+        return rng.uniform(-2 * abs(expected) - 10, 2 * abs(expected) + 10)
+    if isinstance(expected, matchers.INTEGER_TYPES):
+        return type(expected)(rng.randint(0, 2 * abs(expected) + 10))
+    return expected
+
+
+def _random_of_rule(rule, rng):
+    if rule == 'integer':
+        return rng.randint(-1000, 1000)
+    if rule == 'decimal':
+        return rng.uniform(-1000, 1000)
+    if rule == 'number':
+        return rng.choice((rng.randint(-1000, 1000), rng.uniform(-1000, 1000)))
+    if rule == 'boolean':
+        return rng.choice((True, False))
+    return None
+
+
+def _urlencode(query):
+    try:
+        from urllib.parse import urlencode
+    except ImportError:  # Python 2
+        from urllib import urlencode
+    return urlencode(query, doseq=True)
+
+
+# a replayed request: the index of its interaction, the status of the response
+# (None on error), whether it is the expected one, the latency in seconds and
+# the exception raised by the client if any
+LoadResult = namedtuple('LoadResult', ['index', 'status', 'expected_status', 'latency', 'error'])
+
+
+class LoadReport(object):
+    """Results of ``run_load``: one ``LoadResult`` per request, and the duration of the run in seconds."""
+    def __init__(self, results, duration, skipped=None):
+        self.results = results
+        self.duration = duration
+        self.skipped = skipped or []
+
+    @property
+    def throughput(self):
+        """Requests completed per second."""
+        return len(self.results) / self.duration if self.duration else 0.
+
+    @property
+    def errors(self):
+        return [result for result in self.results if result.error is not None]
+
+    @property
+    def unexpected(self):
+        """The requests whose response status is not the one of their interaction."""
+        return [result for result in self.results if result.error is None and not result.expected_status]
+
+    def percentiles(self, percentiles=(50, 90, 99)):
+        from . import http
+        return http.latency_percentiles(self.results, percentiles)
+
+    def histogram(self, buckets=LATENCY_BUCKETS):
+        """Return the list of (upper bound in seconds, number of requests) of the latency histogram."""
+        counts = [0] * len(buckets)
+        for result in self.results:
+            for i, bound in enumerate(buckets):
+                if result.latency <= bound:
+                    counts[i] += 1
+                    break
+        return list(zip(buckets, counts))
+
+    def to_dict(self):
+        statuses = {}
+        for result in self.results:
+            statuses[str(result.status)] = statuses.get(str(result.status), 0) + 1
+        return {
+            'requests': len(self.results),
+            'duration': self.duration,
+            'throughput': self.throughput,
+            'errors': len(self.errors),
+            'unexpected_status': len(self.unexpected),
+            'statuses': statuses,
+            'skipped': self.skipped,
+            'percentiles': dict((str(k), v) for k, v in self.percentiles().items()),
+            'histogram': [[bound if bound != float('inf') else None, count] for bound, count in self.histogram()],
+        }
+
+    def format(self, width=40):
+        """Render the throughput, the percentiles and the latency histogram as text."""
+        lines = ['%d requests in %.3fs: %.1f requests/s, %d errors, %d unexpected statuses' % (
+            len(self.results), self.duration, self.throughput, len(self.errors), len(self.unexpected))]
+        lines.append('  '.join(
+            'p%s %s' % (k, '-' if v is None else '%.1fms' % (v * 1000)) for k, v in sorted(self.percentiles().items())))
+        histogram = self.histogram()
+        top = max(count for _bound, count in histogram) or 1
+        for bound, count in histogram:
+            label = '<= %gms' % (bound * 1000) if bound != float('inf') else '> %gms' % (LATENCY_BUCKETS[-2] * 1000)
+            lines.append(('%12s %7d %s' % (label, count, '#' * int(round(count * width / float(top))))).rstrip())
+        return '\n'.join(lines)
+
+
+def synthesize(pact, requests, seed=None):
+    """
+        Generate ``requests`` variants of the requests of the interactions of ``pact`` without provider states.
+
+        The interactions are drawn at random with a ``random.Random(seed)``.
+
+        Return: a tuple (plan, skipped) where plan is the list of the
+            (interaction index, request) and skipped the indices of the
+            interactions with provider states.
+    """
+    rng = random.Random(seed)
+    interactions = pact.get('interactions', [])
+    skipped = [i for i, x in enumerate(interactions) if base.get_init_states(x)]
+    synthesizers = [
+        (i, RequestSynthesizer(x['request']))
+        for i, x in enumerate(interactions) if not base.get_init_states(x)
+    ]
+    if not synthesizers:
+        return [], skipped
+    plan = []
+    for _ in range(requests):
+        i, synthesizer = rng.choice(synthesizers)
+        plan.append((i, synthesizer.variant(rng)))
+    return plan, skipped
+
+
+def _send(client, request):
+    method = getattr(client, request['method'].lower())
+    return method(
+        client,
+        path=request['path'],
+        data=request.get('data', request.get('body')),  # pacts written by pypact carry the payload in data
+        headers=request.get('headers', None),
+        query=request.get('query', None),
+    )
+
+
+def run_load(pact_uri, client, requests=1000, rate=None, workers=4, seed=None, pact_cache=None):
+    """
+        Replay ``requests`` requests synthesized from the pact at ``pact_uri`` through ``client``.
+
+        The requests are generated before the run (see ``synthesize``) and
+        sent by ``workers`` threads, so ``client`` must be thread-safe like
+        ``http.HttpClient``. With a ``rate`` (requests per second) the n-th
+        request is sent at n / rate seconds from the start of the run, else as
+        soon as a worker is free. Interactions with provider states are not
+        replayed: their states could clash.
+
+        Return: a ``LoadReport``.
+    """
+    pact = base._get_pact(pact_uri, pact_cache)
+    plan, skipped = synthesize(pact, requests, seed)
+    interactions = pact.get('interactions', [])
+    expected_statuses = dict((i, interactions[i]['response'].get('status')) for i, _request in plan)
+
+    def replay(args):
+        n, (i, request) = args
+        if rate:
+            delay = start + n / float(rate) - default_timer()
+            if delay > 0:
+                time.sleep(delay)
+        timer = default_timer()
+        try:
+            response = _send(client, request)
+        except Exception as e:
+            return LoadResult(i, None, False, default_timer() - timer, e)
+        latency = default_timer() - timer
+        status = response.get('status')
+        expected = expected_statuses[i]
+        return LoadResult(i, status, expected is None or status == expected, latency, None)
+
+    pool = ThreadPool(workers)
+    try:
+        start = default_timer()
+        results = pool.map(replay, list(enumerate(plan)))
+        duration = default_timer() - start
+    finally:
+        pool.close()
+        pool.join()
+    return LoadReport(results, duration, skipped)
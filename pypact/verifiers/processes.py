@@ -0,0 +1,165 @@
+"""
+Verification of the interactions of a pact in a pool of worker processes.
+
+The parent process parses the pact once and writes it to a memory-mapped file
+made of the pact without its interactions followed by each interaction,
+serialized separately, and an offset table:
+
+    magic | count | offsets (count + 2) | document | interaction 0 | ... | interaction count-1
+
+Workers map the file (the pages are shared with the parent through the page
+cache) and decode only the interactions they are assigned, so that their start
+up cost does not depend on the size of the pact.
+"""
+try:
+    from collections.abc import Sequence
+except ImportError:  # Python 2
+    from collections import Sequence
+import json
+import mmap
+from multiprocessing import Pool
+import os
+import struct
+import tempfile
+
+from . import base
+
+
+MAGIC = b'PYPACTSH'
+_COUNT = struct.Struct('<I')
+_OFFSET = struct.Struct('<Q')
+
+
+def _dump(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def write_shared_pact(pact, path):
+    """Serialize ``pact`` to ``path`` so that it can be attached with ``SharedPact``."""
+    document = dict((key, value) for key, value in pact.items() if key != 'interactions')
+    chunks = [_dump(document)] + [_dump(interaction) for interaction in pact.get('interactions', [])]
+    count = len(chunks) - 1
+    offset = len(MAGIC) + _COUNT.size + _OFFSET.size * (count + 2)
+    offsets = []
+    for chunk in chunks:
+        offsets.append(offset)
+        offset += len(chunk)
+    offsets.append(offset)
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_COUNT.pack(count))
+        f.write(b''.join(_OFFSET.pack(x) for x in offsets))
+        f.write(b''.join(chunks))
+
+
+class SharedInteractions(Sequence):
+    """Interactions of a ``SharedPact``, decoded on first access."""
+    def __init__(self, shared_pact):
+        self._shared_pact = shared_pact
+        self._decoded = {}
+
+    def __len__(self):
+        return self._shared_pact.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('interaction index out of range')
+        if i not in self._decoded:
+            self._decoded[i] = self._shared_pact.decode(i + 1)
+        return self._decoded[i]
+
+
+class SharedPact(object):
+    """
+        Pact attached from a file written by ``write_shared_pact``.
+
+        ``document`` is the pact, whose ``interactions`` are a ``SharedInteractions``:
+        it can be given to ``base.Provider`` in place of a pact uri.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buffer[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise base.BadPactFormat('%s is not a shared pact' % path)
+        self.count, = _COUNT.unpack_from(self._buffer, len(MAGIC))
+        self.document = self.decode(0)
+        self.document['interactions'] = SharedInteractions(self)
+
+    def decode(self, chunk):
+        """Decode the ``chunk``-th chunk: 0 is the document, the next ones the interactions."""
+        start, end = (
+            _OFFSET.unpack_from(self._buffer, len(MAGIC) + _COUNT.size + _OFFSET.size * i)[0]
+            for i in (chunk, chunk + 1)
+        )
+        return json.loads(self._buffer[start:end].decode('utf-8'))
+
+    def close(self):
+        self._buffer.close()
+
+
+# state of a worker process, set by _init_worker
+_worker = {}
+
+
+def _init_worker(path, client_factory, provider_kwargs):
+    _worker['pact'] = SharedPact(path)
+    _worker['provider'] = base.Provider(_worker['pact'].document, client_factory(), **provider_kwargs)
+
+
+def _verify(indices):
+    provider = _worker['provider']
+    interactions = provider.get_and_assert_key('interactions')
+    return [provider.report_interaction(i, interactions[i], with_color=False) for i in indices]
+
+
+def verify_in_processes(pact_uri, client_factory, consumer, workers=4, **provider_kwargs):
+    """
+        Verify all the interactions of the pact at ``pact_uri`` with ``consumer`` in ``workers`` processes.
+
+        Each worker builds its client with ``client_factory``, which must be
+        picklable (e.g. a module level function), and a ``base.Provider`` with
+        ``provider_kwargs``. Like in ``http.verify_concurrently`` interactions
+        without provider states are spread over the workers, the others are
+        then verified one after the other by a single worker, once the first
+        ones are done, so that their states don't clash with concurrent
+        requests.
+
+        The ``results_store`` given in ``provider_kwargs`` is used by the
+        parent process: the interactions already verified are skipped and
+        the results of the workers are recorded in it.
+
+        Return: a ``report.VerificationReport``.
+    """
+    provider = base.Provider(pact_uri, None, **provider_kwargs)
+    assert provider.get_and_assert_key('consumer.name') == consumer
+    pending = list(provider._pending_interactions())
+    keys = dict((i, key) for i, _interaction, key in pending)
+    stateless = [i for i, interaction, _key in pending if not base.get_init_states(interaction)]
+    stateful = [i for i, interaction, _key in pending if base.get_init_states(interaction)]
+    worker_kwargs = dict((k, v) for k, v in provider_kwargs.items() if k not in ('results_store', 'fingerprint'))
+
+    fd, path = tempfile.mkstemp(suffix='.pact')
+    os.close(fd)
+    reports = []
+    try:
+        write_shared_pact(provider.pact, path)
+        pool = Pool(workers, initializer=_init_worker, initargs=(path, client_factory, worker_kwargs))
+        try:
+            chunks = [stateless[i::workers] for i in range(workers)]
+            reports.extend(x for chunk in pool.map(_verify, chunks) for x in chunk)
+            reports.extend(pool.apply(_verify, (stateful,)))
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        os.remove(path)
+        for interaction_report in reports:
+            if interaction_report.passed:
+                provider._mark_verified(keys[interaction_report.index])
+        provider._save_results()
+    return provider._verification_report(reports)
@@ -0,0 +1,132 @@
+import json
+
+
+TIMINGS = ('state_time', 'request_time', 'compare_time', 'render_time')
+
+
+def _error_to_dict(error):
+    actual, expected = error.split()
+    return {'type': error.__class__.__name__, 'actual': actual, 'expected': expected}
+
+
+class InteractionReport(object):
+    """
+        Result of the verification of a single interaction.
+
+        Timings are in seconds:
+          state_time: time spent setting up the provider states
+          request_time: time spent by the client to get the response
+          compare_time: time spent comparing the response with the expected one
+          render_time: time spent rendering the human readable diff
+
+        ``skipped`` is set when the interaction was not verified because it
+        had already been verified against the same provider fingerprint.
+    """
+    def __init__(self, index, description, errors=None, diff='', skipped=False,
+                 state_time=0., request_time=0., compare_time=0., render_time=0.):
+        self.index = index
+        self.description = description
+        self.errors = errors or []
+        self.diff = diff
+        self.skipped = skipped
+        self.state_time = state_time
+        self.request_time = request_time
+        self.compare_time = compare_time
+        self.render_time = render_time
+
+    @property
+    def passed(self):
+        return not self.diff
+
+    @property
+    def total_time(self):
+        return sum(getattr(self, timing) for timing in TIMINGS)
+
+    def to_dict(self):
+        ret = {
+            'index': self.index,
+            'description': self.description,
+            'passed': self.passed,
+            'skipped': self.skipped,
+            'errors': [_error_to_dict(error) for error in self.errors],
+            'diff': self.diff,
+            'total_time': self.total_time,
+        }
+        ret.update((timing, getattr(self, timing)) for timing in TIMINGS)
+        return ret
+
+
+class VerificationReport(object):
+    """
+        Result of the verification of all the interactions between a provider and a consumer.
+    """
+    def __init__(self, provider, consumer, interactions=None):
+        self.provider = provider
+        self.consumer = consumer
+        self.interactions = interactions or []
+
+    @property
+    def passed(self):
+        return all(interaction.passed for interaction in self.interactions)
+
+    @property
+    def failures(self):
+        return [interaction for interaction in self.interactions if not interaction.passed]
+
+    @property
+    def skipped(self):
+        return [interaction for interaction in self.interactions if interaction.skipped]
+
+    @property
+    def total_time(self):
+        return sum(interaction.total_time for interaction in self.interactions)
+
+    def to_dict(self):
+        return {
+            'provider': self.provider,
+            'consumer': self.consumer,
+            'passed': self.passed,
+            'total_time': self.total_time,
+            'interactions': [interaction.to_dict() for interaction in self.interactions],
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), default=repr, **kwargs)
+
+    def to_junit_xml(self):
+        """
+            Export the report as a JUnit XML document: one testsuite per consumer and one testcase per interaction.
+
+            The timing breakdown of each interaction is stored in its properties.
+        """
+        from xml.etree import ElementTree
+
+        suite = ElementTree.Element('testsuite', {
+            'name': '%s' % self.consumer,
+            'tests': '%d' % len(self.interactions),
+            'failures': '%d' % len(self.failures),
+            'errors': '0',
+            'skipped': '%d' % len(self.skipped),
+            'time': '%.6f' % self.total_time,
+        })
+        for interaction in self.interactions:
+            case = ElementTree.SubElement(suite, 'testcase', {
+                'classname': '%s' % self.provider,
+                'name': '%s' % (interaction.description or 'interaction %d' % interaction.index),
+                'time': '%.6f' % interaction.total_time,
+            })
+            if interaction.skipped:
+                ElementTree.SubElement(case, 'skipped', {'message': 'already verified'})
+                continue
+            properties = ElementTree.SubElement(case, 'properties')
+            for timing in TIMINGS:
+                ElementTree.SubElement(properties, 'property', {
+                    'name': timing,
+                    'value': '%.6f' % getattr(interaction, timing),
+                })
+            if not interaction.passed:
+                failure = ElementTree.SubElement(case, 'failure', {
+                    'message': '%d error(s)' % len(interaction.errors),
+                })
+                failure.text = interaction.diff
+        return ElementTree.tostring(suite, encoding='utf-8')
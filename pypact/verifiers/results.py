@@ -0,0 +1,54 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+
+try:
+    from os import replace as _replace
+except ImportError:  # Python 2: os.rename only overwrites an existing file on POSIX
+    from os import rename as _replace
+
+
+def interaction_hash(interaction):
+    """Return a hash of ``interaction`` that does not depend on the order of its keys."""
+    canonical = json.dumps(interaction, sort_keys=True, separators=(',', ':'), ensure_ascii=True)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+class ResultsStore(object):
+    """
+        Local store of the interactions successfully verified against a provider fingerprint.
+
+        The fingerprint identifies the provider code (e.g. a git tree hash): an
+        interaction verified against a fingerprint doesn't need to be verified
+        again as long as neither the interaction nor the fingerprint change.
+
+        The store is a json file; only the ``max_fingerprints`` most recently
+        used fingerprints are kept when it is saved.
+    """
+    def __init__(self, path, max_fingerprints=20):
+        self.path = path
+        self.max_fingerprints = max_fingerprints
+        self._fingerprints = OrderedDict()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for fingerprint, keys in json.load(f).get('fingerprints', []):
+                    self._fingerprints[fingerprint] = set(keys)
+
+    def is_verified(self, fingerprint, key):
+        return key in self._fingerprints.get(fingerprint, ())
+
+    def mark_verified(self, fingerprint, key):
+        keys = self._fingerprints.pop(fingerprint, set())  # reinsert as the most recent
+        keys.add(key)
+        self._fingerprints[fingerprint] = keys
+
+    def save(self):
+        fingerprints = list(self._fingerprints.items())[-self.max_fingerprints:]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        # write in a temporary file first so that an interrupted run doesn't corrupt the store
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'fingerprints': [(fp, sorted(keys)) for fp, keys in fingerprints]}, f)
+        _replace(tmp_path, self.path)
@@ -5,7 +5,7 @@ REQUIRES = ["requests>=2.6.0"]
 
 setup(
     name='pypact',
-    packages=['pypact'],
+    packages=['pypact', 'pypact.verifiers'],
     version=VERSION,
     description='Consumer driven contract testing library.',
     author='Rory Hart',
@@ -14,4 +14,7 @@ setup(
     download_url='https://github.com/hartror/pypact/tarball/0.0.1',
     keywords=['testing'],
     classifiers=[],
-    install_requires=REQUIRES)
+    install_requires=REQUIRES,
+    entry_points={
+        'console_scripts': ['pypact = pypact.cli:main'],
+    })